@@ -0,0 +1,78 @@
+# This module maps the order errors to the HTTP error responses of the Flask
+# and the ASGI apps, so every route reports them the same way.
+import functools
+import json
+from types import MappingProxyType
+from typing import Final, Mapping
+
+from backend.exception.duplicate_order_error import DuplicateOrderError
+from backend.exception.empty_customer_id_error import EmptyCustomerIdError
+from backend.exception.empty_order_id_error import EmptyOrderIdError
+from backend.exception.idempotency_key_in_use_error import IdempotencyKeyInUseError
+from backend.exception.idempotency_key_reused_error import IdempotencyKeyReusedError
+from backend.exception.invalid_cursor_error import InvalidCursorError
+from backend.exception.invalid_group_by_error import InvalidGroupByError
+from backend.exception.invalid_idempotency_key_error import InvalidIdempotencyKeyError
+from backend.exception.invalid_initial_status_error import InvalidInitialStatusError
+from backend.exception.invalid_metric_error import InvalidMetricError
+from backend.exception.invalid_page_limit_error import InvalidPageLimitError
+from backend.exception.invalid_request_error import InvalidRequestError
+from backend.exception.invalid_search_query_error import InvalidSearchQueryError
+from backend.exception.invalid_status_error import InvalidStatusError
+from backend.exception.invalid_status_transition_error import InvalidStatusTransitionError
+from backend.exception.invalid_time_parameter_error import InvalidTimeParameterError
+from backend.exception.malformed_order_error import MalformedOrderError
+from backend.exception.minimum_order_quantity_error import MinimumOrderQuantityError
+from backend.exception.order_not_found_error import OrderNotFoundError
+
+ERROR_STATUSES: Final[Mapping[type, int]] = MappingProxyType({
+    InvalidRequestError: 400,
+    MalformedOrderError: 400,
+    EmptyOrderIdError: 400,
+    EmptyCustomerIdError: 400,
+    MinimumOrderQuantityError: 400,
+    InvalidInitialStatusError: 400,
+    InvalidStatusError: 400,
+    InvalidCursorError: 400,
+    InvalidPageLimitError: 400,
+    InvalidGroupByError: 400,
+    InvalidMetricError: 400,
+    InvalidSearchQueryError: 400,
+    InvalidTimeParameterError: 400,
+    InvalidIdempotencyKeyError: 400,
+    OrderNotFoundError: 404,
+    DuplicateOrderError: 409,
+    InvalidStatusTransitionError: 409,
+    IdempotencyKeyInUseError: 409,
+    IdempotencyKeyReusedError: 422,
+})
+HANDLED_ERRORS: Final = tuple(ERROR_STATUSES)
+
+
+def error_status(error: ValueError) -> int:
+    """
+    Returns the HTTP status of an order error, 400 for any other ValueError,
+    e.g. one reported in a per-row result.
+    """
+    return ERROR_STATUSES.get(type(error), 400)
+
+
+@functools.lru_cache(maxsize=1024)
+def error_body(message: str) -> bytes:
+    """
+    Returns the serialized `{"error": message}` body. Bodies are cached, so
+    repeated rejections, e.g. a flood of the same bad request, skip encoding.
+    """
+    return json.dumps({"error": message}).encode()
+
+
+def register_error_handlers(app, response_class):
+    """
+    Registers a handler on the Flask or Quart `app` that answers every order
+    error with its status and a pre-serialized error body.
+    """
+    def handle(error):
+        return response_class(error_body(error.message), status=error_status(error), mimetype='application/json')
+
+    for error_class in HANDLED_ERRORS:
+        app.register_error_handler(error_class, handle)
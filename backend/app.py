@@ -1,74 +1,372 @@
-from os import abort
+import functools
+import json
+import uuid
+from itertools import islice
+from typing import Mapping, NamedTuple
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Blueprint, Flask, Response, current_app, request, jsonify, send_from_directory
 
-from backend.exception.duplicate_order_error import DuplicateOrderError
-from backend.exception.empty_order_id_error import EmptyOrderIdError
-from backend.exception.invalid_initial_status_error import InvalidInitialStatusError
-from backend.exception.minimum_order_quantity_error import MinimumOrderQuantityError
-from backend.exception.order_not_found_error import OrderNotFoundError
+from backend import order_rules, request_schema
+from backend.api_errors import HANDLED_ERRORS, error_body, error_status, register_error_handlers
+from backend.exception.invalid_request_error import InvalidRequestError
+from backend.idempotency_store import IdempotencyStore
+from backend.metrics import MetricsRegistry, instrument_app, instrument_storage, instrument_tracker
+from backend.order_events import KEEP_ALIVE, OrderEventHub, format_events, format_reset
+from backend.order_json_provider import OrderJSONProvider
 from backend.order_tracker import OrderTracker
-from backend.in_memory_storage import InMemoryStorage
+from backend.pagination import STREAM_CHUNK_SIZE, parse_duration, parse_limit, parse_time
+from backend.response_cache import ResponseCache
+from backend.storage_factory import create_storage
 
-app = Flask(__name__, static_folder='../frontend')
-in_memory_storage = InMemoryStorage()
-order_tracker = OrderTracker(in_memory_storage)
 
-@app.route('/')
+api = Blueprint('api', __name__)
+
+
+class _Services(NamedTuple):
+    storage: object
+    order_events: OrderEventHub
+    order_tracker: OrderTracker
+    response_cache: ResponseCache
+    etag_epoch: str
+    idempotency_keys: IdempotencyStore
+
+
+def create_app(config: Mapping = None) -> Flask:
+    """
+    Builds the order API with its own storage, order tracker and change feed.
+    Settings come from the UDATRACK_ prefixed environment variables, then
+    `config`. Pre-fork servers build one app per worker, e.g.
+    `gunicorn -w 4 'backend.app:create_app()'`; with STORAGE 'shared' every
+    worker's storage is a client of the same storage server.
+    """
+    app = Flask(__name__, static_folder='../frontend')
+    app.json = OrderJSONProvider(app)
+    # e.g. UDATRACK_STORAGE=sqlite UDATRACK_SQLITE_PATH=orders.db
+    app.config.from_prefixed_env('UDATRACK')
+    app.config.update(config or {})
+    storage = create_storage(app.config)
+    order_events = OrderEventHub(app.config.get('EVENTS_BUFFER_SIZE', OrderEventHub.DEFAULT_BUFFER_SIZE))
+    order_tracker = OrderTracker(storage, order_events)
+    # Instrumentation wraps the instances, so with UDATRACK_METRICS=false nothing is left in the call path
+    if app.config.get('METRICS', True):
+        metrics = MetricsRegistry()
+        instrument_storage(storage, metrics)
+        instrument_tracker(order_tracker, metrics)
+        instrument_app(app, metrics)
+    # Versions restart with an in-memory store, so ETags from an earlier process must not match
+    etag_epoch = uuid.uuid4().hex[:8]
+    response_cache = ResponseCache(max_bytes=app.config.get('RESPONSE_CACHE_MAX_BYTES', ResponseCache.DEFAULT_MAX_BYTES))
+    idempotency_keys = IdempotencyStore(
+        app.config.get('IDEMPOTENCY_MAX_BYTES', IdempotencyStore.DEFAULT_MAX_BYTES),
+        app.config.get('IDEMPOTENCY_TTL_SECONDS', IdempotencyStore.DEFAULT_TTL_SECONDS),
+    )
+    app.extensions['udatrack'] = _Services(
+        storage, order_events, order_tracker, response_cache, etag_epoch, idempotency_keys,
+    )
+    register_error_handlers(app, Response)
+    app.register_blueprint(api)
+    return app
+
+@functools.cache
+def _default_app():
+    return create_app()
+
+def __getattr__(name):
+    # The module-level app (and its storage, tracker...) is only built on first
+    # use, so `create_app()` alone never opens a second store
+    if name == 'app':
+        return _default_app()
+    if name in _Services._fields:
+        return getattr(_default_app().extensions['udatrack'], name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def _services() -> _Services:
+    return current_app.extensions['udatrack']
+
+@api.route('/')
 def serve_index():
-    return send_from_directory(app.static_folder, 'index.html')
+    return send_from_directory(current_app.static_folder, 'index.html')
 
-@app.route('/<path:filename>')
+@api.route('/<path:filename>')
 def serve_static(filename):
-    return send_from_directory(app.static_folder, filename)
+    return send_from_directory(current_app.static_folder, filename)
 
-@app.route('/api/orders', methods=['POST'])
+@api.route('/api/orders', methods=['POST'])
 def add_order_api():
     # DONE (1): Add new order
-    new_order = dict(request.json)
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is None:
+        return _add_order(_services().order_tracker)
+
+    idempotency_keys = _services().idempotency_keys
+    replayed = idempotency_keys.begin(idempotency_key, request.get_data())
+    if replayed is not None:
+        status, body = replayed
+        return Response(body, status, mimetype='application/json', headers={ "Idempotent-Replayed": "true" })
+
     try:
-        order = order_tracker.add_order(**new_order)
+        response = current_app.make_response(_add_order(_services().order_tracker))
+    except HANDLED_ERRORS as e:
+        # Rejections are kept too, so a retry gets the same answer
+        response = _error_response(e)
+    except BaseException:
+        idempotency_keys.release(idempotency_key)
+        raise
+    # Server errors may not happen again, so the retry runs the request instead of replaying them
+    if response.status_code >= 500:
+        idempotency_keys.release(idempotency_key)
+    else:
+        idempotency_keys.complete(idempotency_key, response.status_code, response.get_data())
+    return response
+
+@api.route('/api/orders/bulk', methods=['POST'])
+def add_orders_bulk_api():
+    order_tracker = _services().order_tracker
+    if request.mimetype == 'application/x-ndjson':
+        rows = _iter_ndjson(request.stream)
+    else:
+        rows = request.get_json(silent=True)
+        if not isinstance(rows, list):
+            raise InvalidRequestError("expected a JSON array of orders")
 
-        return jsonify(order), 201
-    except (MinimumOrderQuantityError, InvalidInitialStatusError) as e:
-        return { "error": e.message }, 400
-    except DuplicateOrderError as e:
-        return { "error": e.message }, 409
+    # Rows failing the schema of a single order never reach the tracker, and are reported like its rejections
+    accepted, rejected = [], {}
+    results = order_tracker.add_orders(_schema_valid_rows(rows, accepted, rejected))
+    outcomes = {**rejected, **dict(zip(accepted, results))}
 
-@app.route('/api/orders/<string:order_id>', methods=['GET'])
+    created, errors = 0, []
+    for row_number in sorted(outcomes):
+        result = outcomes[row_number]
+        if isinstance(result, ValueError):
+            errors.append({ "row": row_number, "error": result.message, "status": error_status(result) })
+        else:
+            created += 1
+
+    return jsonify({ "created": created, "failed": len(errors), "errors": errors }), 200
+
+@api.route('/api/orders/<string:order_id>', methods=['GET'])
 def get_order_api(order_id):
     # DONE (2): Get order details by ID
-    try:
-        order = order_tracker.get_order_by_id(order_id)
-        if not order:
-            return { "error": "Not found" }, 404
-        return jsonify(order), 200
-    except EmptyOrderIdError as e:
-        return { "error": e.MESSAGE }, 400
-
-@app.route('/api/orders/<string:order_id>/status', methods=['PUT'])
+    order_tracker = _services().order_tracker
+    # Read before the order, so a concurrent write can only make the ETag older than the body
+    version = order_tracker.get_order_version(order_id)
+    cached = _cached_response(request.path, version)
+    if cached is not None:
+        return cached
+
+    order = order_tracker.get_order_by_id(order_id)
+    if not order:
+        return { "error": "Not found" }, 404
+    return _versioned_response(request.path, version, [current_app.json.dumps(order)])
+
+@api.route('/api/orders/batch-get', methods=['POST'])
+def batch_get_orders_api():
+    body = request_schema.BATCH_GET.validate(request.get_json(silent=True))
+    orders = _services().order_tracker.get_orders_by_ids(body["order_ids"])
+    missing = [order_id for order_id in dict.fromkeys(body["order_ids"]) if order_id not in orders]
+    return jsonify({ "orders": list(orders.values()), "missing": missing }), 200
+
+@api.route('/api/orders/<string:order_id>/status', methods=['PUT'])
 def update_order_status_api(order_id):
     # DONE (3): Update order status
-    new_status = dict(request.json)
-    try:
-        order = order_tracker.update_order_status(order_id, new_status.get("new_status"))
-        return jsonify(order), 200
-    except EmptyOrderIdError as e:
-        return { "error": e.MESSAGE }, 400
-    except InvalidInitialStatusError as e:
-        return { "error": e.message }, 400
-    except OrderNotFoundError as e:
-        return { "error": e.message }, 404
-
-@app.route('/api/orders', methods=['GET'])
+    order_tracker = _services().order_tracker
+    body = request_schema.STATUS_UPDATE.validate(request.get_json(silent=True))
+    order = order_tracker.update_order_status(order_id, body["new_status"])
+    return jsonify(order), 200
+
+@api.route('/api/orders/status', methods=['PUT'])
+def update_statuses_api():
+    order_tracker = _services().order_tracker
+    body = request_schema.BULK_STATUS_UPDATE.validate(request.get_json(silent=True))
+    # Each ID is updated and counted once, however often it is listed
+    order_ids = list(dict.fromkeys(body["order_ids"]))
+    results = order_tracker.update_statuses(order_ids, body["new_status"])
+
+    updated, errors = 0, []
+    for order_id, result in zip(order_ids, results):
+        if isinstance(result, ValueError):
+            errors.append({ "order_id": order_id, "error": result.message, "status": error_status(result) })
+        else:
+            updated += 1
+
+    return jsonify({ "updated": updated, "failed": len(errors), "errors": errors }), 200
+
+@api.route('/api/orders', methods=['GET'])
 def list_orders_api():
     # DONE (4): List all orders
     # DONE (5): Filter orders by status
+    order_tracker = _services().order_tracker
+    version = order_tracker.get_version()
+    status = request.args.get('status') or None
+    customer_id = request.args.get('customer_id') or None
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit')
+    since = parse_time('since', request.args.get('since'))
+    until = parse_time('until', request.args.get('until'))
+    if limit is None and cursor is None:
+        orders = order_tracker.iter_orders(status=status, customer_id=customer_id, since=since, until=until)
+        mimetype = 'application/x-ndjson' if request.args.get('format') == 'ndjson' else 'application/json'
+        # Keyed by the recognized parameters, so made-up ones can't fill the cache with copies
+        key = ('orders', status, customer_id, None, None, since, until, mimetype)
+        cached = _cached_response(key, version, mimetype)
+        if cached is not None:
+            return cached
+        stream = _stream_ndjson if mimetype == 'application/x-ndjson' else _stream_json_array
+        return _versioned_response(key, version, stream(orders, current_app.json.dumps), mimetype)
+
+    page_size = parse_limit(limit)
+    # Fetch one extra order to know whether there is a next page
+    orders = order_tracker.iter_orders(
+        status=status, customer_id=customer_id, after=cursor, limit=page_size + 1, since=since, until=until
+    )
+    key = ('orders', status, customer_id, cursor, page_size, since, until, 'application/json')
+    cached = _cached_response(key, version)
+    if cached is not None:
+        return cached
+    return _versioned_response(key, version, [_page_json(list(orders), page_size)])
+
+@api.route('/api/orders/stuck', methods=['GET'])
+def stuck_orders_api():
     status = request.args.get('status')
-    if not status:
-        return jsonify(order_tracker.list_all_orders()), 200
+    older_than = parse_duration('older_than', request.args.get('older_than'))
+    limit = parse_limit(request.args.get('limit'))
+    orders = _services().order_tracker.list_stuck_orders(status, older_than, limit)
+    return jsonify({ "orders": orders }), 200
+
+@api.route('/api/orders/search', methods=['GET'])
+def search_orders_api():
+    order_tracker = _services().order_tracker
+    version = order_tracker.get_version()
+    query = request.args.get('q', '')
+    status = request.args.get('status') or None
+    limit = parse_limit(request.args.get('limit'))
+    tokens = order_rules.validate_search(query, status, limit)
+
+    key = ('search', tuple(tokens), status, limit)
+    cached = _cached_response(key, version)
+    if cached is not None:
+        return cached
+    orders = order_tracker.search_orders(query, status=status, limit=limit)
+    return _versioned_response(key, version, [current_app.json.dumps({ "orders": orders })])
+
+@api.route('/api/orders/stats', methods=['GET'])
+def order_stats_api():
+    order_tracker = _services().order_tracker
+    version = order_tracker.get_version()
+    group_by = request.args.get('group_by') or 'status'
+    metrics = request.args.get('metrics')
+    metrics = tuple(metrics.split(',')) if metrics else order_rules.SUMMARY_METRICS_ALLOWED
+    order_rules.validate_summary(group_by, metrics)
+
+    key = ('stats', group_by, metrics)
+    cached = _cached_response(key, version)
+    if cached is not None:
+        return cached
+    summary = order_tracker.summarize(group_by, metrics)
+    return _versioned_response(key, version, [current_app.json.dumps({ "group_by": group_by, "groups": summary })])
+
+@api.route('/api/orders/events', methods=['GET'])
+def order_events_api():
+    order_events = _services().order_events
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    return Response(
+        _stream_events(
+            order_events, order_events.parse_event_id(last_event_id),
+            current_app.config.get('EVENTS_HEARTBEAT_SECONDS', 15), current_app.json.dumps,
+        ),
+        mimetype='text/event-stream',
+        headers={ "Cache-Control": "no-cache", "X-Accel-Buffering": "no" },
+    )
+
+def _add_order(order_tracker):
+    new_order = request_schema.NEW_ORDER.validate(request.get_json(silent=True))
+    order = order_tracker.add_order(**new_order)
+    return jsonify(order), 201
+
+def _error_response(error):
+    return Response(error_body(error.message), error_status(error), mimetype='application/json')
+
+def _cached_response(key, version, mimetype='application/json'):
+    """
+    Answers without rendering when possible: an empty 304 if the client
+    already has `version`, or the body cached for it. Returns None otherwise.
+    """
+    if version is None:
+        return None
+
+    if request.if_none_match.contains(_etag(version)):
+        return _with_etag(Response(status=304), version)
+
+    body = _services().response_cache.get(key, version)
+    return None if body is None else _with_etag(Response(body, mimetype=mimetype), version)
+
+def _versioned_response(key, version, chunks, mimetype='application/json'):
+    # Streams the JSON text chunks, caching the body for `version` once it is complete
+    if version is None:
+        return Response(chunks, mimetype=mimetype)
+    response_cache = _services().response_cache
+    return _with_etag(Response(response_cache.capture(key, version, chunks), mimetype=mimetype), version)
+
+def _etag(version):
+    return f"{_services().etag_epoch}-{version}"
+
+def _with_etag(response, version):
+    response.set_etag(_etag(version))
+    # Browsers revalidate on every request instead of guessing a freshness lifetime
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+def _page_json(orders, page_size):
+    page = orders[:page_size]
+    next_cursor = page[-1]["order_id"] if len(orders) > page_size else None
+    return current_app.json.dumps({ "orders": page, "next_cursor": next_cursor })
+
+def _iter_ndjson(stream):
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            # Rejected by the schema check, as a malformed row
+            yield line
+
+def _schema_valid_rows(rows, accepted, rejected):
+    # Yields the rows matching NEW_ORDER, noting their numbers in `accepted` and the errors of the others in `rejected`
+    for row_number, row in enumerate(rows):
+        try:
+            row = request_schema.NEW_ORDER.validate(row)
+        except InvalidRequestError as e:
+            rejected[row_number] = e
+            continue
+        accepted.append(row_number)
+        yield row
+
+# The generators below run after the request's app context is gone, so they get what they need as arguments
+def _stream_json_array(orders, dumps):
+    yield '['
+    separator = ''
+    while chunk := list(islice(orders, STREAM_CHUNK_SIZE)):
+        yield separator + ','.join(dumps(order) for order in chunk)
+        separator = ','
+    yield ']'
+
+def _stream_events(order_events, event_id, heartbeat_seconds, dumps):
+    while True:
+        events = None if event_id is None else order_events.wait_for_events(event_id, heartbeat_seconds)
+        if events is None:
+            # Unknown or too old to resume from, the client has to reload the whole list
+            event_id = order_events.last_event_id
+            yield format_reset(order_events, event_id)
+        elif not events:
+            yield KEEP_ALIVE
+        else:
+            event_id = events[-1].event_id
+            yield format_events(order_events, events, dumps)
 
-    return jsonify(order_tracker.list_orders_by_status(status)), 200
+def _stream_ndjson(orders, dumps):
+    while chunk := list(islice(orders, STREAM_CHUNK_SIZE)):
+        yield ''.join(dumps(order) + '\n' for order in chunk)
 
 if __name__ == '__main__':
-    app.run(host="0.0.0.0", debug=True)
+    create_app().run(host="0.0.0.0", debug=True)
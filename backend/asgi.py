@@ -0,0 +1,263 @@
+# ASGI version of the order API in backend/app.py, served by AsyncOrderTracker.
+# Run it with an ASGI server, e.g. `hypercorn backend.asgi:app`.
+import json
+
+from quart import Quart, Response, request, jsonify, send_from_directory
+
+from backend import order_rules, request_schema
+from backend.api_errors import HANDLED_ERRORS, error_body, error_status, register_error_handlers
+from backend.async_order_tracker import AsyncOrderTracker
+from backend.async_storage_adapter import AsyncStorageAdapter
+from backend.columnar_storage import ColumnarStorage
+from backend.exception.invalid_request_error import InvalidRequestError
+from backend.idempotency_store import IdempotencyStore
+from backend.in_memory_storage import InMemoryStorage
+from backend.order_events import KEEP_ALIVE, OrderEventHub, format_events, format_reset
+from backend.order_json_provider import OrderJSONProvider
+from backend.pagination import STREAM_CHUNK_SIZE, parse_duration, parse_limit, parse_time
+from backend.storage_factory import create_storage
+
+app = Quart(__name__, static_folder='../frontend')
+app.json = OrderJSONProvider(app)
+app.config.from_prefixed_env('UDATRACK')
+register_error_handlers(app, Response)
+storage = create_storage(app.config)
+# Only the in-memory stores are safe to call on the event loop, and only without a journal writing to disk
+_non_blocking = isinstance(storage, ColumnarStorage) or (isinstance(storage, InMemoryStorage) and not storage.journaled)
+order_events = OrderEventHub(app.config.get('EVENTS_BUFFER_SIZE', OrderEventHub.DEFAULT_BUFFER_SIZE))
+order_tracker = AsyncOrderTracker(AsyncStorageAdapter(storage, blocking=not _non_blocking), order_events)
+idempotency_keys = IdempotencyStore(
+    app.config.get('IDEMPOTENCY_MAX_BYTES', IdempotencyStore.DEFAULT_MAX_BYTES),
+    app.config.get('IDEMPOTENCY_TTL_SECONDS', IdempotencyStore.DEFAULT_TTL_SECONDS),
+)
+
+@app.route('/')
+async def serve_index():
+    return await send_from_directory(app.static_folder, 'index.html')
+
+@app.route('/<path:filename>')
+async def serve_static(filename):
+    return await send_from_directory(app.static_folder, filename)
+
+@app.route('/api/orders', methods=['POST'])
+async def add_order_api():
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is None:
+        return await _add_order()
+
+    replayed = idempotency_keys.begin(idempotency_key, await request.get_data())
+    if replayed is not None:
+        status, body = replayed
+        return Response(body, status, mimetype='application/json', headers={ "Idempotent-Replayed": "true" })
+
+    try:
+        response = await app.make_response(await _add_order())
+    except HANDLED_ERRORS as e:
+        response = _error_response(e)
+    except BaseException:
+        idempotency_keys.release(idempotency_key)
+        raise
+    if response.status_code >= 500:
+        idempotency_keys.release(idempotency_key)
+    else:
+        idempotency_keys.complete(idempotency_key, response.status_code, await response.get_data())
+    return response
+
+@app.route('/api/orders/bulk', methods=['POST'])
+async def add_orders_bulk_api():
+    if request.mimetype == 'application/x-ndjson':
+        rows = _iter_ndjson(request.body)
+    else:
+        rows = await request.get_json(silent=True)
+        if not isinstance(rows, list):
+            raise InvalidRequestError("expected a JSON array of orders")
+
+    # Rows failing the schema of a single order never reach the tracker, and are reported like its rejections
+    accepted, rejected = [], {}
+    results = await order_tracker.add_orders(_schema_valid_rows(rows, accepted, rejected))
+    outcomes = {**rejected, **dict(zip(accepted, results))}
+
+    created, errors = 0, []
+    for row_number in sorted(outcomes):
+        result = outcomes[row_number]
+        if isinstance(result, ValueError):
+            errors.append({ "row": row_number, "error": result.message, "status": error_status(result) })
+        else:
+            created += 1
+
+    return jsonify({ "created": created, "failed": len(errors), "errors": errors }), 200
+
+@app.route('/api/orders/<string:order_id>', methods=['GET'])
+async def get_order_api(order_id):
+    order = await order_tracker.get_order_by_id(order_id)
+    if not order:
+        return { "error": "Not found" }, 404
+    return jsonify(order), 200
+
+@app.route('/api/orders/batch-get', methods=['POST'])
+async def batch_get_orders_api():
+    body = request_schema.BATCH_GET.validate(await request.get_json(silent=True))
+    orders = await order_tracker.get_orders_by_ids(body["order_ids"])
+    missing = [order_id for order_id in dict.fromkeys(body["order_ids"]) if order_id not in orders]
+    return jsonify({ "orders": list(orders.values()), "missing": missing }), 200
+
+@app.route('/api/orders/<string:order_id>/status', methods=['PUT'])
+async def update_order_status_api(order_id):
+    body = request_schema.STATUS_UPDATE.validate(await request.get_json(silent=True))
+    order = await order_tracker.update_order_status(order_id, body["new_status"])
+    return jsonify(order), 200
+
+@app.route('/api/orders/status', methods=['PUT'])
+async def update_statuses_api():
+    body = request_schema.BULK_STATUS_UPDATE.validate(await request.get_json(silent=True))
+    # Each ID is updated and counted once, however often it is listed
+    order_ids = list(dict.fromkeys(body["order_ids"]))
+    results = await order_tracker.update_statuses(order_ids, body["new_status"])
+
+    updated, errors = 0, []
+    for order_id, result in zip(order_ids, results):
+        if isinstance(result, ValueError):
+            errors.append({ "order_id": order_id, "error": result.message, "status": error_status(result) })
+        else:
+            updated += 1
+
+    return jsonify({ "updated": updated, "failed": len(errors), "errors": errors }), 200
+
+@app.route('/api/orders', methods=['GET'])
+async def list_orders_api():
+    status = request.args.get('status') or None
+    customer_id = request.args.get('customer_id') or None
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit')
+    since = parse_time('since', request.args.get('since'))
+    until = parse_time('until', request.args.get('until'))
+    if limit is None and cursor is None:
+        orders = await order_tracker.iter_orders(status=status, customer_id=customer_id, since=since, until=until)
+        if request.args.get('format') == 'ndjson':
+            return Response(_stream_ndjson(orders), mimetype='application/x-ndjson'), 200
+        return Response(_stream_json_array(orders), mimetype='application/json'), 200
+
+    page_size = parse_limit(limit)
+    # Fetch one extra order to know whether there is a next page
+    orders = [order async for order in await order_tracker.iter_orders(
+        status=status, customer_id=customer_id, after=cursor, limit=page_size + 1, since=since, until=until
+    )]
+    page = orders[:page_size]
+    next_cursor = page[-1]["order_id"] if len(orders) > page_size else None
+    return jsonify({ "orders": page, "next_cursor": next_cursor }), 200
+
+@app.route('/api/orders/stuck', methods=['GET'])
+async def stuck_orders_api():
+    status = request.args.get('status')
+    older_than = parse_duration('older_than', request.args.get('older_than'))
+    limit = parse_limit(request.args.get('limit'))
+    orders = await order_tracker.list_stuck_orders(status, older_than, limit)
+    return jsonify({ "orders": orders }), 200
+
+@app.route('/api/orders/search', methods=['GET'])
+async def search_orders_api():
+    status = request.args.get('status') or None
+    limit = parse_limit(request.args.get('limit'))
+    orders = await order_tracker.search_orders(request.args.get('q', ''), status=status, limit=limit)
+    return jsonify({ "orders": orders }), 200
+
+@app.route('/api/orders/stats', methods=['GET'])
+async def order_stats_api():
+    group_by = request.args.get('group_by') or 'status'
+    metrics = request.args.get('metrics')
+    metrics = metrics.split(',') if metrics else order_rules.SUMMARY_METRICS_ALLOWED
+    summary = await order_tracker.summarize(group_by, metrics)
+    return jsonify({ "group_by": group_by, "groups": summary }), 200
+
+@app.route('/api/orders/events', methods=['GET'])
+async def order_events_api():
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    response = Response(
+        _stream_events(order_events.parse_event_id(last_event_id), app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)),
+        mimetype='text/event-stream',
+        headers={ "Cache-Control": "no-cache", "X-Accel-Buffering": "no" },
+    )
+    # The stream is endless, unlike the responses Quart's default timeout is meant for
+    response.timeout = None
+    return response
+
+async def _add_order():
+    new_order = request_schema.NEW_ORDER.validate(await request.get_json(silent=True))
+    order = await order_tracker.add_order(**new_order)
+    return jsonify(order), 201
+
+def _error_response(error):
+    return Response(error_body(error.message), error_status(error), mimetype='application/json')
+
+async def _iter_ndjson(body):
+    buffer = b''
+    async for data in body:
+        buffer += data
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            if line.strip():
+                yield _parse_ndjson_line(line)
+    if buffer.strip():
+        yield _parse_ndjson_line(buffer)
+
+def _parse_ndjson_line(line):
+    try:
+        return json.loads(line)
+    except ValueError:
+        # Rejected by the schema check, as a malformed row
+        return line
+
+async def _schema_valid_rows(rows, accepted, rejected):
+    # Yields the rows matching NEW_ORDER, noting their numbers in `accepted` and the errors of the others in `rejected`
+    row_number = 0
+    async for row in rows if hasattr(rows, '__aiter__') else _aiter(rows):
+        try:
+            row = request_schema.NEW_ORDER.validate(row)
+        except InvalidRequestError as e:
+            rejected[row_number] = e
+        else:
+            accepted.append(row_number)
+            yield row
+        row_number += 1
+
+async def _aiter(rows):
+    for row in rows:
+        yield row
+
+async def _stream_json_array(orders):
+    dumps = app.json.dumps
+    yield '['
+    chunk, separator = [], ''
+    async for order in orders:
+        chunk.append(dumps(order))
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            yield separator + ','.join(chunk)
+            chunk, separator = [], ','
+    if chunk:
+        yield separator + ','.join(chunk)
+    yield ']'
+
+async def _stream_events(event_id, heartbeat_seconds):
+    dumps = app.json.dumps
+    while True:
+        events = None if event_id is None else await order_events.wait_for_events_async(event_id, heartbeat_seconds)
+        if events is None:
+            # Unknown or too old to resume from, the client has to reload the whole list
+            event_id = order_events.last_event_id
+            yield format_reset(order_events, event_id)
+        elif not events:
+            yield KEEP_ALIVE
+        else:
+            event_id = events[-1].event_id
+            yield format_events(order_events, events, dumps)
+
+async def _stream_ndjson(orders):
+    dumps = app.json.dumps
+    chunk = []
+    async for order in orders:
+        chunk.append(dumps(order) + '\n')
+        if len(chunk) == STREAM_CHUNK_SIZE:
+            yield ''.join(chunk)
+            chunk = []
+    if chunk:
+        yield ''.join(chunk)
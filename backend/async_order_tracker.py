@@ -0,0 +1,269 @@
+# This module contains the AsyncOrderTracker class, the asyncio counterpart of
+# OrderTracker for the ASGI app.
+import time
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Final, Iterable, List, Mapping
+
+from backend import item_search, order_operations, order_rules, time_index
+from backend.exception.duplicate_order_error import DuplicateOrderError
+from backend.exception.empty_customer_id_error import EmptyCustomerIdError
+from backend.exception.empty_order_id_error import EmptyOrderIdError
+from backend.exception.invalid_cursor_error import InvalidCursorError
+from backend.order import Order
+from backend.order_events import OrderEventHub
+
+
+class AsyncOrderTracker:
+    """
+    Manages customer orders over an async storage backend.
+
+    It runs the same steps from backend/order_operations.py as OrderTracker,
+    so it applies the same business rules and raises the same errors. The
+    storage must provide coroutine functions `save_order`, `get_order` and
+    `get_all_orders`. The optional fast paths known by OrderTracker are used
+    when the storage provides them, with `iter_orders` as an async iterator.
+    Wrap synchronous backends in AsyncStorageAdapter.
+    Orders are stamped with the time of `clock`, like in OrderTracker.
+    """
+    MIN_QUANTITY_ALLOWED: Final[int] = order_rules.MIN_QUANTITY_ALLOWED
+    INITIAL_STATUS_ALLOWED: Final[List[str]] = order_rules.INITIAL_STATUS_ALLOWED
+    VALID_STATUS_ALLOWED: Final[List[str]] = order_rules.VALID_STATUS_ALLOWED
+    BULK_CHUNK_SIZE: Final[int] = order_operations.BULK_CHUNK_SIZE
+
+    def __init__(self, storage, events: OrderEventHub = None, clock: Callable[[], float] = time.time):
+        order_operations.check_storage(storage)
+        self.storage = storage
+        self.events = events
+        self.clock = clock
+
+    async def add_order(self, order_id: str, item_name: str, quantity: int, customer_id: str, status: str = "pending"):
+        order = order_operations.new_order(order_id, item_name, quantity, customer_id, status, self.clock())
+
+        if self.__supports('insert_if_absent'):
+            if not await self.storage.insert_if_absent(order_id, order):
+                raise DuplicateOrderError(order_id)
+        elif await self.storage.get_order(order_id) is not None:
+            raise DuplicateOrderError(order_id)
+        else:
+            await self.storage.save_order(order_id, order)
+
+        self.__publish(OrderEventHub.CREATED, order)
+        return order
+
+    async def add_orders(self, orders: Iterable[Mapping] | AsyncIterable[Mapping]) -> List[Order | ValueError]:
+        """
+        Adds many orders at once, see OrderTracker.add_orders. Also accepts an
+        async iterable, e.g. rows parsed from a streamed request body.
+        """
+        results = []
+        chunk = []
+        async for row in self.__aiter(orders):
+            chunk.append(row)
+            if len(chunk) == self.BULK_CHUNK_SIZE:
+                results.extend(await self.__add_chunk(chunk))
+                chunk = []
+        if chunk:
+            results.extend(await self.__add_chunk(chunk))
+        return results
+
+    async def get_order_by_id(self, order_id: str):
+        if not order_id:
+            raise EmptyOrderIdError()
+
+        return await self.storage.get_order(order_id)
+
+    async def get_orders_by_ids(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, see OrderTracker.get_orders_by_ids.
+        """
+        order_ids = order_operations.unique_order_ids(order_ids)
+
+        if not self.__supports('get_orders'):
+            return {order_id: order for order_id in order_ids if (order := await self.storage.get_order(order_id))}
+
+        found = {}
+        for chunk in order_operations.chunks(order_ids, self.BULK_CHUNK_SIZE):
+            found.update(await self.storage.get_orders(chunk))
+        return found
+
+    async def update_order_status(self, order_id: str, new_status: str):
+        if not order_id:
+            raise EmptyOrderIdError()
+
+        order_rules.validate_status(new_status)
+
+        if self.__supports('compare_and_set_status'):
+            # Retry until no concurrent writer changed the status between the read and the swap
+            while True:
+                status = order_operations.status_update(order_id, await self.storage.get_order(order_id), new_status)
+                updated = await self.storage.compare_and_set_status(order_id, status, new_status, self.clock())
+                if updated is not None:
+                    self.__publish(OrderEventHub.STATUS_CHANGED, updated)
+                    return updated
+
+        order = await self.storage.get_order(order_id)
+        order_operations.status_update(order_id, order, new_status)
+
+        order = Order.from_mapping(order).with_status(new_status, self.clock())
+        await self.storage.save_order(order_id, order)
+        self.__publish(OrderEventHub.STATUS_CHANGED, order)
+        return order
+
+    async def update_statuses(self, order_ids: Iterable[str], new_status: str) -> List[Order | ValueError]:
+        """
+        Moves many orders to `new_status` at once, see OrderTracker.update_statuses.
+        """
+        order_rules.validate_status(new_status)
+
+        results = []
+        for chunk in order_operations.chunks(order_ids, self.BULK_CHUNK_SIZE):
+            results.extend(await self.__update_chunk(chunk, new_status))
+        return results
+
+    async def summarize(self, group_by: str = 'status',
+                        metrics: Iterable[str] = order_rules.SUMMARY_METRICS_ALLOWED) -> Dict[str, Dict[str, int]]:
+        """
+        Aggregates the orders by `group_by`, see OrderTracker.summarize.
+        """
+        metrics = tuple(metrics)
+        order_rules.validate_summary(group_by, metrics)
+
+        if self.__supports('summarize'):
+            return order_rules.build_summary(await self.storage.summarize(group_by), metrics)
+
+        return order_operations.summarize_orders((await self.storage.get_all_orders()).values(), group_by, metrics)
+
+    async def list_all_orders(self):
+        return list((await self.storage.get_all_orders()).values())
+
+    async def list_orders_by_status(self, status: str):
+        order_rules.validate_status(status)
+
+        if self.__supports('get_orders_by_status'):
+            return list((await self.storage.get_orders_by_status(status)).values())
+
+        return list(order_operations.filter_orders((await self.storage.get_all_orders()).values(), status))
+
+    async def list_orders_by_customer(self, customer_id: str, status: str = None):
+        if not customer_id:
+            raise EmptyCustomerIdError()
+
+        if status is not None:
+            order_rules.validate_status(status)
+
+        if self.__supports('get_orders_by_customer'):
+            return list((await self.storage.get_orders_by_customer(customer_id, status)).values())
+
+        return list(order_operations.filter_orders((await self.storage.get_all_orders()).values(), status, customer_id))
+
+    async def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                          customer_id: str = None, since: float = None, until: float = None) -> AsyncIterator[Order]:
+        """
+        Validates the arguments and returns an async iterator over the orders,
+        see OrderTracker.iter_orders.
+        """
+        order_rules.validate_page(status, limit)
+        order_rules.validate_time_range(since, until)
+
+        if after is not None and await self.storage.get_order(after) is None:
+            raise InvalidCursorError(after)
+
+        if since is not None or until is not None:
+            if self.__supports('iter_orders_by_time'):
+                return self.storage.iter_orders_by_time(since, until, status, customer_id, after, limit)
+            orders = (await self.storage.get_all_orders()).values()
+            return self.__aiter(islice(time_index.scan_created(orders, since, until, status, customer_id, after), limit))
+
+        if self.__supports('iter_orders'):
+            if customer_id is None:
+                return self.storage.iter_orders(status=status, after=after, limit=limit)
+            return self.storage.iter_orders(status=status, after=after, limit=limit, customer_id=customer_id)
+
+        orders = await self.storage.get_all_orders()
+        return self.__aiter(islice(order_operations.scan_orders(orders, status, after, customer_id), limit))
+
+    async def list_stuck_orders(self, status: str, older_than: float, limit: int = None) -> List[Order]:
+        """
+        Returns the orders in `status` for more than `older_than` seconds, see
+        OrderTracker.list_stuck_orders.
+        """
+        order_rules.validate_stuck(status, older_than, limit)
+
+        before = self.clock() - older_than
+        if self.__supports('get_stale_orders'):
+            return await self.storage.get_stale_orders(status, before, limit)
+
+        return time_index.scan_stale((await self.storage.get_all_orders()).values(), status, before, limit)
+
+    async def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the orders whose item name matches `query`, see OrderTracker.search_orders.
+        """
+        tokens = order_rules.validate_search(query, status, limit)
+
+        if self.__supports('search_orders'):
+            return await self.storage.search_orders(query, status, limit)
+
+        return item_search.scan((await self.storage.get_all_orders()).values(), tokens, status, limit)
+
+    async def __add_chunk(self, rows: List[Mapping]) -> List[Order | ValueError]:
+        results, candidates = order_operations.prepare_new_orders(rows, self.clock())
+        existing_ids = await self.__insert_orders_if_absent(
+            {order_id: order for order_id, (_, order) in candidates.items()}
+        )
+        for order in order_operations.complete_new_orders(results, candidates, existing_ids):
+            self.__publish(OrderEventHub.CREATED, order)
+        return results
+
+    async def __update_chunk(self, order_ids: List[str], new_status: str) -> List[Order | ValueError]:
+        if not self.__supports('transition_statuses'):
+            outcomes = {}
+            for order_id in order_ids:
+                if order_id not in outcomes:
+                    try:
+                        outcomes[order_id] = await self.update_order_status(order_id, new_status)
+                    except ValueError as e:
+                        outcomes[order_id] = e
+            return [outcomes[order_id] for order_id in order_ids]
+
+        updated, rejected = await self.storage.transition_statuses(
+            [order_id for order_id in order_ids if order_id], new_status, order_rules.source_statuses(new_status),
+            self.clock(),
+        )
+        for order in updated.values():
+            self.__publish(OrderEventHub.STATUS_CHANGED, order)
+        return order_operations.transition_results(order_ids, new_status, updated, rejected)
+
+    async def __insert_orders_if_absent(self, orders: Mapping[str, Order]) -> set:
+        if self.__supports('insert_orders_if_absent'):
+            return await self.storage.insert_orders_if_absent(orders)
+
+        if self.__supports('find_existing_ids'):
+            existing_ids = await self.storage.find_existing_ids(list(orders))
+        else:
+            existing_ids = {order_id for order_id in orders if await self.storage.get_order(order_id) is not None}
+
+        new_orders = {order_id: order for order_id, order in orders.items() if order_id not in existing_ids}
+        if self.__supports('save_orders'):
+            await self.storage.save_orders(new_orders)
+        else:
+            for order_id, order in new_orders.items():
+                await self.storage.save_order(order_id, order)
+
+        return existing_ids
+
+    def __publish(self, event_type: str, order: Order):
+        if self.events is not None:
+            self.events.publish(event_type, order)
+
+    def __supports(self, method: str) -> bool:
+        return callable(getattr(self.storage, method, None))
+
+    @staticmethod
+    async def __aiter(rows):
+        if hasattr(rows, '__aiter__'):
+            async for row in rows:
+                yield row
+        else:
+            for row in rows:
+                yield row
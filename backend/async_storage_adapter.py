@@ -0,0 +1,61 @@
+# This module adapts synchronous storage backends to the async storage protocol
+# used by AsyncOrderTracker.
+import asyncio
+from functools import partial
+from itertools import islice
+from typing import Final
+
+
+class AsyncStorageAdapter:
+    """
+    Exposes a synchronous storage backend through the async storage protocol.
+
+    Every public method of the wrapped storage becomes a coroutine function,
+    except the `iter_` ones, e.g. `iter_orders`, which become async iterators. Methods the wrapped
+    storage lacks are missing here too, so optional capabilities carry over.
+
+    With `blocking=True` each call runs in a worker thread, so disk or
+    database I/O never stalls the event loop. In-memory backends don't block
+    and are called inline, which avoids the thread hand-off.
+    """
+    ITER_CHUNK_SIZE: Final[int] = 500
+
+    def __init__(self, storage, blocking: bool = False):
+        self._storage = storage
+        self._blocking = blocking
+
+    def __getattr__(self, name: str):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        method = getattr(self._storage, name)
+        if not callable(method):
+            raise AttributeError(name)
+
+        wrapper = self.__iterator(method) if name.startswith('iter_') else self.__coroutine(method)
+        # Cached on the instance, so __getattr__ only runs once per method
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def __coroutine(self, method):
+        if self._blocking:
+            async def call(*args, **kwargs):
+                return await asyncio.to_thread(method, *args, **kwargs)
+        else:
+            async def call(*args, **kwargs):
+                return method(*args, **kwargs)
+        return call
+
+    def __iterator(self, method):
+        chunk_size = self.ITER_CHUNK_SIZE
+        blocking = self._blocking
+
+        async def iterate(*args, **kwargs):
+            orders = iter(method(*args, **kwargs))
+            while True:
+                next_chunk = partial(list, islice(orders, chunk_size))
+                chunk = await asyncio.to_thread(next_chunk) if blocking else next_chunk()
+                if not chunk:
+                    return
+                for order in chunk:
+                    yield order
+        return iterate
@@ -0,0 +1,5 @@
+import sys
+
+from backend.benchmarks.runner import main
+
+sys.exit(main())
@@ -0,0 +1,264 @@
+# Benchmark runner for OrderTracker over every storage backend and for the
+# Flask endpoints. Results are written as JSON so releases can be compared:
+#
+#   python -m backend.benchmarks --sizes 1000 100000 --output results.json
+#   python -m backend.benchmarks --compare baseline.json --threshold 1.25
+#   python -m backend.benchmarks --memory --no-http --backends memory columnar
+import argparse
+import gc
+import json
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from itertools import cycle, islice
+from typing import Callable, Dict, Final, List, Tuple
+
+from backend.columnar_storage import ColumnarStorage
+from backend.in_memory_storage import InMemoryStorage
+from backend.order import Order
+from backend.order_journal import OrderJournal
+from backend.order_tracker import OrderTracker
+from backend.sqlite_storage import SqliteStorage
+
+DEFAULT_SIZES: Final[Tuple[int, ...]] = (1_000, 100_000, 1_000_000)
+SEED_STATUSES: Final[Tuple[str, ...]] = ('pending', 'processing', 'shipped', 'delivered', 'cancelled')
+SEED_CHUNK_SIZE: Final[int] = 10_000
+# IDs resolved per batch lookup, the size of a typical fulfillment batch
+BATCH_SIZE: Final[int] = 100
+
+BACKENDS: Final[Dict[str, Callable[[str], object]]] = {
+    'memory': lambda directory: InMemoryStorage(),
+    'journaled': lambda directory: InMemoryStorage(OrderJournal(directory, fsync='never', snapshot_every=10**9)),
+    'columnar': lambda directory: ColumnarStorage(),
+    'sqlite': lambda directory: SqliteStorage(f"{directory}/orders.db"),
+}
+# Backends that keep their orders on the Python heap, where tracemalloc sees them
+MEMORY_BACKENDS: Final[Tuple[str, ...]] = ('memory', 'journaled', 'columnar')
+TRACKER_CASES: Final[Tuple[str, ...]] = (
+    'add_order', 'get_order_by_id', 'get_orders_by_ids', 'update_order_status', 'list_all_orders',
+    'list_orders_by_status',
+)
+# The endpoints run on a private in-memory store, whatever store the UDATRACK_ environment selects
+HTTP_APP_CONFIG: Final[Dict[str, object]] = {'STORAGE': 'memory', 'JOURNAL_DIR': None, 'SHARDS': None, 'CACHE_SIZE': None}
+HTTP_CASES: Final[Tuple[str, ...]] = (
+    'POST /api/orders', 'GET /api/orders/<id>', 'POST /api/orders/batch-get', 'PUT /api/orders/<id>/status',
+    'GET /api/orders', 'GET /api/orders?status=',
+)
+
+
+def seed(storage, size: int):
+    """
+    Fills the storage with `size` orders whose statuses cycle through SEED_STATUSES.
+    """
+    orders = (
+        Order(f"ord-{i:08d}", f"item-{i % 97}", 1 + i % 5, f"cust-{i % 1000:04d}", status)
+        for i, status in zip(range(size), cycle(SEED_STATUSES))
+    )
+    save_orders = getattr(storage, 'save_orders', None)
+    while chunk := {order.order_id: order for order in islice(orders, SEED_CHUNK_SIZE)}:
+        if save_orders is not None:
+            save_orders(chunk)
+        else:
+            for order_id, order in chunk.items():
+                storage.save_order(order_id, order)
+
+
+def pending_ids(size: int) -> List[str]:
+    # Seeded orders in 'pending', which may always move on to 'processing'
+    return [f"ord-{i:08d}" for i in range(0, size, len(SEED_STATUSES))]
+
+
+def batch(order_ids: List[str], i: int) -> List[str]:
+    # BATCH_SIZE IDs starting at the i-th, wrapping around
+    return [order_ids[(i + offset) % len(order_ids)] for offset in range(BATCH_SIZE)]
+
+
+def measure(call: Callable[[int], object], operations: int) -> dict:
+    durations = []
+    for i in range(operations):
+        started = time.perf_counter_ns()
+        call(i)
+        durations.append(time.perf_counter_ns() - started)
+    return summarize(durations)
+
+
+def summarize(durations: List[int]) -> dict:
+    total = sum(durations)
+    ordered = sorted(durations)
+    return {
+        "operations": len(durations),
+        "total_s": total / 1e9,
+        "mean_us": total / len(durations) / 1e3,
+        "p50_us": ordered[len(ordered) // 2] / 1e3,
+        "p95_us": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] / 1e3,
+        "ops_per_s": len(durations) / (total / 1e9) if total else None,
+    }
+
+
+def run_tracker_cases(backend: str, size: int, operations: int, list_operations: int) -> List[dict]:
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        storage = BACKENDS[backend](directory)
+        started = time.perf_counter_ns()
+        seed(storage, size)
+        results.append(result('seed', backend, size, summarize([time.perf_counter_ns() - started])))
+
+        tracker = OrderTracker(storage)
+        rng = random.Random(size)
+        existing = [f"ord-{rng.randrange(size):08d}" for _ in range(operations)]
+        updatable = pending_ids(size)[:operations]
+        cases = {
+            'add_order': (lambda i: tracker.add_order(f"new-{i:08d}", 'item', 1, 'cust-new'), operations),
+            'get_order_by_id': (lambda i: tracker.get_order_by_id(existing[i]), operations),
+            'get_orders_by_ids': (lambda i: tracker.get_orders_by_ids(batch(existing, i)), operations),
+            'update_order_status': (lambda i: tracker.update_order_status(updatable[i], 'processing'), len(updatable)),
+            'list_all_orders': (lambda i: tracker.list_all_orders(), list_operations),
+            'list_orders_by_status': (lambda i: tracker.list_orders_by_status('shipped'), list_operations),
+        }
+        for case in TRACKER_CASES:
+            call, count = cases[case]
+            results.append(result(case, backend, size, measure(call, count)))
+
+        if backend == 'journaled':
+            storage.close()
+            started = time.perf_counter_ns()
+            BACKENDS[backend](directory).close()
+            results.append(result('startup', backend, size, summarize([time.perf_counter_ns() - started])))
+        elif hasattr(storage, 'close'):
+            storage.close()
+    return results
+
+
+def run_http_cases(size: int, operations: int, list_operations: int) -> List[dict]:
+    from backend.app import create_app
+
+    app = create_app(HTTP_APP_CONFIG)
+    seed(app.extensions['udatrack'].storage, size)
+    client = app.test_client()
+    rng = random.Random(size)
+    existing = [f"ord-{rng.randrange(size):08d}" for _ in range(operations)]
+    updatable = pending_ids(size)[:operations]
+    cases = {
+        'POST /api/orders': (lambda i: client.post('/api/orders', json={
+            "order_id": f"new-{i:08d}", "item_name": "item", "quantity": 1, "customer_id": "cust-new",
+        }), operations),
+        'GET /api/orders/<id>': (lambda i: client.get(f"/api/orders/{existing[i]}"), operations),
+        'POST /api/orders/batch-get': (lambda i: client.post(
+            '/api/orders/batch-get', json={"order_ids": batch(existing, i)},
+        ), operations),
+        'PUT /api/orders/<id>/status': (lambda i: client.put(
+            f"/api/orders/{updatable[i]}/status", json={"new_status": "processing"},
+        ), len(updatable)),
+        'GET /api/orders': (lambda i: client.get('/api/orders').get_data(), list_operations),
+        'GET /api/orders?status=': (lambda i: client.get('/api/orders?status=shipped').get_data(), list_operations),
+    }
+    return [result(case, 'http', size, measure(*cases[case])) for case in HTTP_CASES]
+
+
+def measure_memory(backend: str, size: int) -> dict:
+    """
+    Returns the memory a `backend` store of `size` seeded orders holds on to,
+    as traced by tracemalloc, so the in-memory layouts can be compared.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        tracemalloc.start()
+        try:
+            storage = BACKENDS[backend](directory)
+            seed(storage, size)
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        if hasattr(storage, 'close'):
+            storage.close()
+    return {"backend": backend, "size": size, "bytes": retained, "bytes_per_order": retained / size}
+
+
+def result(case: str, backend: str, size: int, stats: dict) -> dict:
+    return {"case": case, "backend": backend, "size": size, **stats}
+
+
+def run(sizes, backends, operations: int, list_operations: int, http: bool = True, memory: bool = False,
+        log=print) -> dict:
+    results, footprints = [], []
+    for size in sizes:
+        if memory:
+            for backend in backends:
+                if backend in MEMORY_BACKENDS:
+                    log(f"{backend} @ {size} orders, memory")
+                    footprints.append(measure_memory(backend, size))
+        for backend in backends:
+            log(f"{backend} @ {size} orders")
+            results.extend(run_tracker_cases(backend, size, operations, list_operations))
+        if http:
+            log(f"http @ {size} orders")
+            results.extend(run_http_cases(size, operations, list_operations))
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "operations": operations,
+            "list_operations": list_operations,
+        },
+        "results": results,
+        "memory": footprints,
+    }
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> List[dict]:
+    """
+    Returns the cases whose mean latency grew by more than `threshold` times
+    the baseline. Cases missing from either run are ignored.
+    """
+    key = lambda entry: (entry["case"], entry["backend"], entry["size"])
+    previous = {key(entry): entry for entry in baseline["results"]}
+    regressions = []
+    for entry in current["results"]:
+        before = previous.get(key(entry))
+        if before and before["mean_us"] and entry["mean_us"] / before["mean_us"] > threshold:
+            regressions.append({
+                "case": entry["case"], "backend": entry["backend"], "size": entry["size"],
+                "baseline_mean_us": before["mean_us"], "mean_us": entry["mean_us"],
+                "ratio": entry["mean_us"] / before["mean_us"],
+            })
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m backend.benchmarks', description='Benchmarks OrderTracker, storage backends and HTTP endpoints.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=list(DEFAULT_SIZES))
+    parser.add_argument('--backends', nargs='+', choices=sorted(BACKENDS), default=sorted(BACKENDS))
+    parser.add_argument('--operations', type=int, default=1000, help='calls per single-order case')
+    parser.add_argument('--list-operations', type=int, default=5, help='calls per whole-list case')
+    parser.add_argument('--no-http', action='store_true', help='skip the Flask endpoint cases')
+    parser.add_argument('--memory', action='store_true', help='also measure the memory held by in-memory backends')
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--compare', metavar='BASELINE', help='results file to check for regressions')
+    parser.add_argument('--threshold', type=float, default=1.25, help='allowed mean latency ratio')
+    args = parser.parse_args(argv)
+
+    report = run(args.sizes, args.backends, args.operations, args.list_operations, http=not args.no_http,
+                 memory=args.memory, log=lambda message: print(message, file=sys.stderr))
+    with open(args.output, 'w', encoding='utf-8') as output:
+        json.dump(report, output, indent=2)
+
+    for entry in report["results"]:
+        print(f"{entry['backend']:>10} {entry['size']:>9} {entry['case']:<30} "
+              f"mean {entry['mean_us']:>12.1f} us  p95 {entry['p95_us']:>12.1f} us")
+    for entry in report["memory"]:
+        print(f"{entry['backend']:>10} {entry['size']:>9} {'memory':<30} "
+              f"{entry['bytes'] / 2**20:>10.1f} MiB  {entry['bytes_per_order']:>8.1f} bytes/order")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline:
+            regressions = compare(report, json.load(baseline), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression['backend']} {regression['size']} {regression['case']}: "
+                  f"{regression['ratio']:.2f}x slower", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
@@ -0,0 +1,258 @@
+# This file provides a read-through cache that wraps any storage backend.
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Collection, Dict, Final, Iterable, Iterator, List, Mapping, Tuple
+
+from backend.order import Order
+
+# Marks a cached lookup of an order ID that doesn't exist
+_MISSING: Final = object()
+
+
+class CachingStorage:
+    """
+    Read-through cache in front of a storage backend.
+
+    `get_order` results are kept in a bounded LRU cache of `max_size` entries,
+    misses included, so repeated lookups of unknown IDs (e.g. duplicate checks)
+    don't reach the backend either. `get_all_orders` is cached as a whole and
+    dropped on every write. With `ttl_seconds`, cached entries expire, which
+    bounds staleness when other processes write to the same backend. Misses
+    expire after `negative_ttl_seconds` (`ttl_seconds` by default), and 0
+    doesn't cache them at all, e.g. when other processes create orders.
+
+    Writes go through to the backend first and then invalidate the entries
+    they touch, so the next read fetches the stored order: a write that
+    finishes later can't leave an older value cached. Reads that can't be
+    answered from single entries (status or customer queries, pagination) are
+    passed to the backend unchanged.
+
+    Instances only expose the optional storage methods the wrapped backend
+    implements, so OrderTracker picks the same fast paths as without cache.
+    """
+    OPTIONAL_METHODS: Final[Tuple[str, ...]] = (
+        'save_orders', 'insert_if_absent', 'insert_orders_if_absent', 'compare_and_set_status',
+        'transition_statuses', 'find_existing_ids', 'get_orders', 'get_orders_by_status', 'get_orders_by_customer', 'iter_orders',
+        'iter_orders_by_time', 'get_stale_orders', 'search_orders', 'count_orders', 'summarize', 'get_version', 'get_order_version', 'snapshot', 'clear',
+        'replace_orders', 'close',
+    )
+    _classes: Dict[Tuple[type, type], type] = {}
+
+    def __new__(cls, storage, *args, **kwargs):
+        backend = type(storage)
+        subclass = cls._classes.get((cls, backend))
+        if subclass is None:
+            # Methods the backend lacks are set to None, so capability checks see them as missing
+            missing = {name: None for name in cls.OPTIONAL_METHODS if not callable(getattr(backend, name, None))}
+            subclass = cls._classes.setdefault((cls, backend), type(f"Caching{backend.__name__}", (cls,), missing))
+        return super().__new__(subclass)
+
+    def __init__(self, storage, max_size: int = 10_000, ttl_seconds: float = None,
+                 negative_ttl_seconds: float = None, clock: Callable[[], float] = time.monotonic):
+        self._storage = storage
+        self._max_size = max_size
+        self._ttl = ttl_seconds
+        self._negative_ttl = ttl_seconds if negative_ttl_seconds is None else negative_ttl_seconds
+        self._clock = clock
+        # order_id -> (order or _MISSING, expires_at)
+        self._entries = OrderedDict()
+        self._all_orders = None
+        # Bumped by every write; a read only fills the cache if no write happened meanwhile
+        self._generation = 0
+        self._lock = threading.Lock()
+        self._hits = self._misses = self._negative_hits = self._evictions = 0
+        self._list_hits = self._list_misses = 0
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        self._storage.save_order(order_id, Order.from_mapping(order_data))
+        self.__written([order_id])
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        self._storage.save_orders(orders)
+        self.__written(orders)
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        inserted = self._storage.insert_if_absent(order_id, Order.from_mapping(order_data))
+        self.__written([order_id])
+        return inserted
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        skipped = self._storage.insert_orders_if_absent(orders)
+        self.__written(orders)
+        return skipped
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        order = self._storage.compare_and_set_status(order_id, expected_status, new_status, at)
+        self.__written([order_id])
+        return order
+
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        updated, rejected = self._storage.transition_statuses(order_ids, new_status, from_statuses, at)
+        self.__written(updated)
+        return updated, rejected
+
+    def get_order(self, order_id: str):
+        with self._lock:
+            cached = self.__cached(order_id)
+            if cached is not None:
+                return None if cached is _MISSING else cached
+            generation = self._generation
+
+        order = self._storage.get_order(order_id)
+        with self._lock:
+            if generation == self._generation:
+                self.__put(order_id, _MISSING if order is None else order)
+        return order
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order,
+        fetching only the uncached ones from the backend, in one batch.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        found, uncached = {}, []
+        with self._lock:
+            for order_id in order_ids:
+                cached = self.__cached(order_id)
+                if cached is None:
+                    uncached.append(order_id)
+                elif cached is not _MISSING:
+                    found[order_id] = cached
+            generation = self._generation
+
+        if uncached:
+            fetched = self._storage.get_orders(uncached)
+            with self._lock:
+                if generation == self._generation:
+                    for order_id in uncached:
+                        self.__put(order_id, fetched.get(order_id, _MISSING))
+            found.update(fetched)
+        return {order_id: found[order_id] for order_id in order_ids if order_id in found}
+
+    def get_all_orders(self):
+        with self._lock:
+            cached = self._all_orders
+            if cached is not None and not self.__expired(cached[1]):
+                self._list_hits += 1
+                return dict(cached[0])
+            self._list_misses += 1
+            generation = self._generation
+
+        orders = self._storage.get_all_orders()
+        with self._lock:
+            if generation == self._generation:
+                self._all_orders = dict(orders), self.__expires_at(self._ttl)
+        return orders
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        return self._storage.find_existing_ids(order_ids)
+
+    def get_orders_by_status(self, status: str):
+        return self._storage.get_orders_by_status(status)
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        return self._storage.get_orders_by_customer(customer_id, status)
+
+    def iter_orders(self, *args, **kwargs) -> Iterator[Order]:
+        return self._storage.iter_orders(*args, **kwargs)
+
+    def iter_orders_by_time(self, *args, **kwargs) -> Iterator[Order]:
+        return self._storage.iter_orders_by_time(*args, **kwargs)
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        return self._storage.get_stale_orders(status, before, limit)
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        return self._storage.search_orders(query, status, limit)
+
+    def count_orders(self) -> int:
+        return self._storage.count_orders()
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        return self._storage.summarize(group_by)
+
+    def get_version(self) -> int:
+        return self._storage.get_version()
+
+    def get_order_version(self, order_id: str) -> int | None:
+        return self._storage.get_order_version(order_id)
+
+    def snapshot(self):
+        self._storage.snapshot()
+
+    def clear(self):
+        self._storage.clear()
+        self.__forget_all()
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        self._storage.replace_orders(orders)
+        self.__forget_all()
+
+    def close(self):
+        self._storage.close()
+
+    def cache_stats(self) -> dict:
+        """
+        Returns the hit/miss counters and the current size, to help sizing the cache.
+        """
+        with self._lock:
+            lookups = self._hits + self._negative_hits + self._misses
+            return {
+                "size": len(self._entries),
+                "max_size": self._max_size,
+                "hits": self._hits,
+                "negative_hits": self._negative_hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "hit_ratio": (self._hits + self._negative_hits) / lookups if lookups else 0.0,
+                "list_hits": self._list_hits,
+                "list_misses": self._list_misses,
+            }
+
+    def __written(self, order_ids: Iterable[str]):
+        # Dropped rather than updated: concurrent writers may finish in any order,
+        # and a bulk import doesn't flush the hot entries out of the LRU
+        with self._lock:
+            self._generation += 1
+            self._all_orders = None
+            for order_id in order_ids:
+                self._entries.pop(order_id, None)
+
+    def __forget_all(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._all_orders = None
+
+    def __cached(self, order_id: str):
+        # Caller holds the lock. Returns the cached order or _MISSING, None when not cached
+        entry = self._entries.get(order_id)
+        if entry is None or self.__expired(entry[1]):
+            self._misses += 1
+            return None
+        self._entries.move_to_end(order_id)
+        if entry[0] is _MISSING:
+            self._negative_hits += 1
+        else:
+            self._hits += 1
+        return entry[0]
+
+    def __put(self, order_id: str, value):
+        ttl = self._negative_ttl if value is _MISSING else self._ttl
+        if ttl == 0:
+            return
+        entries = self._entries
+        entries[order_id] = value, self.__expires_at(ttl)
+        entries.move_to_end(order_id)
+        while len(entries) > self._max_size:
+            entries.popitem(last=False)
+            self._evictions += 1
+
+    def __expires_at(self, ttl: float | None) -> float | None:
+        return None if ttl is None else self._clock() + ttl
+
+    def __expired(self, expires_at: float | None) -> bool:
+        return expires_at is not None and self._clock() >= expires_at
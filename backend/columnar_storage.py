@@ -0,0 +1,431 @@
+# This file provides a column-oriented in-memory storage implementation for
+# large order sets. Data stored here will be lost when the application restarts.
+import heapq
+import math
+import threading
+from array import array
+from itertools import islice
+from typing import Collection, Dict, Final, Iterable, Iterator, List, Mapping, Tuple
+
+from backend.item_search import ItemNameIndex, tokenize
+from backend.order import Order
+from backend.order_totals import OrderTotals
+from backend.time_index import OrderTimeIndexes
+
+# Stands for a missing time in the time columns
+_NO_TIME: Final[float] = math.nan
+
+
+def _time(at: float) -> float | None:
+    return None if at != at else at
+
+
+class _StringTable:
+    """
+    Interns repeated strings as small integer codes.
+    """
+    __slots__ = ('values', '_codes')
+
+    def __init__(self):
+        self.values = []
+        self._codes = {}
+
+    def code(self, value: str) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def find(self, value: str) -> int | None:
+        return self._codes.get(value)
+
+    def clear(self):
+        self.values.clear()
+        self._codes.clear()
+
+
+class ColumnarStorage:
+    """
+    In-memory implementation of the storage interface that keeps orders in
+    columns instead of one record per order.
+
+    Every order is a row: its ID in a list, `item_name` and `customer_id` as
+    codes into tables of distinct strings, `status` as a one-byte code,
+    `quantity` and the timestamps in typed arrays. Status histories are
+    kept as tuples. An order costs well under half of what an
+    InMemoryStorage order does (`python -m backend.benchmarks --memory`), at
+    the price of building the Order record on every read.
+
+    A dict maps IDs to rows. Status and customer filters are searches over the
+    code columns that run in C (`bytearray.find`, `array.index`), so rows that
+    don't match cost no Python work. Item names are indexed by ItemNameIndex
+    as they are interned, so a search scans the item column for the codes of
+    the matching names only, and time queries bisect the same time indexes
+    as InMemoryStorage. Rows keep their insertion position, which
+    gives the same stable key order as InMemoryStorage, and every write bumps
+    the same store-wide and per-order versions.
+
+    A single lock serializes writes and the reading of rows, so records are
+    never torn and the conditional writes are atomic. Long reads take it once
+    per `SCAN_CHUNK_SIZE` rows, so they don't hold up writers.
+    """
+    SCAN_CHUNK_SIZE: Final[int] = 500
+
+    def __init__(self):
+        self._ids = []
+        self._rows = {}
+        self._item_names = _StringTable()
+        self._item_search = ItemNameIndex()
+        self._customers = _StringTable()
+        self._statuses = _StringTable()
+        self._item_codes = array('i')
+        self._customer_codes = array('i')
+        self._status_codes = bytearray()
+        self._quantities = array('q')
+        self._order_versions = array('q')
+        self._created_times = array('d')
+        self._updated_times = array('d')
+        self._histories = []
+        self._time_indexes = OrderTimeIndexes()
+        self._totals = OrderTotals()
+        self._version = 0
+        self._lock = threading.Lock()
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        with self._lock:
+            self.__write(order_id, order_data)
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        with self._lock:
+            for order_id, order_data in orders.items():
+                self.__write(order_id, order_data)
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        """
+        Saves the order unless one with the same ID exists. Returns whether it was saved.
+        """
+        with self._lock:
+            if order_id in self._rows:
+                return False
+            self.__write(order_id, order_data)
+        return True
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        """
+        Saves every order whose ID is not taken yet. Returns the IDs that were skipped.
+        """
+        skipped = set()
+        with self._lock:
+            for order_id, order_data in orders.items():
+                if order_id in self._rows:
+                    skipped.add(order_id)
+                else:
+                    self.__write(order_id, order_data)
+        return skipped
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        """
+        Atomically moves the order from `expected_status` to `new_status`,
+        recording the change at time `at` when given. Returns the updated
+        order, or None when the order is missing or its status is no longer
+        `expected_status`.
+        """
+        with self._lock:
+            row = self._rows.get(order_id)
+            if row is None or self._status_codes[row] != self._statuses.find(expected_status):
+                return None
+            self.__set_status(row, self._statuses.code(new_status), at)
+            return self.__order(row)
+
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        """
+        Atomically moves every listed order whose status is in `from_statuses`
+        to `new_status`, recording the change at time `at` when given. Returns
+        the updated orders by ID, and the current status of the orders left
+        alone. Missing IDs are in neither.
+        """
+        updated, rejected = {}, {}
+        with self._lock:
+            new_code = self._statuses.code(new_status)
+            source_codes = {self._statuses.find(status) for status in from_statuses}
+            for order_id in dict.fromkeys(order_ids):
+                row = self._rows.get(order_id)
+                if row is None:
+                    continue
+                if self._status_codes[row] in source_codes:
+                    self.__set_status(row, new_code, at)
+                    updated[order_id] = self.__order(row)
+                else:
+                    rejected[order_id] = self._statuses.values[self._status_codes[row]]
+        return updated, rejected
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        return self._rows.keys() & order_ids
+
+    def get_order(self, order_id: str):
+        with self._lock:
+            row = self._rows.get(order_id)
+            return None if row is None else self.__order(row)
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order,
+        built under one lock acquisition.
+        """
+        with self._lock:
+            rows = self._rows
+            found = [order_id for order_id in dict.fromkeys(order_ids) if order_id in rows]
+            return dict(zip(found, self.__orders([rows[order_id] for order_id in found])))
+
+    def get_all_orders(self):
+        return {order.order_id: order for order in self.iter_orders()}
+
+    def count_orders(self) -> int:
+        return len(self._ids)
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get_order_version(self, order_id: str) -> int | None:
+        with self._lock:
+            row = self._rows.get(order_id)
+            return None if row is None else self._order_versions[row]
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the order count and quantity sum of every group of `group_by`,
+        one of OrderTotals.FIELDS.
+        """
+        with self._lock:
+            return self._totals.summary(group_by)
+
+    def get_orders_by_status(self, status: str):
+        return {order.order_id: order for order in self.iter_orders(status=status)}
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        return {order.order_id: order for order in self.iter_orders(status=status, customer_id=customer_id)}
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None) -> Iterator[Order]:
+        """
+        Yields orders in insertion order, optionally restricted to a status
+        and/or a customer and starting right after the order with ID `after`.
+        """
+        start = 0 if after is None else self._rows[after] + 1
+        rows = islice(self.__scan(status, customer_id, start), limit)
+        while True:
+            with self._lock:
+                chunk = self.__orders(list(islice(rows, self.SCAN_CHUNK_SIZE)))
+            if not chunk:
+                return
+            yield from chunk
+
+    def iter_orders_by_time(self, since: float = None, until: float = None, status: str = None,
+                            customer_id: str = None, after: str = None, limit: int = None) -> Iterator[Order]:
+        """
+        Yields the orders created in [since, until), oldest first, optionally
+        restricted to a status and/or a customer and starting right after the
+        order with ID `after`. Orders without a creation time are left out.
+        """
+        with self._lock:
+            row = None if after is None else self._rows.get(after)
+            cursor = None if row is None or _time(self._created_times[row]) is None else (self._created_times[row], row)
+            positions = self._time_indexes.created.positions(since, until, cursor)
+            status_code = None if status is None else self._statuses.find(status)
+            customer = None if customer_id is None else self._customers.find(customer_id)
+        if (status is not None and status_code is None) or (customer_id is not None and customer is None):
+            return
+        statuses, customers = self._status_codes, self._customer_codes
+        rows = islice((
+            row for row in positions
+            if (status_code is None or statuses[row] == status_code) and (customer is None or customers[row] == customer)
+        ), limit)
+        while True:
+            with self._lock:
+                chunk = self.__orders(list(islice(rows, self.SCAN_CHUNK_SIZE)))
+            if not chunk:
+                return
+            yield from chunk
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        """
+        Returns the orders that entered `status` before time `before` and are
+        still in it, longest waiting first.
+        """
+        with self._lock:
+            return self.__orders(list(self._time_indexes.stale(status, before, limit)))
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the orders, in insertion order, whose item name matches every
+        token of `query` as a prefix, optionally restricted to a status.
+        """
+        with self._lock:
+            names = self._item_search.find(tokenize(query))
+            status_code = None if status is None else self._statuses.find(status)
+            if not names or (status is not None and status_code is None):
+                return []
+            items = [self._item_names.find(name) for name in names]
+        rows = islice(heapq.merge(*(self.__scan_item(item, status_code) for item in items)), limit)
+        found = []
+        while True:
+            with self._lock:
+                chunk = self.__orders(list(islice(rows, self.SCAN_CHUNK_SIZE)))
+            if not chunk:
+                return found
+            found.extend(chunk)
+
+    def clear(self):
+        with self._lock:
+            self.__empty()
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        """
+        Atomically replaces every stored order with `orders`.
+        """
+        with self._lock:
+            self.__empty()
+            for order_id, order_data in orders.items():
+                self.__write(order_id, order_data)
+
+    def __empty(self):
+        # Caller holds the lock. Columns are emptied in place, so scans still running just find no more rows
+        self._ids.clear()
+        self._rows.clear()
+        self._totals.clear()
+        self._item_search.clear()
+        self._histories.clear()
+        self._time_indexes = OrderTimeIndexes()
+        for table in (self._item_names, self._customers, self._statuses):
+            table.clear()
+        for column in (self._item_codes, self._customer_codes, self._status_codes,
+                       self._quantities, self._order_versions, self._created_times, self._updated_times):
+            del column[:]
+        # Kept growing, so versions handed out before the clear are never reused
+        self._version += 1
+
+    def __write(self, order_id: str, order_data: Mapping):
+        # Caller holds the lock
+        order = Order.from_mapping(order_data)
+        item = self._item_names.find(order.item_name)
+        if item is None:
+            item = self._item_names.code(order.item_name)
+            self._item_search.add(order.item_name)
+        customer = self._customers.code(order.customer_id)
+        status = self._statuses.code(order.status)
+        created_at = _NO_TIME if order.created_at is None else order.created_at
+        updated_at = _NO_TIME if order.updated_at is None else order.updated_at
+        self._version += 1
+        row = self._rows.get(order_id)
+        previous = None
+        if row is None:
+            row = self._rows[order_id] = len(self._ids)
+            self._ids.append(order_id)
+            self._item_codes.append(item)
+            self._customer_codes.append(customer)
+            self._status_codes.append(status)
+            self._quantities.append(order.quantity)
+            self._order_versions.append(self._version)
+            self._created_times.append(created_at)
+            self._updated_times.append(updated_at)
+            self._histories.append(order.history)
+        else:
+            previous = self.__order(row)
+            self._totals.add(previous, -1)
+            self._item_codes[row] = item
+            self._customer_codes[row] = customer
+            self._status_codes[row] = status
+            self._quantities[row] = order.quantity
+            self._order_versions[row] = self._version
+            self._created_times[row] = created_at
+            self._updated_times[row] = updated_at
+            self._histories[row] = order.history
+        self._totals.add(order)
+        self._time_indexes.update(row, previous, order)
+
+    def __set_status(self, row: int, status: int, at: float | None):
+        self._version += 1
+        previous = self.__order(row)
+        order = previous.with_status(self._statuses.values[status], at)
+        self._totals.add(previous, -1)
+        self._status_codes[row] = status
+        self._order_versions[row] = self._version
+        if at is not None:
+            self._updated_times[row] = at
+            self._histories[row] = order.history
+        self._totals.add(order)
+        self._time_indexes.update(row, previous, order)
+
+    def __order(self, row: int) -> Order:
+        return Order(
+            self._ids[row],
+            self._item_names.values[self._item_codes[row]],
+            self._quantities[row],
+            self._customers.values[self._customer_codes[row]],
+            self._statuses.values[self._status_codes[row]],
+            _time(self._created_times[row]),
+            _time(self._updated_times[row]),
+            self._histories[row],
+        )
+
+    def __orders(self, rows: list) -> list:
+        # Builds a chunk of records column by column, the lookups run in C
+        row_values = lambda column: map(column.__getitem__, rows)
+        return list(map(
+            Order,
+            row_values(self._ids),
+            map(self._item_names.values.__getitem__, row_values(self._item_codes)),
+            row_values(self._quantities),
+            map(self._customers.values.__getitem__, row_values(self._customer_codes)),
+            map(self._statuses.values.__getitem__, row_values(self._status_codes)),
+            map(_time, row_values(self._created_times)),
+            map(_time, row_values(self._updated_times)),
+            row_values(self._histories),
+        ))
+
+    def __scan_item(self, item: int, status_code: int | None) -> Iterator[int]:
+        # Yields the rows of an item code, stepped under the lock like `__scan`
+        codes, statuses, row = self._item_codes, self._status_codes, 0
+        while True:
+            try:
+                row = codes.index(item, row)
+            except ValueError:
+                return
+            if status_code is None or statuses[row] == status_code:
+                yield row
+            row += 1
+
+    def __scan(self, status: str | None, customer_id: str | None, start: int) -> Iterator[int]:
+        # Yields the matching rows from `start` on. Codes of values never stored match
+        # nothing. Callers step it under the lock, one chunk at a time.
+        if customer_id is not None:
+            customer = self._customers.find(customer_id)
+            status_code = None if status is None else self._statuses.find(status)
+            if customer is None or (status is not None and status_code is None):
+                return
+            codes, statuses, row = self._customer_codes, self._status_codes, start
+            while True:
+                try:
+                    row = codes.index(customer, row)
+                except ValueError:
+                    return
+                if status_code is None or statuses[row] == status_code:
+                    yield row
+                row += 1
+        elif status is not None:
+            status_code = self._statuses.find(status)
+            if status_code is None:
+                return
+            statuses = self._status_codes
+            row = statuses.find(status_code, start)
+            while row != -1:
+                yield row
+                row = statuses.find(status_code, row + 1)
+        else:
+            row = start
+            while row < len(self._ids):
+                yield row
+                row += 1
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class EmptyCustomerIdError(ValueError):
+    MESSAGE: Final[str] = "'customer_id' cannot be empty."
+    def __init__(self, *args):
+        self.message = self.MESSAGE
+        super(EmptyCustomerIdError, self).__init__(self.message, *args)
\ No newline at end of file
@@ -4,4 +4,5 @@ from typing import Final
 class EmptyOrderIdError(ValueError):
     MESSAGE: Final[str] = "'order_id' cannot be empty."
     def __init__(self, *args):
-        super(EmptyOrderIdError, self).__init__(self.MESSAGE, *args)
\ No newline at end of file
+        self.message = self.MESSAGE
+        super(EmptyOrderIdError, self).__init__(self.message, *args)
\ No newline at end of file
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class IdempotencyKeyInUseError(ValueError):
+    MESSAGE: Final[str] = "A request with idempotency key '{}' is still in progress."
+    def __init__(self, key, *args):
+        self.message = self.MESSAGE.format(key)
+        super(IdempotencyKeyInUseError, self).__init__(self.message, *args)
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class IdempotencyKeyReusedError(ValueError):
+    MESSAGE: Final[str] = "Idempotency key '{}' was already used for a different request."
+    def __init__(self, key, *args):
+        self.message = self.MESSAGE.format(key)
+        super(IdempotencyKeyReusedError, self).__init__(self.message, *args)
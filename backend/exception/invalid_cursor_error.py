@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class InvalidCursorError(ValueError):
+    MESSAGE: Final[str] = "Invalid cursor, order with ID '{}' not found."
+    def __init__(self, cursor, *args):
+        self.message = self.MESSAGE.format(cursor)
+        super(InvalidCursorError, self).__init__(self.message, *args)
@@ -0,0 +1,9 @@
+from typing import Final
+
+
+class InvalidGroupByError(ValueError):
+    MESSAGE: Final[str] = "Invalid group_by, allowed '{}' but '{}' given."
+
+    def __init__(self, group_by_allowed, group_by, *args):
+        self.message = self.MESSAGE.format(", ".join(group_by_allowed), group_by)
+        super(InvalidGroupByError, self).__init__(self.message, *args)
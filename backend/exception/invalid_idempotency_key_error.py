@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class InvalidIdempotencyKeyError(ValueError):
+    MESSAGE: Final[str] = "Invalid idempotency key, 1 to {} characters allowed but {} given."
+    def __init__(self, max_length, length, *args):
+        self.message = self.MESSAGE.format(max_length, length)
+        super(InvalidIdempotencyKeyError, self).__init__(self.message, *args)
@@ -0,0 +1,9 @@
+from typing import Final
+
+
+class InvalidMetricError(ValueError):
+    MESSAGE: Final[str] = "Invalid metric, allowed '{}' but '{}' given."
+
+    def __init__(self, metrics_allowed, metric, *args):
+        self.message = self.MESSAGE.format(", ".join(metrics_allowed), metric)
+        super(InvalidMetricError, self).__init__(self.message, *args)
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class InvalidPageLimitError(ValueError):
+    MESSAGE: Final[str] = "Page limit must be a positive integer, '{}' given."
+    def __init__(self, limit, *args):
+        self.message = self.MESSAGE.format(limit)
+        super(InvalidPageLimitError, self).__init__(self.message, *args)
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class InvalidRequestError(ValueError):
+    MESSAGE: Final[str] = "Invalid request body, {}."
+    def __init__(self, reason, *args):
+        self.message = self.MESSAGE.format(reason)
+        super(InvalidRequestError, self).__init__(self.message, *args)
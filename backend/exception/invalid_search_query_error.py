@@ -0,0 +1,9 @@
+from typing import Final
+
+
+class InvalidSearchQueryError(ValueError):
+    MESSAGE: Final[str] = "Invalid search query, expected at least one word but '{}' given."
+
+    def __init__(self, query, *args):
+        self.message = self.MESSAGE.format(query)
+        super(InvalidSearchQueryError, self).__init__(self.message, *args)
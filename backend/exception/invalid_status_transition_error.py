@@ -0,0 +1,9 @@
+from typing import Final
+
+
+class InvalidStatusTransitionError(ValueError):
+    MESSAGE: Final[str] = "Invalid status transition from '{}' to '{}'."
+
+    def __init__(self, current_status, new_status, *args):
+        self.message = self.MESSAGE.format(current_status, new_status)
+        super(InvalidStatusTransitionError, self).__init__(self.message, *args)
@@ -0,0 +1,9 @@
+from typing import Final
+
+
+class InvalidTimeParameterError(ValueError):
+    MESSAGE: Final[str] = "Invalid '{}', expected {} but '{}' given."
+
+    def __init__(self, name, value, expected, *args):
+        self.message = self.MESSAGE.format(name, expected, value)
+        super(InvalidTimeParameterError, self).__init__(self.message, *args)
@@ -0,0 +1,8 @@
+from typing import Final
+
+
+class MalformedOrderError(ValueError):
+    MESSAGE: Final[str] = "Malformed order, {}."
+    def __init__(self, reason, *args):
+        self.message = self.MESSAGE.format(reason)
+        super(MalformedOrderError, self).__init__(self.message, *args)
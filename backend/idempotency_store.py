@@ -0,0 +1,116 @@
+# This module contains the store of responses to requests sent with an
+# Idempotency-Key header, which makes order creation safe to retry.
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Final, Tuple
+
+from backend.exception.idempotency_key_in_use_error import IdempotencyKeyInUseError
+from backend.exception.idempotency_key_reused_error import IdempotencyKeyReusedError
+from backend.exception.invalid_idempotency_key_error import InvalidIdempotencyKeyError
+
+
+class IdempotencyStore:
+    """
+    Bounded, expiring store of the responses sent for idempotency keys.
+
+    `begin` reserves a key for a request body, or returns the response stored
+    for it, so a retry is answered without running the request again. Only a
+    16-byte digest of the body is kept, to tell a retry from a different
+    request reusing the key.
+
+    Entries expire `ttl_seconds` after they were last written. They are kept
+    in that order, so expired entries are dropped from the front on every
+    write, and the oldest ones are evicted early once keys and bodies take
+    more than `max_bytes`. Memory stays bounded at any request rate; at very
+    high rates keys just expire sooner.
+    """
+    DEFAULT_MAX_BYTES: Final[int] = 16 * 1024 * 1024
+    DEFAULT_TTL_SECONDS: Final[float] = 24 * 60 * 60
+    MAX_KEY_LENGTH: Final[int] = 255
+    # Rough cost of an entry besides its key and body: dict slot, tuple, digest
+    ENTRY_OVERHEAD_BYTES: Final[int] = 200
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES, ttl_seconds: float = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.monotonic):
+        self._max_bytes = max_bytes
+        self._ttl = ttl_seconds
+        self._clock = clock
+        # key -> (body digest, expires_at, status or None while in progress, response body)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def begin(self, key: str, body: bytes) -> Tuple[int, bytes] | None:
+        """
+        Returns the (status, body) stored for `key`, or None after reserving
+        the key for this request; finish it with `complete` or `release`.
+        Raises when the key was used for a different body or its first
+        request is still running.
+        """
+        if not 0 < len(key) <= self.MAX_KEY_LENGTH:
+            raise InvalidIdempotencyKeyError(self.MAX_KEY_LENGTH, len(key))
+        digest = hashlib.blake2b(body, digest_size=16).digest()
+        with self._lock:
+            now = self._clock()
+            self.__expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.__put(key, (digest, now + self._ttl, None, b''))
+                return None
+        if entry[0] != digest:
+            raise IdempotencyKeyReusedError(key)
+        if entry[2] is None:
+            raise IdempotencyKeyInUseError(key)
+        return entry[2], entry[3]
+
+    def complete(self, key: str, status: int, body: bytes):
+        """
+        Stores the response of the request that reserved `key`.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            # Gone when evicted meanwhile, then retries just run again
+            if entry is not None and entry[2] is None:
+                now = self._clock()
+                self.__put(key, (entry[0], now + self._ttl, status, body))
+                self.__expire(now)
+
+    def release(self, key: str):
+        """
+        Frees a reserved key without storing a response, e.g. after an
+        unexpected error, so a retry runs the request again.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                self.__remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __put(self, key: str, entry: tuple):
+        # Caller holds the lock
+        if key in self._entries:
+            self.__remove(key)
+        self._entries[key] = entry
+        self._size += self.__entry_size(key, entry)
+        while self._size > self._max_bytes and len(self._entries) > 1:
+            self.__remove(next(iter(self._entries)))
+
+    def __expire(self, now: float):
+        # Entries are ordered by expiry, so only the front needs checking
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if entry[1] > now:
+                return
+            self.__remove(key)
+
+    def __remove(self, key: str):
+        self._size -= self.__entry_size(key, self._entries.pop(key))
+
+    def __entry_size(self, key: str, entry: tuple) -> int:
+        return len(key) + len(entry[3]) + self.ENTRY_OVERHEAD_BYTES
@@ -1,22 +1,417 @@
 # This file provides a simple in-memory storage implementation for orders.
-# Data stored here will be lost when the application restarts.
+# Data stored here will be lost when the application restarts, unless an
+# OrderJournal is attached.
+import heapq
+import threading
+from array import array
+from bisect import bisect_right, insort
+from contextlib import ExitStack, contextmanager
+from typing import Collection, Dict, Iterable, Iterator, List, Mapping, Tuple
+
+from backend.item_search import ItemNameIndex, tokenize
+from backend.order import Order
+from backend.order_journal import OrderJournal
+from backend.order_totals import OrderTotals
+from backend.time_index import OrderTimeIndexes
+
 
 class InMemoryStorage:
     """
     A simple in-memory implementation of the storage interface.
-    Stores orders in a Python dictionary.
+    Stores immutable Order records in a Python dictionary. Every order keeps the
+    position it was first inserted at, which gives a stable key order for
+    cursor pagination, and secondary indexes keep the sorted positions of the
+    orders of each status, customer and item name, so filtered reads only
+    touch matching orders. An ItemNameIndex resolves search queries to the
+    item names whose orders are read. Running totals per status, item and
+    customer make summaries independent of the number of orders. Time
+    indexes keep the orders sorted by creation time, and those of each
+    status by when they entered it, for time range and stuck order queries.
+    Records are shared with callers, so reads never copy them.
+
+    Every write bumps a store-wide version, and each order remembers the
+    version of its last write, so callers can tell cheaply whether anything
+    changed since they last read it.
+
+    Writes are serialized per order by a lock chosen from `stripes` buckets by
+    the hash of the order ID, so writers of different orders rarely contend.
+    `insert_if_absent` and `compare_and_set_status` are atomic under that lock,
+    batch writes hold the locks of all their orders.
+
+    With a `journal`, the store is rebuilt from it on startup and every write
+    is logged to it before being applied, so reads stay at memory speed while
+    the data survives restarts.
     """
-    def __init__(self):
+    def __init__(self, journal: OrderJournal = None, stripes: int = 64):
         self._orders = {}
+        self._sequence = []
+        self._positions = {}
+        self._status_index = {}
+        self._customer_index = {}
+        self._item_index = {}
+        self._item_names = ItemNameIndex()
+        self._time_indexes = OrderTimeIndexes()
+        self._totals = OrderTotals()
+        self._version = 0
+        # Version of the last write of each order, by position
+        self._order_versions = array('q')
+        self._stripes = [threading.Lock() for _ in range(stripes)]
+        # Guards the shared sequence and indexes, held only to update them
+        self._index_lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        self._journal = journal
+        if journal is not None:
+            for order in journal.replay():
+                self.__apply(order.order_id, order)
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        order = Order.from_mapping(order_data)
+        with self.__stripe(order_id):
+            self.__write(((order_id, order),))
+        self.__snapshot_if_due()
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        orders = [(order_id, Order.from_mapping(order_data)) for order_id, order_data in orders.items()]
+        with self.__stripes_of(order_id for order_id, _ in orders):
+            self.__write(orders)
+        self.__snapshot_if_due()
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        """
+        Saves the order unless one with the same ID exists. Returns whether it was saved.
+        """
+        order = Order.from_mapping(order_data)
+        with self.__stripe(order_id):
+            if order_id in self._orders:
+                return False
+            self.__write(((order_id, order),))
+        self.__snapshot_if_due()
+        return True
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        """
+        Saves every order whose ID is not taken yet. Returns the IDs that were skipped.
+        """
+        skipped = set()
+        orders = [(order_id, Order.from_mapping(order_data)) for order_id, order_data in orders.items()]
+        with self.__stripes_of(order_id for order_id, _ in orders):
+            new_orders = []
+            for order_id, order in orders:
+                if order_id in self._orders:
+                    skipped.add(order_id)
+                else:
+                    new_orders.append((order_id, order))
+            self.__write(new_orders)
+        self.__snapshot_if_due()
+        return skipped
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        """
+        Atomically moves the order from `expected_status` to `new_status`,
+        recording the change at time `at` when given. Returns the updated
+        order, or None when the order is missing or its status is no longer
+        `expected_status`.
+        """
+        with self.__stripe(order_id):
+            current = self._orders.get(order_id)
+            if current is None or current.status != expected_status:
+                return None
+            order = current.with_status(new_status, at)
+            self.__write(((order_id, order),))
+        self.__snapshot_if_due()
+        return order
 
-    def save_order(self, order_id: str, order_data: dict):
-        self._orders[order_id] = order_data.copy()
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        """
+        Atomically moves every listed order whose status is in `from_statuses`
+        to `new_status`, recording the change at time `at` when given. Returns
+        the updated orders by ID, and the current status of the orders left
+        alone. Missing IDs are in neither.
+        """
+        updated, rejected = {}, {}
+        order_ids = list(dict.fromkeys(order_ids))
+        with self.__stripes_of(order_ids):
+            for order_id in order_ids:
+                current = self._orders.get(order_id)
+                if current is None:
+                    continue
+                if current.status in from_statuses:
+                    updated[order_id] = current.with_status(new_status, at)
+                else:
+                    rejected[order_id] = current.status
+            self.__write(list(updated.items()))
+        self.__snapshot_if_due()
+        return updated, rejected
+
+    def snapshot(self):
+        if self._journal is None:
+            return
+        with self._snapshot_lock:
+            # Copy and rotate with writers paused, then write the snapshot without blocking them
+            with self.__all_stripes():
+                orders = list(self._orders.values())
+                self._journal.rotate()
+            self._journal.write_snapshot(orders)
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        return self._orders.keys() & order_ids
 
     def get_order(self, order_id: str):
-        return self._orders.get(order_id, {}).copy() if self._orders.get(order_id) else None
+        return self._orders.get(order_id)
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order.
+        """
+        orders = self._orders
+        return {order_id: order for order_id in order_ids if (order := orders.get(order_id)) is not None}
 
     def get_all_orders(self):
-        return {k: v.copy() for k, v in self._orders.items()}
+        return dict(self._orders)
+
+    def count_orders(self) -> int:
+        return len(self._orders)
+
+    def get_version(self) -> int:
+        return self._version
+
+    def get_order_version(self, order_id: str) -> int | None:
+        position = self._positions.get(order_id)
+        return None if position is None else self._order_versions[position]
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the order count and quantity sum of every group of `group_by`,
+        one of OrderTotals.FIELDS.
+        """
+        with self._index_lock:
+            return self._totals.summary(group_by)
+
+    def get_orders_by_status(self, status: str):
+        orders, sequence = self._orders, self._sequence
+        return {sequence[p]: orders[sequence[p]] for p in self._status_index.get(status, [])[:]}
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        return {order.order_id: order for order in self.iter_orders(status=status, customer_id=customer_id)}
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None) -> Iterator[Order]:
+        """
+        Yields orders in insertion order, optionally restricted to a status
+        and/or a customer and starting right after the order with ID `after`.
+        """
+        orders, sequence = self._orders, self._sequence
+        positions, field, value = self.__select(status, customer_id)
+        start = 0 if after is None else bisect_right(positions, self._positions[after])
+        if field is None:
+            stop = len(positions) if limit is None else start + limit
+            # Slicing snapshots the positions, so writes during iteration are harmless
+            for position in positions[start:stop]:
+                yield orders[sequence[position]]
+            return
+
+        produced = 0
+        for position in positions[start:]:
+            if produced == limit:
+                return
+            order = orders[sequence[position]]
+            if getattr(order, field) == value:
+                produced += 1
+                yield order
+
+    def iter_orders_by_time(self, since: float = None, until: float = None, status: str = None,
+                            customer_id: str = None, after: str = None, limit: int = None) -> Iterator[Order]:
+        """
+        Yields the orders created in [since, until), oldest first, optionally
+        restricted to a status and/or a customer and starting right after the
+        order with ID `after`. Orders without a creation time are left out.
+        """
+        orders, sequence = self._orders, self._sequence
+        with self._index_lock:
+            cursor = None if after is None else self.__created_key(after)
+            # Without filters the limit applies to the index, otherwise to the matching orders
+            filtered = status is not None or customer_id is not None
+            positions = self._time_indexes.created.positions(since, until, cursor, None if filtered else limit)
+        produced = 0
+        for position in positions:
+            if produced == limit:
+                return
+            order = orders[sequence[position]]
+            if (status is None or order.status == status) and (customer_id is None or order.customer_id == customer_id):
+                produced += 1
+                yield order
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        """
+        Returns the orders that entered `status` before time `before` and are
+        still in it, longest waiting first.
+        """
+        with self._index_lock:
+            positions = self._time_indexes.stale(status, before, limit)
+        orders, sequence = self._orders, self._sequence
+        return [orders[sequence[position]] for position in positions]
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the orders, in insertion order, whose item name matches every
+        token of `query` as a prefix, optionally restricted to a status.
+        """
+        with self._index_lock:
+            buckets = [self._item_index[name][:] for name in self._item_names.find(tokenize(query))]
+        orders, sequence = self._orders, self._sequence
+        found = []
+        for position in heapq.merge(*buckets):
+            if len(found) == limit:
+                break
+            order = orders[sequence[position]]
+            if status is None or order.status == status:
+                found.append(order)
+        return found
 
     def clear(self):
-        self._orders = {}
+        with self.__all_stripes():
+            self.__empty()
+            if self._journal is not None:
+                self._journal.reset()
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        """
+        Atomically replaces every stored order with `orders`. With a journal,
+        they are written as its new snapshot before the store changes, so a
+        crash leaves the previous orders or the new ones, at worst with the
+        dropped orders the log still held brought back.
+        """
+        orders = [(order_id, Order.from_mapping(order_data)) for order_id, order_data in orders.items()]
+        with self._snapshot_lock, self.__all_stripes():
+            if self._journal is not None:
+                self._journal.rotate()
+                self._journal.write_snapshot(order for _, order in orders)
+            self.__empty()
+            with self._index_lock:
+                for order_id, order in orders:
+                    self.__apply(order_id, order)
+
+    @property
+    def journaled(self) -> bool:
+        """
+        Whether writes go to a journal, i.e. may wait on file writes and fsyncs.
+        """
+        return self._journal is not None
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+
+    def __stripe(self, order_id: str) -> threading.Lock:
+        return self._stripes[hash(order_id) % len(self._stripes)]
+
+    @contextmanager
+    def __stripes_of(self, order_ids):
+        # A batch holds the stripes of all its orders at once, so it is applied in
+        # its own order. Stripes are always taken in index order, which rules out deadlocks.
+        with ExitStack() as stack:
+            for stripe in sorted({hash(order_id) % len(self._stripes) for order_id in order_ids}):
+                stack.enter_context(self._stripes[stripe])
+            yield
+
+    @contextmanager
+    def __all_stripes(self):
+        with ExitStack() as stack:
+            for stripe in self._stripes:
+                stack.enter_context(stripe)
+            yield
+
+    def __empty(self):
+        # Caller holds every stripe
+        with self._index_lock:
+            self._orders = {}
+            self._sequence = []
+            self._positions = {}
+            self._status_index = {}
+            self._customer_index = {}
+            self._item_index = {}
+            self._item_names = ItemNameIndex()
+            self._time_indexes = OrderTimeIndexes()
+            self._totals = OrderTotals()
+            self._order_versions = array('q')
+            # Kept growing, so versions handed out before the clear are never reused
+            self._version += 1
+
+    def __write(self, orders):
+        # Caller holds the stripe lock of every order, so log order matches apply order
+        if not orders:
+            return
+        if self._journal is not None:
+            self._journal.append_many(order for _, order in orders)
+        with self._index_lock:
+            for order_id, order in orders:
+                self.__apply(order_id, order)
+
+    def __apply(self, order_id: str, order: Order):
+        previous = self._orders.get(order_id)
+        self._orders[order_id] = order
+        self._version += 1
+        if previous is None:
+            self._positions[order_id] = len(self._sequence)
+            self._sequence.append(order_id)
+            self._order_versions.append(self._version)
+        position = self._positions[order_id]
+        self._order_versions[position] = self._version
+        self.__reindex(self._status_index, position, previous and previous.status, order.status)
+        self.__reindex(self._customer_index, position, previous and previous.customer_id, order.customer_id)
+        if previous is None or previous.item_name != order.item_name:
+            self.__reindex_item(position, previous and previous.item_name, order.item_name)
+        self._time_indexes.update(position, previous, order)
+        if previous is not None:
+            self._totals.add(previous, -1)
+        self._totals.add(order)
+
+    def __snapshot_if_due(self):
+        if self._journal is not None and self._journal.should_snapshot() and not self._snapshot_lock.locked():
+            self.snapshot()
+
+    def __select(self, status: str | None, customer_id: str | None):
+        # Returns the positions to walk, plus the field still to check on each order.
+        # With both filters, the smaller index is walked, so cost follows the result size.
+        if status is None and customer_id is None:
+            return range(len(self._sequence)), None, None
+        if customer_id is None:
+            return self._status_index.get(status, []), None, None
+        by_customer = self._customer_index.get(customer_id, [])
+        if status is None:
+            return by_customer, None, None
+        by_status = self._status_index.get(status, [])
+        if len(by_customer) <= len(by_status):
+            return by_customer, 'status', status
+        return by_status, 'customer_id', customer_id
+
+    def __reindex_item(self, position: int, previous_name: str | None, name: str):
+        # The name index only holds names some order still has
+        if name not in self._item_index:
+            self._item_names.add(name)
+        self.__reindex(self._item_index, position, previous_name, name)
+        if previous_name is not None and previous_name not in self._item_index:
+            self._item_names.remove(previous_name)
+
+    def __created_key(self, order_id: str) -> Tuple[float, int] | None:
+        # Where a cursor order sits in the creation time index
+        position = self._positions.get(order_id)
+        order = self._orders.get(order_id)
+        if position is None or order is None or order.created_at is None:
+            return None
+        return order.created_at, position
+
+    @staticmethod
+    def __reindex(index: dict, position: int, previous_key: str | None, key: str):
+        if previous_key is not None:
+            if previous_key == key:
+                return
+            bucket = index.get(previous_key)
+            if bucket is not None:
+                del bucket[bisect_right(bucket, position) - 1]
+                if not bucket:
+                    del index[previous_key]
+
+        insort(index.setdefault(key, []), position)
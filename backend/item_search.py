@@ -0,0 +1,94 @@
+# This module contains the item name search shared by the storage backends:
+# how names and queries are split into tokens, and the index of the tokens.
+import functools
+import re
+from bisect import bisect_left, insort
+from itertools import islice
+from typing import Final, Iterable, List, Set
+
+from backend.order import Order
+
+_TOKEN: Final[re.Pattern] = re.compile(r'\w+')
+# Sorts after every token starting with a given prefix
+PREFIX_END: Final[str] = '\U0010ffff'
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Returns the lowercase words of `text`.
+    """
+    return _TOKEN.findall(text.casefold())
+
+
+def matches(query_tokens: Iterable[str], item_name: str) -> bool:
+    """
+    Whether every query token is a prefix of a token of `item_name`, the
+    rule every index follows.
+    """
+    name_tokens = tokenize(item_name)
+    return all(any(token.startswith(prefix) for token in name_tokens) for prefix in query_tokens)
+
+
+class ItemNameIndex:
+    """
+    Inverted index from tokens to the distinct item names containing them.
+
+    Tokens are also kept in a sorted list, so the tokens starting with a
+    prefix are one bisect away. Names, not orders, are indexed: a shop has
+    far fewer products than orders, so the index stays small and a query
+    resolves to a handful of names before any order is read.
+    """
+    def __init__(self):
+        self._names = {}
+        self._tokens = []
+
+    def add(self, item_name: str):
+        for token in set(tokenize(item_name)):
+            names = self._names.get(token)
+            if names is None:
+                names = self._names[token] = set()
+                insort(self._tokens, token)
+            names.add(item_name)
+
+    def remove(self, item_name: str):
+        for token in set(tokenize(item_name)):
+            names = self._names.get(token)
+            if names is None:
+                continue
+            names.discard(item_name)
+            if not names:
+                del self._names[token]
+                del self._tokens[bisect_left(self._tokens, token)]
+
+    def find(self, query_tokens: Iterable[str]) -> Set[str]:
+        """
+        Returns the names matching every query token, see `matches`.
+        """
+        found = None
+        # Longest prefixes first, they usually match the fewest names
+        for prefix in sorted(set(query_tokens), key=len, reverse=True):
+            start = bisect_left(self._tokens, prefix)
+            stop = bisect_left(self._tokens, prefix + PREFIX_END, start)
+            names = set().union(*(self._names[token] for token in self._tokens[start:stop]))
+            found = names if found is None else found & names
+            if not found:
+                return set()
+        return found or set()
+
+    def clear(self):
+        self._names = {}
+        self._tokens = []
+
+
+def scan(orders: Iterable[Order], query_tokens: List[str], status: str = None, limit: int = None) -> List[Order]:
+    """
+    Returns the matching orders of `orders`, in their order, for storages
+    without a search index.
+    """
+    # Each distinct name is tokenized once, however many orders share it
+    name_matches = functools.lru_cache(maxsize=None)(lambda item_name: matches(query_tokens, item_name))
+    found = (
+        order for order in orders
+        if (status is None or order['status'] == status) and name_matches(order['item_name'])
+    )
+    return list(islice(found, limit))
@@ -0,0 +1,5 @@
+import sys
+
+from backend.loadgen.runner import main
+
+sys.exit(main())
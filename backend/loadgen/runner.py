@@ -0,0 +1,237 @@
+# Load generator for the order API. Sends a weighted mix of add, get, status
+# update and filtered list requests, or replays an NDJSON request log, at a
+# target rate and concurrency, to the Flask app in-process or to a running
+# server, and reports latency percentiles, throughput and errors:
+#
+#   python -m backend.loadgen --requests 10000 --concurrency 8 --rate 500
+#   python -m backend.loadgen --url http://127.0.0.1:5000 --duration 60 --mix add=10,get=70,update_status=10,list=10
+#   python -m backend.loadgen --replay requests.ndjson --max-error-rate 0.01 --output loadgen_results.json
+import argparse
+import json
+import math
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from datetime import datetime, timezone
+from typing import Dict, Final, Iterable, List, NamedTuple, TextIO, Tuple
+
+from backend.api_errors import ERROR_STATUSES
+from backend.loadgen.targets import HttpTarget, InProcessTarget
+from backend.loadgen.traffic import DEFAULT_MIX, Request, TrafficMix, parse_mix, read_requests, write_request
+
+DEFAULT_REQUESTS: Final[int] = 1000
+# In-process runs get a private in-memory store, so load never lands in the store the UDATRACK_ environment selects
+IN_PROCESS_APP_CONFIG: Final[Dict[str, object]] = {'STORAGE': 'memory', 'JOURNAL_DIR': None, 'SHARDS': None, 'CACHE_SIZE': None}
+PERCENTILES: Final[Tuple[Tuple[str, float], ...]] = (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99))
+# Every error message template as a pattern, to tell which domain error an error body reports
+_ERROR_MESSAGES: Final[Tuple[Tuple[str, re.Pattern], ...]] = tuple(
+    (error_class.__name__, re.compile(re.escape(error_class.MESSAGE).replace(re.escape('{}'), '.*'), re.DOTALL))
+    for error_class in ERROR_STATUSES
+)
+
+
+class Outcome(NamedTuple):
+    operation: str
+    latency_ns: int
+    error: str | None
+
+
+def classify(status: int, body: bytes) -> str | None:
+    """
+    Returns None for a successful response, else the name of the domain
+    error its `{"error": message}` body reports, or 'HTTP <status>'.
+    """
+    if status < 400:
+        return None
+    try:
+        message = json.loads(body)["error"]
+    except (ValueError, TypeError, KeyError):
+        message = None
+    if isinstance(message, str):
+        for name, pattern in _ERROR_MESSAGES:
+            if pattern.fullmatch(message):
+                return name
+    return f"HTTP {status}"
+
+
+class _Schedule:
+    """
+    Hands the requests out to the workers with the time each is due. With a
+    rate, request n is due at start + n / rate whenever it is picked up, so
+    latencies include the wait behind a slow server instead of hiding it.
+    """
+    def __init__(self, traffic: Iterable[Request], rate: float = None, total: int = None, duration: float = None,
+                 record: TextIO = None):
+        self._requests = iter(traffic)
+        self._interval_ns = None if rate is None else 1e9 / rate
+        self._total = total
+        self._record = record
+        self._sent = 0
+        self._lock = threading.Lock()
+        self.start_ns = time.perf_counter_ns()
+        self._deadline_ns = None if duration is None else self.start_ns + int(duration * 1e9)
+
+    def next(self) -> Tuple[Request, int] | None:
+        with self._lock:
+            if self._total is not None and self._sent >= self._total:
+                return None
+            if self._interval_ns is None:
+                due_ns = time.perf_counter_ns()
+            else:
+                due_ns = self.start_ns + int(self._sent * self._interval_ns)
+            if self._deadline_ns is not None and due_ns >= self._deadline_ns:
+                return None
+            request = next(self._requests, None)
+            if request is None:
+                return None
+            if self._record is not None:
+                write_request(self._record, request)
+            self._sent += 1
+            return request, due_ns
+
+
+def run(target, traffic: Iterable[Request], concurrency: int, rate: float = None, total: int = None,
+        duration: float = None, record: TextIO = None) -> Tuple[List[Outcome], float]:
+    """
+    Sends `traffic` to `target` from `concurrency` threads until `total`
+    requests were sent, `duration` seconds passed or the traffic ran out.
+    Returns the outcome of every request and the elapsed seconds.
+    """
+    schedule = _Schedule(traffic, rate, total, duration, record)
+    done = getattr(traffic, 'done', None)
+    outcomes: List[List[Outcome]] = [[] for _ in range(concurrency)]
+
+    def work(results: List[Outcome]):
+        while (scheduled := schedule.next()) is not None:
+            request, due_ns = scheduled
+            wait_ns = due_ns - time.perf_counter_ns()
+            if wait_ns > 0:
+                time.sleep(wait_ns / 1e9)
+            try:
+                error = classify(*target.send(request))
+            except Exception as e:
+                # Transport failures, e.g. a refused or reset connection
+                error = type(e).__name__
+            results.append(Outcome(request.operation, time.perf_counter_ns() - due_ns, error))
+            if done is not None:
+                done(request, error is None)
+
+    workers = [threading.Thread(target=work, args=(results,), daemon=True) for results in outcomes]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed_s = (time.perf_counter_ns() - schedule.start_ns) / 1e9
+    return [outcome for results in outcomes for outcome in results], elapsed_s
+
+
+def summarize(outcomes: List[Outcome], elapsed_s: float) -> dict:
+    """
+    Returns the request and error counts, throughput and nearest-rank
+    latency percentiles of `outcomes`, with errors counted by kind.
+    """
+    ordered = sorted(outcome.latency_ns for outcome in outcomes)
+    errors = Counter(outcome.error for outcome in outcomes if outcome.error is not None)
+    summary = {
+        "requests": len(outcomes),
+        "errors": sum(errors.values()),
+        "error_rate": sum(errors.values()) / len(outcomes) if outcomes else 0.0,
+        "throughput_rps": len(outcomes) / elapsed_s if elapsed_s else None,
+    }
+    for name, quantile in PERCENTILES:
+        summary[name] = ordered[max(0, math.ceil(len(ordered) * quantile) - 1)] / 1e6 if ordered else None
+    summary["max_ms"] = ordered[-1] / 1e6 if ordered else None
+    summary["errors_by_kind"] = dict(errors.most_common())
+    return summary
+
+
+def report(outcomes: List[Outcome], elapsed_s: float) -> dict:
+    """
+    Summarizes the run as a whole and per operation.
+    """
+    by_operation: Dict[str, List[Outcome]] = {}
+    for outcome in outcomes:
+        by_operation.setdefault(outcome.operation, []).append(outcome)
+    return {
+        "elapsed_s": elapsed_s,
+        "total": summarize(outcomes, elapsed_s),
+        "operations": {operation: summarize(results, elapsed_s) for operation, results in sorted(by_operation.items())},
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog='python -m backend.loadgen', description='Generates load against the order API.')
+    parser.add_argument('--url', help='base URL of a running server, e.g. http://127.0.0.1:5000 (default: the app in-process)')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f"operation weights (default: {DEFAULT_MIX})")
+    parser.add_argument('--replay', metavar='LOG', help='NDJSON request log to send instead of the mix')
+    parser.add_argument('--record', metavar='LOG', help='write the sent requests as an NDJSON request log')
+    parser.add_argument('--requests', type=int, help=f"requests to send (default: {DEFAULT_REQUESTS}, or all of --replay)")
+    parser.add_argument('--duration', type=float, help='seconds to send requests for')
+    parser.add_argument('--rate', type=float, help='requests per second to send at (default: as fast as answered)')
+    parser.add_argument('--concurrency', type=int, default=4, help='requests in flight at once')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-error-rate', type=float, help='fail (exit code 1) above this error rate')
+    parser.add_argument('--output', help='write the report as JSON')
+    args = parser.parse_args(argv)
+    if args.concurrency < 1:
+        parser.error('--concurrency must be at least 1')
+    if args.rate is not None and args.rate <= 0:
+        parser.error('--rate must be positive')
+    # A replay sends the whole log unless bounded
+    bounded = args.requests is not None or args.duration is not None or args.replay
+    total = args.requests if bounded else DEFAULT_REQUESTS
+
+    with ExitStack() as stack:
+        try:
+            if args.replay:
+                # Parsed up front, so malformed lines fail the run before it starts and parsing isn't timed
+                with open(args.replay, encoding='utf-8') as log:
+                    traffic = list(read_requests(log))
+            else:
+                # A fresh ID prefix per run, so runs against the same server don't collide
+                traffic = TrafficMix(parse_mix(args.mix), args.seed, f"lg{uuid.uuid4().hex[:8]}")
+            target = HttpTarget(args.url) if args.url else InProcessTarget(_create_app())
+        except (OSError, ValueError) as e:
+            parser.error(str(e))
+        stack.callback(target.close)
+        record = stack.enter_context(open(args.record, 'w', encoding='utf-8')) if args.record else None
+        outcomes, elapsed_s = run(target, traffic, args.concurrency, args.rate, total, args.duration, record)
+
+    results = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "target": args.url or 'in-process',
+        "traffic": f"replay {args.replay}" if args.replay else args.mix,
+        "rate": args.rate,
+        "concurrency": args.concurrency,
+        **report(outcomes, elapsed_s),
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output:
+            json.dump(results, output, indent=2)
+
+    rows = [('total', results["total"]), *results["operations"].items()]
+    for name, summary in rows:
+        print(f"{name:<15} {summary['requests']:>8} req {summary['throughput_rps'] or 0:>9.1f} req/s  "
+              f"p50 {_ms(summary['p50_ms'])}  p95 {_ms(summary['p95_ms'])}  p99 {_ms(summary['p99_ms'])}  "
+              f"errors {summary['error_rate']:>6.2%}")
+    for kind, count in results["total"]["errors_by_kind"].items():
+        print(f"{'':<15} {count:>8} {kind}")
+
+    if args.max_error_rate is not None and results["total"]["error_rate"] > args.max_error_rate:
+        print(f"ERROR RATE {results['total']['error_rate']:.2%} above {args.max_error_rate:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def _create_app():
+    # Imported here, so runs against a server don't build the app's storage
+    from backend.app import create_app
+    return create_app(IN_PROCESS_APP_CONFIG)
+
+
+def _ms(value: float | None) -> str:
+    return f"{'-':>9}" if value is None else f"{value:>6.2f} ms"
@@ -0,0 +1,78 @@
+# This module contains the targets the load generator sends requests to: the
+# Flask app in-process through its test client, or a server over HTTP.
+import http.client
+import json
+import threading
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+from backend.loadgen.traffic import Request
+
+
+class InProcessTarget:
+    """
+    Sends requests to a Flask app through its test client, one client per
+    worker thread, so runs need no server, port or network.
+    """
+    def __init__(self, app):
+        self._app = app
+        self._local = threading.local()
+
+    def send(self, request: Request) -> Tuple[int, bytes]:
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self._app.test_client()
+        response = client.open(request.path, method=request.method, json=request.body, headers=request.headers)
+        return response.status_code, response.get_data()
+
+    def close(self):
+        pass
+
+
+class HttpTarget:
+    """
+    Sends requests to a server at an http:// base URL, over one keep-alive
+    connection per worker thread. A connection that failed is dropped, and
+    the thread's next request opens a new one.
+    """
+    def __init__(self, url: str, timeout: float = 10.0):
+        parts = urlsplit(url)
+        if parts.scheme != 'http' or not parts.hostname:
+            raise ValueError(f"Expected an http:// URL but '{url}' given.")
+        self._host = parts.hostname
+        self._port = parts.port or 80
+        self._prefix = parts.path.rstrip('/')
+        self._timeout = timeout
+        self._local = threading.local()
+        self._connections: List[http.client.HTTPConnection] = []
+        self._lock = threading.Lock()
+
+    def send(self, request: Request) -> Tuple[int, bytes]:
+        connection = self.__connection()
+        headers = dict(request.headers or {})
+        body = None
+        if request.body is not None:
+            body = json.dumps(request.body).encode()
+            headers.setdefault('Content-Type', 'application/json')
+        try:
+            connection.request(request.method, self._prefix + request.path, body, headers)
+            response = connection.getresponse()
+            return response.status, response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            self._local.connection = None
+            raise
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections.clear()
+
+    def __connection(self) -> http.client.HTTPConnection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = self._local.connection = http.client.HTTPConnection(self._host, self._port, timeout=self._timeout)
+            with self._lock:
+                self._connections.append(connection)
+        return connection
@@ -0,0 +1,177 @@
+# This module contains the traffic of the load generator: the request record,
+# the generated mix of order operations and the NDJSON request log format.
+import json
+import random
+import threading
+from typing import Dict, Final, Iterable, Iterator, List, Mapping, NamedTuple, TextIO, Tuple
+from urllib.parse import urlencode
+
+from backend import order_rules
+
+OPERATIONS: Final[Tuple[str, ...]] = ('add', 'get', 'update_status', 'list')
+DEFAULT_MIX: Final[str] = 'add=20,get=50,update_status=15,list=15'
+ITEMS: Final[Tuple[str, ...]] = ('Red Jacket', 'Rain Boots', 'Wool Scarf', 'Denim Jeans', 'Leather Belt', 'Sun Hat')
+CUSTOMERS: Final[int] = 100
+LIST_PAGE_SIZE: Final[int] = 50
+
+
+class Request(NamedTuple):
+    operation: str
+    method: str
+    path: str
+    body: object = None
+    headers: Dict[str, str] | None = None
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    """
+    Parses an operation mix, e.g. 'add=20,get=80', into weights by operation.
+    """
+    weights = {}
+    for part in mix.split(','):
+        operation, _, weight = part.partition('=')
+        operation = operation.strip()
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}', allowed '{', '.join(OPERATIONS)}'.")
+        try:
+            weights[operation] = float(weight)
+        except ValueError:
+            raise ValueError(f"Invalid weight '{weight}' for operation '{operation}'.")
+        if weights[operation] < 0:
+            raise ValueError(f"Invalid weight '{weight}' for operation '{operation}'.")
+    if not any(weights.values()):
+        raise ValueError(f"The mix '{mix}' has no operation with a positive weight.")
+    return weights
+
+
+class TrafficMix:
+    """
+    Endless, seeded stream of order API requests in the proportions of `mix`.
+
+    Workers report each answered request back through `done`, so gets only
+    target orders whose creation succeeded and status updates follow the
+    order lifecycle. An order is left out of further updates while one is in
+    flight, so concurrent workers never race each other into a conflict.
+    Until an order exists, gets and updates become adds.
+    Thread-safe, workers draw requests concurrently.
+    """
+    def __init__(self, mix: Mapping[str, float], seed: int = None, id_prefix: str = 'lg'):
+        self._operations = [operation for operation in OPERATIONS if mix.get(operation)]
+        self._weights = [mix[operation] for operation in self._operations]
+        self._random = random.Random(seed)
+        self._id_prefix = id_prefix
+        self._created = 0
+        self._order_ids: List[str] = []
+        # Orders that can still move on and are not being updated, and the status of every open or in-flight one
+        self._open: List[str] = []
+        self._statuses: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __iter__(self) -> Iterator[Request]:
+        while True:
+            yield self.next_request()
+
+    def next_request(self) -> Request:
+        with self._lock:
+            operation = self._random.choices(self._operations, self._weights)[0]
+            if operation == 'get' and self._order_ids:
+                return Request('get', 'GET', f"/api/orders/{self._random.choice(self._order_ids)}")
+            if operation == 'update_status' and self._open:
+                return self.__update_status()
+            if operation == 'list':
+                return self.__list()
+            return self.__add()
+
+    def done(self, request: Request, succeeded: bool):
+        """
+        Records the outcome of a request drawn from this mix.
+        """
+        if request.operation != 'update_status' and not (request.operation == 'add' and succeeded):
+            return
+        with self._lock:
+            if request.operation == 'add':
+                order_id, status = request.body["order_id"], 'pending'
+                self._order_ids.append(order_id)
+            else:
+                order_id = request.path.split('/')[3]
+                # A failed update leaves the order in its status, so it goes back to the open ones
+                status = request.body["new_status"] if succeeded else self._statuses[order_id]
+            if order_rules.STATUS_TRANSITIONS[status]:
+                self._open.append(order_id)
+                self._statuses[order_id] = status
+            else:
+                self._statuses.pop(order_id, None)
+
+    def __add(self) -> Request:
+        order_id = f"{self._id_prefix}-{self._created:08d}"
+        self._created += 1
+        return Request('add', 'POST', '/api/orders', {
+            "order_id": order_id,
+            "item_name": self._random.choice(ITEMS),
+            "quantity": self._random.randint(1, 5),
+            "customer_id": self.__customer(),
+        })
+
+    def __update_status(self) -> Request:
+        # Swap with the last one, so taking an order out costs O(1)
+        index = self._random.randrange(len(self._open))
+        order_id = self._open[index]
+        self._open[index] = self._open[-1]
+        self._open.pop()
+        new_status = self._random.choice(order_rules.STATUS_TRANSITIONS[self._statuses[order_id]])
+        return Request('update_status', 'PUT', f"/api/orders/{order_id}/status", {"new_status": new_status})
+
+    def __list(self) -> Request:
+        query = {"status": self._random.choice(order_rules.VALID_STATUS_ALLOWED), "limit": LIST_PAGE_SIZE}
+        if self._random.random() < 0.5:
+            query["customer_id"] = self.__customer()
+        return Request('list', 'GET', f"/api/orders?{urlencode(query)}")
+
+    def __customer(self) -> str:
+        return f"cust-{self._random.randrange(CUSTOMERS):04d}"
+
+
+def operation_of(method: str, path: str) -> str:
+    """
+    Names the operation of a logged request, to break the results down by it.
+    """
+    parts = path.split('?', 1)[0].strip('/').split('/')
+    if parts[:2] == ['api', 'orders']:
+        if len(parts) == 2:
+            return {'POST': 'add', 'GET': 'list'}.get(method, f"{method} /api/orders")
+        if len(parts) == 3 and method == 'GET':
+            return 'get'
+        if len(parts) == 4 and parts[3] == 'status' and method == 'PUT':
+            return 'update_status'
+    return f"{method} /{'/'.join(parts)}"
+
+
+def read_requests(lines: Iterable[str]) -> Iterator[Request]:
+    """
+    Parses an NDJSON request log, one `{"method", "path", "body", "headers"}`
+    object per line (`body` and `headers` optional), e.g. written by
+    `write_request`. Blank lines are skipped.
+    """
+    for line_number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            method, path = record['method'].upper(), record['path']
+        except (ValueError, TypeError, KeyError, AttributeError):
+            raise ValueError(f"Malformed request log line {line_number}, expected an object with 'method' and 'path'.")
+        yield Request(
+            record.get('operation') or operation_of(method, path), method, path, record.get('body'), record.get('headers')
+        )
+
+
+def write_request(log: TextIO, request: Request):
+    """
+    Appends the request to an NDJSON request log, see `read_requests`.
+    """
+    record = {"operation": request.operation, "method": request.method, "path": request.path}
+    if request.body is not None:
+        record["body"] = request.body
+    if request.headers:
+        record["headers"] = request.headers
+    log.write(json.dumps(record, separators=(',', ':')) + '\n')
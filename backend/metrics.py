@@ -0,0 +1,231 @@
+# This module contains the in-process metrics registry and the hooks that
+# instrument the Flask app, OrderTracker and the storage backends. Metrics are
+# exposed in the Prometheus text format on /metrics.
+import threading
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, Final, Tuple
+
+from flask import Flask, Response, g, request
+
+LATENCY_BUCKETS: Final[Tuple[float, ...]] = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+CONTENT_TYPE: Final[str] = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter:
+    """
+    Monotonic counter. Increments are plain attribute updates, without a lock.
+    """
+    __slots__ = ('value',)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram. `observe` finds the bucket by bisection and bumps
+    preallocated counters, the cumulative counts are only built when rendered.
+    """
+    __slots__ = ('buckets', 'counts', 'sum')
+
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        # The extra slot counts observations above the last bucket (le="+Inf")
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class MetricsRegistry:
+    """
+    Holds every metric series by name and labels and renders them in the
+    Prometheus text format.
+
+    Series are created once, under a lock, and callers keep a reference to
+    them, so recording a value never touches the registry. Counts are updated
+    without locking; under heavy thread contention an increment may
+    occasionally be lost, which is acceptable for monitoring.
+    """
+    def __init__(self):
+        # name -> (type, help, {labels: series})
+        self._families: Dict[str, Tuple[str, str, dict]] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str, **labels) -> Counter:
+        return self.__series(name, 'counter', help_text, labels, Counter)
+
+    def histogram(self, name: str, help_text: str, **labels) -> Histogram:
+        return self.__series(name, 'histogram', help_text, labels, Histogram)
+
+    def gauge(self, name: str, help_text: str, read: Callable[[], float], **labels):
+        """
+        Registers a gauge whose value is read by calling `read` at render time.
+        """
+        self.__series(name, 'gauge', help_text, labels, lambda: read)
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            families = [(name, kind, help_text, list(series.items()))
+                        for name, (kind, help_text, series) in self._families.items()]
+        for name, kind, help_text, series in families:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in series:
+                if kind == 'counter':
+                    lines.append(f"{name}{_labels(labels)} {metric.value}")
+                elif kind == 'gauge':
+                    lines.append(f"{name}{_labels(labels)} {metric()}")
+                else:
+                    lines.extend(_histogram_lines(name, labels, metric))
+        return '\n'.join(lines) + '\n'
+
+    def __series(self, name: str, kind: str, help_text: str, labels: dict, factory):
+        key = tuple(sorted(labels.items()))
+        family = self._families.get(name)
+        if family is not None and key in family[2]:
+            return family[2][key]
+        with self._lock:
+            _, _, series = self._families.setdefault(name, (kind, help_text, {}))
+            return series.setdefault(key, factory())
+
+
+def instrument_app(app: Flask, registry: MetricsRegistry):
+    """
+    Records the duration of every request per route, method and status code
+    and serves the registry on /metrics.
+    """
+    perf_counter = time.perf_counter
+    histograms = {}
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = perf_counter()
+
+    @app.after_request
+    def observe_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            key = route, request.method, response.status_code
+            histogram = histograms.get(key)
+            if histogram is None:
+                histogram = histograms[key] = registry.histogram(
+                    'udatrack_http_request_duration_seconds', 'HTTP request duration until the response is returned.',
+                    route=route, method=request.method, status=str(response.status_code),
+                )
+            # Streamed bodies are sent after this point, so only their setup is timed
+            histogram.observe(perf_counter() - started)
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics_api():
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+
+def instrument_tracker(order_tracker, registry: MetricsRegistry):
+    """
+    Times every public OrderTracker method and counts the domain errors it
+    raises or, for `add_orders`, reports per row.
+    """
+    # One series per exception type, looked up once, so counting an error allocates nothing
+    error_counters: Dict[type, Counter] = {}
+
+    def count_error(error: ValueError):
+        counter = error_counters.get(type(error))
+        if counter is None:
+            counter = error_counters[type(error)] = registry.counter(
+                'udatrack_domain_errors_total', 'Domain errors by exception type.', error=type(error).__name__
+            )
+        counter.inc()
+
+    def count_row_errors(results):
+        for result in results:
+            if isinstance(result, ValueError):
+                count_error(result)
+        return results
+
+    for name in _public_methods(order_tracker):
+        histogram = registry.histogram('udatrack_tracker_call_seconds', 'OrderTracker call duration.', method=name)
+        after = count_row_errors if name == 'add_orders' else None
+        setattr(order_tracker, name, _timed(getattr(order_tracker, name), histogram, count_error, after))
+
+
+def instrument_storage(storage, registry: MetricsRegistry):
+    """
+    Times every public storage method and exposes the number of stored orders.
+    """
+    backend = type(storage).__name__
+    # Taken before wrapping, so scrapes don't show up in the operation timings
+    count_orders = getattr(storage, 'count_orders', None)
+    if count_orders is None:
+        get_all_orders = storage.get_all_orders
+        count_orders = lambda: len(get_all_orders())
+    registry.gauge('udatrack_storage_orders', 'Number of stored orders.', count_orders, backend=backend)
+
+    cache_stats = getattr(storage, 'cache_stats', None)
+    if cache_stats is not None:
+        for stat in ('size', 'hits', 'negative_hits', 'misses', 'evictions'):
+            registry.gauge(f'udatrack_cache_{stat}', f'Order cache {stat.replace("_", " ")}.',
+                           lambda stat=stat: cache_stats()[stat], backend=backend)
+
+    for name in _public_methods(storage):
+        histogram = registry.histogram('udatrack_storage_operation_seconds', 'Storage operation duration.',
+                                       backend=backend, operation=name)
+        setattr(storage, name, _timed(getattr(storage, name), histogram))
+
+
+def _public_methods(obj):
+    # Looked up on the class, so methods already wrapped on the instance are skipped
+    return [name for name in dir(type(obj))
+            if not name.startswith('_') and callable(getattr(type(obj), name)) and name not in vars(obj)]
+
+
+def _timed(method, histogram: Histogram, on_error=None, after=None):
+    perf_counter = time.perf_counter
+
+    @wraps(method)
+    def timed(*args, **kwargs):
+        started = perf_counter()
+        try:
+            result = method(*args, **kwargs)
+        except ValueError as e:
+            if on_error is not None:
+                on_error(e)
+            raise
+        finally:
+            histogram.observe(perf_counter() - started)
+        return result if after is None else after(result)
+    return timed
+
+
+def _labels(labels: tuple, **extra) -> str:
+    pairs = labels + tuple(extra.items())
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(name: str, labels: tuple, histogram: Histogram):
+    cumulative = 0
+    for bucket, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        yield f"{name}_bucket{_labels(labels, le=repr(bucket))} {cumulative}"
+    total = cumulative + histogram.counts[-1]
+    yield f"{name}_bucket{_labels(labels, le='+Inf')} {total}"
+    yield f"{name}_sum{_labels(labels)} {histogram.sum}"
+    yield f"{name}_count{_labels(labels)} {total}"
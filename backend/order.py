@@ -0,0 +1,108 @@
+# This module contains the Order record, the immutable value stored by the
+# storage backends and handed out by OrderTracker.
+from collections.abc import Mapping
+from typing import Final, Tuple
+
+# A status an order entered, and when, in seconds since the epoch
+StatusChange = Tuple[str, float]
+
+
+class Order(Mapping):
+    """
+    Compact, immutable order record.
+
+    Fields live in slots instead of a per-instance dict, and the record behaves
+    as a read-only mapping so it can be shared between callers without
+    defensive copies. Use `replace` to derive an updated record.
+
+    `created_at` and `updated_at` are seconds since the epoch, and `history`
+    lists every status the order entered with its time, oldest first. They
+    are None and empty for orders stored before orders were timestamped.
+    """
+    __slots__ = ("order_id", "item_name", "quantity", "customer_id", "status", "created_at", "updated_at", "history")
+    FIELDS: Final[Tuple[str, ...]] = __slots__
+
+    def __init__(self, order_id: str, item_name: str, quantity: int, customer_id: str, status: str,
+                 created_at: float = None, updated_at: float = None, history: Tuple[StatusChange, ...] = ()):
+        _set_order_id(self, order_id)
+        _set_item_name(self, item_name)
+        _set_quantity(self, quantity)
+        _set_customer_id(self, customer_id)
+        _set_status(self, status)
+        _set_created_at(self, created_at)
+        _set_updated_at(self, updated_at)
+        _set_history(self, history)
+
+    @classmethod
+    def from_mapping(cls, data: Mapping) -> "Order":
+        if isinstance(data, cls):
+            return data
+        return cls(
+            data['order_id'], data['item_name'], data['quantity'], data['customer_id'], data['status'],
+            data.get('created_at'), data.get('updated_at'), tuple(map(tuple, data.get('history', ()))),
+        )
+
+    @classmethod
+    def new(cls, order_id: str, item_name: str, quantity: int, customer_id: str, status: str, at: float) -> "Order":
+        """
+        Builds a new order created, and entering `status`, at `at`.
+        """
+        return cls(order_id, item_name, quantity, customer_id, status, at, at, ((status, at),))
+
+    @property
+    def status_since(self) -> float | None:
+        """
+        When the order entered its current status, None when not recorded.
+        """
+        if self.history and self.history[-1][0] == self.status:
+            return self.history[-1][1]
+        return None
+
+    def replace(self, **changes) -> "Order":
+        return Order(*(changes.get(field, getattr(self, field)) for field in self.FIELDS))
+
+    def with_status(self, status: str, at: float = None) -> "Order":
+        """
+        Derives the order moved to `status`, recorded in the history when the
+        time of the change `at` is given.
+        """
+        if at is None:
+            return self.replace(status=status)
+        return self.replace(status=status, updated_at=at, history=self.history + ((status, at),))
+
+    def to_dict(self) -> dict:
+        return {field: getattr(self, field) for field in self.FIELDS}
+
+    def __getitem__(self, key: str):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self):
+        return iter(self.FIELDS)
+
+    def __len__(self) -> int:
+        return len(self.FIELDS)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"'{type(self).__name__}' is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"'{type(self).__name__}' is immutable")
+
+    def __reduce__(self):
+        return type(self), tuple(getattr(self, field) for field in self.FIELDS)
+
+    def __hash__(self):
+        return hash(tuple(getattr(self, field) for field in self.FIELDS))
+
+    def __repr__(self) -> str:
+        return f"Order({', '.join(f'{field}={getattr(self, field)!r}' for field in self.FIELDS)})"
+
+
+# Writing through the slot descriptors skips the object.__setattr__ lookup,
+# which roughly halves construction time when replaying or loading many orders.
+(_set_order_id, _set_item_name, _set_quantity, _set_customer_id, _set_status,
+ _set_created_at, _set_updated_at, _set_history) = (
+    Order.__dict__[field].__set__ for field in Order.FIELDS
+)
@@ -0,0 +1,137 @@
+# This module contains the in-process pub/sub hub that OrderTracker publishes
+# order changes to, e.g. for the Server-Sent Events feed.
+import asyncio
+import threading
+import uuid
+from collections import deque
+from itertools import islice
+from typing import Callable, Final, List
+
+from backend.order import Order
+
+# Server-Sent Events comment line, sent while there is nothing new so proxies keep the stream open
+KEEP_ALIVE: Final[str] = ": keep-alive\n\n"
+
+
+class OrderEvent:
+    """
+    One order change, numbered in publication order.
+    """
+    __slots__ = ('event_id', 'event_type', 'order')
+
+    def __init__(self, event_id: int, event_type: str, order: Order):
+        self.event_id = event_id
+        self.event_type = event_type
+        self.order = order
+
+
+class OrderEventHub:
+    """
+    Publishes order change events to any number of subscribers.
+
+    The most recent `buffer_size` events are kept in a ring buffer, so a
+    subscriber that reconnects with the ID of the last event it saw resumes
+    right after it. Subscribers that fell further behind, or hold an ID from
+    another process, get None and must reload the full list instead.
+
+    Event IDs are exposed as "<epoch>-<number>" strings, where the epoch is
+    random per hub, so IDs from before a restart are never mistaken for new ones.
+
+    Threads wait for events with `wait_for_events`, coroutines with
+    `wait_for_events_async`, which parks them on their event loop instead of
+    holding a thread per subscriber.
+    """
+    CREATED: Final[str] = 'created'
+    STATUS_CHANGED: Final[str] = 'status_changed'
+    DEFAULT_BUFFER_SIZE: Final[int] = 1000
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE):
+        self._events = deque(maxlen=buffer_size)
+        self._last_event_id = 0
+        self._epoch = uuid.uuid4().hex[:8]
+        self._changed = threading.Condition()
+        # (loop, asyncio.Event) of the coroutines waiting for the next event
+        self._async_waiters = set()
+
+    @property
+    def last_event_id(self) -> int:
+        return self._last_event_id
+
+    def publish(self, event_type: str, order: Order) -> OrderEvent:
+        with self._changed:
+            self._last_event_id += 1
+            event = OrderEvent(self._last_event_id, event_type, order)
+            self._events.append(event)
+            self._changed.notify_all()
+            for loop, changed in self._async_waiters:
+                loop.call_soon_threadsafe(changed.set)
+        return event
+
+    def events_after(self, event_id: int) -> List[OrderEvent] | None:
+        """
+        Returns the events published after `event_id`, or None when some of
+        them already left the ring buffer.
+        """
+        with self._changed:
+            return self.__events_after(event_id)
+
+    def wait_for_events(self, event_id: int, timeout: float) -> List[OrderEvent] | None:
+        """
+        Like `events_after`, but blocks up to `timeout` seconds while there is
+        nothing new. Returns an empty list when the timeout expires.
+        """
+        with self._changed:
+            self._changed.wait_for(lambda: self._last_event_id != event_id, timeout)
+            return self.__events_after(event_id)
+
+    async def wait_for_events_async(self, event_id: int, timeout: float) -> List[OrderEvent] | None:
+        """
+        Like `wait_for_events`, for coroutines.
+        """
+        waiter = asyncio.get_running_loop(), asyncio.Event()
+        with self._changed:
+            if self._last_event_id != event_id:
+                return self.__events_after(event_id)
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except TimeoutError:
+            pass
+        finally:
+            with self._changed:
+                self._async_waiters.discard(waiter)
+        return self.events_after(event_id)
+
+    def format_event_id(self, event_id: int) -> str:
+        return f"{self._epoch}-{event_id}"
+
+    def parse_event_id(self, text: str | None) -> int | None:
+        """
+        Returns the event number of an ID produced by this hub, or None.
+        """
+        epoch, _, number = (text or '').partition('-')
+        if epoch != self._epoch or not number.isdigit():
+            return None
+        return int(number)
+
+    def __events_after(self, event_id: int) -> List[OrderEvent] | None:
+        if event_id == self._last_event_id:
+            return []
+        if event_id > self._last_event_id or event_id < self._events[0].event_id - 1:
+            return None
+        return list(islice(self._events, event_id - self._events[0].event_id + 1, None))
+
+
+def format_reset(hub: OrderEventHub, event_id: int) -> str:
+    """
+    Returns the Server-Sent Events message telling a subscriber to reload the
+    whole list, then resume after `event_id`.
+    """
+    return f"id: {hub.format_event_id(event_id)}\nevent: reset\ndata: {{}}\n\n"
+
+
+def format_events(hub: OrderEventHub, events: List[OrderEvent], dumps: Callable[[Order], str]) -> str:
+    return ''.join(
+        f"id: {hub.format_event_id(event.event_id)}\nevent: {event.event_type}\ndata: {dumps(event.order)}\n\n"
+        for event in events
+    )
@@ -0,0 +1,204 @@
+# This module provides the append-only order log and snapshots that make
+# InMemoryStorage survive restarts.
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Final, Iterable, Iterator, Tuple
+
+from backend.order import Order
+
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+_decode = json.JSONDecoder().decode
+
+
+class OrderJournal:
+    """
+    Append-only NDJSON log of saved orders plus periodic snapshots.
+
+    Every saved order is appended to `orders.log` as a compact JSON array.
+    After `snapshot_every` appended records, the caller rotates the log and
+    writes the whole store to `orders.snapshot`. Replaying the snapshot and
+    then the log tail rebuilds the store; later records for the same order
+    replace earlier ones.
+
+    `fsync` controls durability: 'always' syncs every write, 'interval' syncs
+    at most once every `fsync_interval_ms`, with a timer syncing writes left
+    over when the store goes idle, and 'never' leaves it to the OS.
+    """
+    FSYNC_POLICIES: Final[Tuple[str, ...]] = ('always', 'interval', 'never')
+    LOG_FILE: Final[str] = 'orders.log'
+    SNAPSHOT_FILE: Final[str] = 'orders.snapshot'
+
+    def __init__(self, directory: str, fsync: str = 'interval', fsync_interval_ms: int = 1000,
+                 snapshot_every: int = 100_000):
+        if fsync not in self.FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy '{fsync}', allowed '{', '.join(self.FSYNC_POLICIES)}'.")
+        os.makedirs(directory, exist_ok=True)
+        self._log_path = os.path.join(directory, self.LOG_FILE)
+        self._snapshot_path = os.path.join(directory, self.SNAPSHOT_FILE)
+        self._previous_log_path = self._log_path + '.1'
+        self._fsync = fsync
+        self._fsync_interval = fsync_interval_ms / 1000
+        self._snapshot_every = snapshot_every
+        self._lock = threading.Lock()
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+        self._sync_timer = None
+        self._records_since_snapshot = 0
+        self.__drop_torn_tail(self._log_path)
+        self._log = open(self._log_path, 'a', encoding='utf-8')
+
+    def replay(self) -> Iterator[Order]:
+        """
+        Yields the orders of the last snapshot followed by the log tail,
+        including a segment rotated out by an interrupted snapshot.
+        """
+        yield from self.__read(self._snapshot_path)
+        yield from self.__read(self._previous_log_path)
+        for order in self.__read(self._log_path):
+            self._records_since_snapshot += 1
+            yield order
+
+    def append(self, order: Order):
+        self.append_many((order,))
+
+    def append_many(self, orders: Iterable[Order]):
+        lines = ''.join(self.__encode(order) for order in orders)
+        with self._lock:
+            self._log.write(lines)
+            self._log.flush()
+            self._records_since_snapshot += lines.count('\n')
+            self.__sync()
+
+    def should_snapshot(self) -> bool:
+        return self._records_since_snapshot >= self._snapshot_every
+
+    def rotate(self):
+        """
+        Starts a new log segment. Call it together with taking the copy of the
+        store that the next `write_snapshot` persists.
+        """
+        with self._lock:
+            if self._unsynced:
+                self.__fsync()
+            self._log.close()
+            if os.path.exists(self._previous_log_path):
+                # Left by a snapshot that never completed, its records are still needed
+                with open(self._log_path, 'rb') as log, open(self._previous_log_path, 'ab') as previous:
+                    shutil.copyfileobj(log, previous)
+                os.remove(self._log_path)
+            else:
+                os.replace(self._log_path, self._previous_log_path)
+            self._log = open(self._log_path, 'w', encoding='utf-8')
+            self._records_since_snapshot = 0
+
+    def write_snapshot(self, orders: Iterable[Order]):
+        """
+        Atomically replaces the snapshot with `orders`, then drops the log
+        segment rotated out when they were copied.
+        """
+        temporary_path = self._snapshot_path + '.tmp'
+        with open(temporary_path, 'w', encoding='utf-8') as snapshot:
+            for order in orders:
+                snapshot.write(self.__encode(order))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary_path, self._snapshot_path)
+        # A crash before this only replays records the snapshot already holds
+        if os.path.exists(self._previous_log_path):
+            os.remove(self._previous_log_path)
+
+    def reset(self):
+        with self._lock:
+            self._log.close()
+            self._log = open(self._log_path, 'w', encoding='utf-8')
+            self._unsynced = False
+            for path in (self._snapshot_path, self._previous_log_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            self._records_since_snapshot = 0
+
+    def close(self):
+        with self._lock:
+            if self._sync_timer is not None:
+                self._sync_timer.cancel()
+            if self._fsync != 'never':
+                os.fsync(self._log.fileno())
+            self._log.close()
+
+    def __sync(self):
+        if self._fsync == 'always':
+            os.fsync(self._log.fileno())
+        elif self._fsync == 'interval':
+            delay = self._last_fsync + self._fsync_interval - time.monotonic()
+            if delay <= 0:
+                self.__fsync()
+                return
+            # Synced when the interval is up, even if no later write comes to do it
+            self._unsynced = True
+            if self._sync_timer is None:
+                self._sync_timer = threading.Timer(delay, self.__sync_unsynced)
+                self._sync_timer.daemon = True
+                self._sync_timer.start()
+
+    def __sync_unsynced(self):
+        with self._lock:
+            self._sync_timer = None
+            if self._unsynced and not self._log.closed:
+                self.__fsync()
+
+    def __fsync(self):
+        os.fsync(self._log.fileno())
+        self._last_fsync = time.monotonic()
+        self._unsynced = False
+
+    @staticmethod
+    def __drop_torn_tail(path: str, block_size: int = 65536):
+        # New records must not be glued onto a partial line left by a crash
+        if not os.path.exists(path):
+            return
+        with open(path, 'rb+') as log:
+            end = log.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - block_size)
+                log.seek(start)
+                block = log.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position != end:
+                log.truncate(position)
+
+    @staticmethod
+    def __encode(order: Order) -> str:
+        return _encode([
+            order.order_id, order.item_name, order.quantity, order.customer_id, order.status,
+            order.created_at, order.updated_at, order.history,
+        ]) + '\n'
+
+    @staticmethod
+    def __decode(line: str) -> Order:
+        # Records written before orders were timestamped only hold the first five fields
+        values = _decode(line)
+        if len(values) == len(Order.FIELDS):
+            values[-1] = tuple(map(tuple, values[-1]))
+        return Order(*values)
+
+    @staticmethod
+    def __read(path: str) -> Iterator[Order]:
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as records:
+            for line in records:
+                try:
+                    yield OrderJournal.__decode(line)
+                except ValueError:
+                    # Torn final write from a crash, everything before it is intact
+                    if not line.endswith('\n'):
+                        return
+                    raise
@@ -0,0 +1,15 @@
+# This module contains the JSON provider shared by the Flask and the ASGI apps.
+from flask.json.provider import DefaultJSONProvider
+
+from backend.order import Order
+
+
+class OrderJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider that serializes immutable Order records as plain objects.
+    """
+    @staticmethod
+    def default(o):
+        if isinstance(o, Order):
+            return o.to_dict()
+        return DefaultJSONProvider.default(o)
@@ -0,0 +1,143 @@
+# This module contains the storage-independent steps of the order tracker
+# operations. OrderTracker and AsyncOrderTracker both run them and only make
+# the storage calls in between, synchronously or awaited.
+from itertools import islice
+from typing import Dict, Final, Iterable, Iterator, List, Mapping, Tuple
+
+from backend import order_rules
+from backend.exception.duplicate_order_error import DuplicateOrderError
+from backend.exception.empty_order_id_error import EmptyOrderIdError
+from backend.exception.invalid_status_transition_error import InvalidStatusTransitionError
+from backend.exception.order_not_found_error import OrderNotFoundError
+from backend.order import Order
+
+REQUIRED_STORAGE_METHODS: Final[Tuple[str, ...]] = ('save_order', 'get_order', 'get_all_orders')
+BULK_CHUNK_SIZE: Final[int] = 1000
+
+
+def check_storage(storage):
+    for method in REQUIRED_STORAGE_METHODS:
+        if not callable(getattr(storage, method, None)):
+            raise TypeError(f"Storage object must implement a callable '{method}' method.")
+
+
+def chunks(items: Iterable, size: int = BULK_CHUNK_SIZE) -> Iterator[list]:
+    items = iter(items)
+    while chunk := list(islice(items, size)):
+        yield chunk
+
+
+def new_order(order_id: str, item_name: str, quantity: int, customer_id: str, status: str, at: float) -> Order:
+    order_rules.validate_new_order(quantity, status)
+    return Order.new(order_id, item_name, quantity, customer_id, status, at)
+
+
+def unique_order_ids(order_ids: Iterable[str]) -> List[str]:
+    """
+    Returns the IDs without repeats, in first-seen order, rejecting empty ones.
+    """
+    order_ids = list(dict.fromkeys(order_ids))
+    if not all(order_ids):
+        raise EmptyOrderIdError()
+    return order_ids
+
+
+def prepare_new_orders(rows: List[Mapping], at: float) -> Tuple[list, Dict[str, Tuple[int, Order]]]:
+    """
+    Validates one chunk of bulk rows. Returns the per-row results, holding the
+    errors of rejected rows so far, and the orders still to insert by ID, with
+    their row number. A repeated ID is rejected after its first row.
+    """
+    results = [None] * len(rows)
+    candidates = {}
+    for row_number, row in enumerate(rows):
+        try:
+            order = order_rules.build_order(row, at)
+        except ValueError as e:
+            results[row_number] = e
+            continue
+
+        if order.order_id in candidates:
+            results[row_number] = DuplicateOrderError(order.order_id)
+        else:
+            candidates[order.order_id] = row_number, order
+    return results, candidates
+
+
+def complete_new_orders(results: list, candidates: Mapping[str, Tuple[int, Order]], existing_ids: set) -> List[Order]:
+    """
+    Fills in the results of the candidates once inserted, `existing_ids`
+    being the ones the storage already had. Returns the created orders.
+    """
+    created = []
+    for order_id, (row_number, order) in candidates.items():
+        if order_id in existing_ids:
+            results[row_number] = DuplicateOrderError(order_id)
+        else:
+            results[row_number] = order
+            created.append(order)
+    return created
+
+
+def status_update(order_id: str, order: Mapping | None, new_status: str) -> str:
+    """
+    Checks that the stored `order` exists and may move to `new_status`.
+    Returns its current status.
+    """
+    if not order:
+        raise OrderNotFoundError(order_id)
+
+    order_rules.validate_transition(order['status'], new_status)
+    return order['status']
+
+
+def transition_results(order_ids: List[str], new_status: str, updated: Mapping[str, Order],
+                       rejected: Mapping[str, str]) -> List[Order | ValueError]:
+    """
+    Turns the outcome of a storage `transition_statuses` call into one entry
+    per requested ID, the updated Order or the ValueError that rejected it.
+    """
+    results = []
+    for order_id in order_ids:
+        if not order_id:
+            results.append(EmptyOrderIdError())
+        elif order_id in updated:
+            results.append(updated[order_id])
+        elif order_id in rejected:
+            results.append(InvalidStatusTransitionError(rejected[order_id], new_status))
+        else:
+            results.append(OrderNotFoundError(order_id))
+    return results
+
+
+def summarize_orders(orders: Iterable[Mapping], group_by: str, metrics: Tuple[str, ...]) -> Dict[str, Dict[str, int]]:
+    """
+    Aggregates orders for storages that keep no running totals.
+    """
+    totals = {}
+    for order in orders:
+        count, quantity = totals.get(order[group_by], (0, 0))
+        totals[order[group_by]] = count + 1, quantity + order['quantity']
+    return order_rules.build_summary(totals, metrics)
+
+
+def filter_orders(orders: Iterable[Mapping], status: str = None, customer_id: str = None) -> Iterator[Mapping]:
+    for order in orders:
+        if ((status is None or order.get('status') == status)
+                and (customer_id is None or order.get('customer_id') == customer_id)):
+            yield order
+
+
+def scan_orders(orders: Mapping[str, Mapping], status: str = None, after: str = None,
+                customer_id: str = None) -> Iterator[Mapping]:
+    """
+    Yields the matching orders of a full order mapping right after the order
+    with ID `after`, for storages without `iter_orders`.
+    """
+    items = iter(orders.items())
+    if after is not None:
+        for order_id, _ in items:
+            if order_id == after:
+                break
+
+    return filter_orders((order for _, order in items), status, customer_id)
@@ -0,0 +1,159 @@
+# This module contains the order business rules shared by OrderTracker and
+# AsyncOrderTracker, so both apply exactly the same validation.
+from collections.abc import Mapping
+from types import MappingProxyType
+from typing import Dict, Final, FrozenSet, List, Tuple
+
+from backend.exception.invalid_group_by_error import InvalidGroupByError
+from backend.exception.invalid_initial_status_error import InvalidInitialStatusError
+from backend.exception.invalid_metric_error import InvalidMetricError
+from backend.exception.invalid_page_limit_error import InvalidPageLimitError
+from backend.exception.invalid_search_query_error import InvalidSearchQueryError
+from backend.exception.invalid_status_error import InvalidStatusError
+from backend.exception.invalid_status_transition_error import InvalidStatusTransitionError
+from backend.exception.invalid_time_parameter_error import InvalidTimeParameterError
+from backend.exception.malformed_order_error import MalformedOrderError
+from backend.exception.minimum_order_quantity_error import MinimumOrderQuantityError
+from backend.item_search import tokenize
+from backend.order import Order
+from backend.order_totals import OrderTotals
+
+MIN_QUANTITY_ALLOWED: Final[int] = 1
+INITIAL_STATUS_ALLOWED: Final[List[str]] = ['pending', 'processing']
+VALID_STATUS_ALLOWED: Final[List[str]] = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
+REQUIRED_FIELDS: Final[Tuple[str, ...]] = ('order_id', 'item_name', 'quantity', 'customer_id')
+SUMMARY_GROUP_BY_ALLOWED: Final[Tuple[str, ...]] = OrderTotals.FIELDS
+SUMMARY_METRICS_ALLOWED: Final[Tuple[str, ...]] = ('count', 'sum_quantity')
+# The order lifecycle: each status and the statuses it may move to next
+STATUS_TRANSITIONS: Final[Mapping[str, Tuple[str, ...]]] = MappingProxyType({
+    'pending': ('processing', 'cancelled'),
+    'processing': ('shipped', 'cancelled'),
+    'shipped': ('delivered',),
+    'delivered': (),
+    'cancelled': (),
+})
+
+# Compiled once into sets, so every check is a constant-time lookup. Statuses come
+# from untrusted JSON, so the checks rule out unhashable values first.
+_VALID_STATUSES: Final[FrozenSet[str]] = frozenset(VALID_STATUS_ALLOWED)
+_INITIAL_STATUSES: Final[FrozenSet[str]] = frozenset(INITIAL_STATUS_ALLOWED)
+_TRANSITIONS: Final[FrozenSet[Tuple[str, str]]] = frozenset(
+    (current, new) for current, targets in STATUS_TRANSITIONS.items() for new in targets
+)
+_SOURCE_STATUSES: Final[Mapping[str, FrozenSet[str]]] = MappingProxyType({
+    status: frozenset(current for current, new in _TRANSITIONS if new == status) for status in VALID_STATUS_ALLOWED
+})
+
+
+def validate_new_order(quantity: int, status: str):
+    if quantity < MIN_QUANTITY_ALLOWED:
+        raise MinimumOrderQuantityError(MIN_QUANTITY_ALLOWED, quantity)
+
+    if not isinstance(status, str) or status not in _INITIAL_STATUSES:
+        raise InvalidInitialStatusError(INITIAL_STATUS_ALLOWED, status)
+
+
+def validate_status(status: str):
+    if not isinstance(status, str) or status not in _VALID_STATUSES:
+        raise InvalidStatusError(VALID_STATUS_ALLOWED, status)
+
+
+def validate_transition(current_status: str, new_status: str):
+    if (current_status, new_status) not in _TRANSITIONS:
+        raise InvalidStatusTransitionError(current_status, new_status)
+
+
+def source_statuses(new_status: str) -> FrozenSet[str]:
+    """
+    Returns the statuses an order may be in to move to `new_status`.
+    """
+    return _SOURCE_STATUSES.get(new_status, frozenset())
+
+
+def validate_page(status: str | None, limit: int | None):
+    if status is not None:
+        validate_status(status)
+
+    if limit is not None and (not isinstance(limit, int) or limit < 1):
+        raise InvalidPageLimitError(limit)
+
+
+def validate_search(query: str, status: str | None, limit: int | None) -> List[str]:
+    """
+    Returns the tokens of the search query, which must have at least one.
+    """
+    tokens = tokenize(query) if isinstance(query, str) else []
+    if not tokens:
+        raise InvalidSearchQueryError(query)
+
+    validate_page(status, limit)
+    return tokens
+
+
+def validate_time_range(since: float | None, until: float | None):
+    for name, value in (('since', since), ('until', until)):
+        if value is not None and not _is_time(value):
+            raise InvalidTimeParameterError(name, value, "seconds since the epoch")
+
+
+def validate_stuck(status: str, older_than: float, limit: int | None):
+    validate_status(status)
+
+    if not _is_time(older_than) or older_than < 0:
+        raise InvalidTimeParameterError('older_than', older_than, "a non-negative number of seconds")
+
+    validate_page(None, limit)
+
+
+def _is_time(value) -> bool:
+    # bool is an int subclass, but never a meaningful time
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and value == value
+
+
+def validate_summary(group_by: str, metrics: Tuple[str, ...]):
+    if group_by not in SUMMARY_GROUP_BY_ALLOWED:
+        raise InvalidGroupByError(SUMMARY_GROUP_BY_ALLOWED, group_by)
+
+    for metric in metrics:
+        if metric not in SUMMARY_METRICS_ALLOWED:
+            raise InvalidMetricError(SUMMARY_METRICS_ALLOWED, metric)
+
+
+def build_summary(totals: Mapping, metrics: Tuple[str, ...]) -> Dict[str, Dict[str, int]]:
+    """
+    Turns (count, quantity sum) totals by group key into the requested metrics, by sorted key.
+    """
+    summary = {}
+    for key in sorted(totals):
+        count, quantity = totals[key]
+        values = {'count': count, 'sum_quantity': quantity}
+        summary[key] = {metric: values[metric] for metric in metrics}
+    return summary
+
+
+def build_order(row: Mapping, at: float = None) -> Order:
+    """
+    Validates one untrusted order payload, e.g. a bulk import row, and builds
+    its Order, created at time `at` when given.
+    """
+    if not isinstance(row, Mapping):
+        raise MalformedOrderError("expected an object")
+
+    missing_fields = [field for field in REQUIRED_FIELDS if field not in row]
+    if missing_fields:
+        raise MalformedOrderError(f"missing required fields '{', '.join(missing_fields)}'")
+
+    # Checked before anything reaches storage: IDs and names are hashed by its indexes
+    for field in ('order_id', 'item_name', 'customer_id'):
+        if not isinstance(row[field], str) or not row[field]:
+            raise MalformedOrderError(f"'{field}' must be a non-empty string")
+
+    quantity, status = row['quantity'], row.get('status', 'pending')
+    # bool is an int subclass, but `true` is not a quantity
+    if not isinstance(quantity, int) or isinstance(quantity, bool):
+        raise MalformedOrderError("'quantity' must be an integer")
+
+    validate_new_order(quantity, status)
+    if at is None:
+        return Order(row['order_id'], row['item_name'], quantity, row['customer_id'], status)
+    return Order.new(row['order_id'], row['item_name'], quantity, row['customer_id'], status, at)
@@ -0,0 +1,44 @@
+# This module contains the running order totals that the in-memory storage
+# backends keep for OrderTracker.summarize.
+from typing import Dict, Final, Mapping, Tuple
+
+
+class OrderTotals:
+    """
+    Order count and quantity sum per status, per item and per customer.
+
+    Storage backends update the totals on every write, so a summary reads one
+    entry per group instead of scanning every order. Groups whose count drops
+    to zero are removed. Not thread-safe, callers hold their write lock.
+    """
+    FIELDS: Final[Tuple[str, ...]] = ('status', 'item_name', 'customer_id')
+
+    def __init__(self):
+        self._totals = {field: {} for field in self.FIELDS}
+
+    def add(self, order: Mapping, sign: int = 1):
+        """
+        Counts the order in, or out with `sign=-1`, e.g. the previous record
+        of a rewritten order.
+        """
+        quantity = order['quantity'] * sign
+        for field, totals in self._totals.items():
+            key = order[field]
+            entry = totals.get(key)
+            if entry is None:
+                totals[key] = [sign, quantity]
+            elif entry[0] + sign == 0:
+                del totals[key]
+            else:
+                entry[0] += sign
+                entry[1] += quantity
+
+    def summary(self, field: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the (count, quantity sum) of every group of `field`.
+        """
+        return {key: (count, quantity) for key, (count, quantity) in self._totals[field].items()}
+
+    def clear(self):
+        for totals in self._totals.values():
+            totals.clear()
@@ -1,52 +1,64 @@
 # This module contains the OrderTracker class, which encapsulates the core
 # business logic for managing orders.
-from typing import Final, List
+import time
+from itertools import islice
+from typing import Callable, Dict, Final, Iterable, Iterator, List, Mapping
 
+from backend import item_search, order_operations, order_rules, time_index
 from backend.exception.duplicate_order_error import DuplicateOrderError
+from backend.exception.empty_customer_id_error import EmptyCustomerIdError
 from backend.exception.empty_order_id_error import EmptyOrderIdError
-from backend.exception.invalid_initial_status_error import InvalidInitialStatusError
-from backend.exception.invalid_status_error import InvalidStatusError
-from backend.exception.minimum_order_quantity_error import MinimumOrderQuantityError
-from backend.exception.order_not_found_error import OrderNotFoundError
+from backend.exception.invalid_cursor_error import InvalidCursorError
+from backend.order import Order
+from backend.order_events import OrderEventHub
 
 
 class OrderTracker:
     """
     Manages customer orders, providing functionalities to add, update,
     and retrieve order information.
+
+    Orders are stamped with the time of `clock` when created and on every
+    status change, which is recorded in their history.
     """
-    MIN_QUANTITY_ALLOWED: Final[int] = 1
-    INITIAL_STATUS_ALLOWED: Final[List[str]] = ['pending', 'processing']
-    VALID_STATUS_ALLOWED: Final[List[str]] = ['pending', 'processing', 'shipped', 'delivered', 'cancelled']
-
-    def __init__(self, storage):
-        required_methods = ['save_order', 'get_order', 'get_all_orders']
-        for method in required_methods:
-            if not hasattr(storage, method) or not callable(getattr(storage, method)):
-                raise TypeError(f"Storage object must implement a callable '{method}' method.")
+    MIN_QUANTITY_ALLOWED: Final[int] = order_rules.MIN_QUANTITY_ALLOWED
+    INITIAL_STATUS_ALLOWED: Final[List[str]] = order_rules.INITIAL_STATUS_ALLOWED
+    VALID_STATUS_ALLOWED: Final[List[str]] = order_rules.VALID_STATUS_ALLOWED
+    BULK_CHUNK_SIZE: Final[int] = order_operations.BULK_CHUNK_SIZE
+
+    def __init__(self, storage, events: OrderEventHub = None, clock: Callable[[], float] = time.time):
+        order_operations.check_storage(storage)
         self.storage = storage
+        self.events = events
+        self.clock = clock
 
     def add_order(self, order_id: str, item_name: str, quantity: int, customer_id: str, status: str = "pending"):
-        if quantity < self.MIN_QUANTITY_ALLOWED:
-            raise MinimumOrderQuantityError(self.MIN_QUANTITY_ALLOWED, quantity)
-
-        if status not in self.INITIAL_STATUS_ALLOWED:
-            raise InvalidInitialStatusError(self.INITIAL_STATUS_ALLOWED, status)
+        order = order_operations.new_order(order_id, item_name, quantity, customer_id, status, self.clock())
 
-        if self.storage.get_order(order_id) is not None:
+        if self.__supports('insert_if_absent'):
+            if not self.storage.insert_if_absent(order_id, order):
+                raise DuplicateOrderError(order_id)
+        elif self.storage.get_order(order_id) is not None:
             raise DuplicateOrderError(order_id)
+        else:
+            self.storage.save_order(order_id, order)
 
-        order = {
-            "order_id": order_id,
-            "item_name": item_name,
-            "quantity": quantity,
-            "customer_id": customer_id,
-            "status": status
-        }
+        self.__publish(OrderEventHub.CREATED, order)
+        return order
 
-        self.storage.save_order(order_id, order)
+    def add_orders(self, orders: Iterable[Mapping]) -> List[Order | ValueError]:
+        """
+        Adds many orders at once, applying the same rules as `add_order`.
 
-        return order
+        Rows are processed in chunks: each chunk is validated, checked for
+        duplicates in a single pass and committed with one storage write.
+        Returns one entry per input row, either the created Order or the
+        ValueError that rejected it.
+        """
+        results = []
+        for chunk in order_operations.chunks(orders, self.BULK_CHUNK_SIZE):
+            results.extend(self.__add_chunk(chunk))
+        return results
 
     def get_order_by_id(self, order_id: str):
         if not order_id:
@@ -54,31 +66,235 @@ class OrderTracker:
 
         return self.storage.get_order(order_id)
 
+    def get_orders_by_ids(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order, e.g.
+        to resolve a batch of IDs in one call. IDs of missing orders are left
+        out. Storages with batch lookups are read once per chunk of IDs.
+        """
+        order_ids = order_operations.unique_order_ids(order_ids)
+
+        if not self.__supports('get_orders'):
+            return {order_id: order for order_id in order_ids if (order := self.storage.get_order(order_id))}
+
+        found = {}
+        for chunk in order_operations.chunks(order_ids, self.BULK_CHUNK_SIZE):
+            found.update(self.storage.get_orders(chunk))
+        return found
+
     def update_order_status(self, order_id: str, new_status: str):
         if not order_id:
             raise EmptyOrderIdError()
 
-        self.__validate_status(new_status)
+        order_rules.validate_status(new_status)
 
-        order = self.storage.get_order(order_id)
+        if self.__supports('compare_and_set_status'):
+            return self.__compare_and_set_status(order_id, new_status)
 
-        if not order:
-            raise OrderNotFoundError(order_id)
+        order = self.storage.get_order(order_id)
+        order_operations.status_update(order_id, order, new_status)
 
-        order["status"] = new_status
+        order = Order.from_mapping(order).with_status(new_status, self.clock())
         self.storage.save_order(order_id, order)
+        self.__publish(OrderEventHub.STATUS_CHANGED, order)
         return order
 
+    def update_statuses(self, order_ids: Iterable[str], new_status: str) -> List[Order | ValueError]:
+        """
+        Moves many orders to `new_status` at once, e.g. a whole shipment,
+        applying the same rules as `update_order_status`.
+
+        IDs are processed in chunks, each applied with one storage write when
+        the storage supports bulk transitions. Returns one entry per input ID,
+        either the updated Order or the ValueError that rejected it. An ID
+        listed twice gets the same entry twice.
+        """
+        order_rules.validate_status(new_status)
+
+        results = []
+        for chunk in order_operations.chunks(order_ids, self.BULK_CHUNK_SIZE):
+            results.extend(self.__update_chunk(chunk, new_status))
+        return results
+
+    def get_version(self) -> int | None:
+        """
+        Returns the store-wide version, which changes on every write, or None
+        when the storage doesn't track versions.
+        """
+        if self.__supports('get_version'):
+            return self.storage.get_version()
+        return None
+
+    def get_order_version(self, order_id: str) -> int | None:
+        """
+        Returns the version of the order's last write, or None when the order
+        doesn't exist or the storage doesn't track versions.
+        """
+        if not order_id:
+            raise EmptyOrderIdError()
+
+        if self.__supports('get_order_version'):
+            return self.storage.get_order_version(order_id)
+        return None
+
+    def summarize(self, group_by: str = 'status',
+                  metrics: Iterable[str] = order_rules.SUMMARY_METRICS_ALLOWED) -> Dict[str, Dict[str, int]]:
+        """
+        Aggregates the orders by `group_by` ('status', 'item_name' or
+        'customer_id') and returns the requested `metrics` ('count',
+        'sum_quantity') of every group, by group key in sorted order.
+        Storages that keep running totals answer without reading any order.
+        """
+        metrics = tuple(metrics)
+        order_rules.validate_summary(group_by, metrics)
+
+        if self.__supports('summarize'):
+            return order_rules.build_summary(self.storage.summarize(group_by), metrics)
+
+        return order_operations.summarize_orders(self.storage.get_all_orders().values(), group_by, metrics)
+
     def list_all_orders(self):
         return list(self.storage.get_all_orders().values())
 
     def list_orders_by_status(self, status: str):
-        self.__validate_status(status)
+        order_rules.validate_status(status)
+
+        if self.__supports('get_orders_by_status'):
+            return list(self.storage.get_orders_by_status(status).values())
+
+        return list(order_operations.filter_orders(self.storage.get_all_orders().values(), status))
+
+    def list_orders_by_customer(self, customer_id: str, status: str = None):
+        if not customer_id:
+            raise EmptyCustomerIdError()
+
+        if status is not None:
+            order_rules.validate_status(status)
+
+        if self.__supports('get_orders_by_customer'):
+            return list(self.storage.get_orders_by_customer(customer_id, status).values())
+
+        return list(order_operations.filter_orders(self.storage.get_all_orders().values(), status, customer_id))
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None, since: float = None, until: float = None) -> Iterator[Order]:
+        """
+        Lazily iterates orders in the storage's stable key order.
+
+        `status` and `customer_id` restrict the result to one status and/or one
+        customer, `after` is the ID of the last order of the previous page and
+        `limit` caps the number of orders. With `since` and/or `until` (seconds
+        since the epoch) only the orders created in [since, until) are listed,
+        oldest first, using the storage's time index when it has one.
+        Arguments are validated eagerly, before the first order is produced.
+        """
+        order_rules.validate_page(status, limit)
+        order_rules.validate_time_range(since, until)
+
+        if after is not None and self.storage.get_order(after) is None:
+            raise InvalidCursorError(after)
+
+        if since is not None or until is not None:
+            if self.__supports('iter_orders_by_time'):
+                return self.storage.iter_orders_by_time(since, until, status, customer_id, after, limit)
+            orders = self.storage.get_all_orders().values()
+            return islice(time_index.scan_created(orders, since, until, status, customer_id, after), limit)
+
+        if self.__supports('iter_orders'):
+            if customer_id is None:
+                return self.storage.iter_orders(status=status, after=after, limit=limit)
+            return self.storage.iter_orders(status=status, after=after, limit=limit, customer_id=customer_id)
+
+        return islice(order_operations.scan_orders(self.storage.get_all_orders(), status, after, customer_id), limit)
+
+    def list_stuck_orders(self, status: str, older_than: float, limit: int = None) -> List[Order]:
+        """
+        Returns the orders that have been in `status` for more than
+        `older_than` seconds, longest waiting first, e.g. orders stuck in
+        'processing'. Orders without a recorded status change are left out.
+        """
+        order_rules.validate_stuck(status, older_than, limit)
+
+        before = self.clock() - older_than
+        if self.__supports('get_stale_orders'):
+            return self.storage.get_stale_orders(status, before, limit)
+
+        return time_index.scan_stale(self.storage.get_all_orders().values(), status, before, limit)
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the orders whose item name contains, for every word of `query`,
+        a word starting with it ("red jack" finds "Red Jacket"), in the
+        storage's stable key order. `status` and `limit` work like in
+        `iter_orders`. Storages with an item name index answer without a scan.
+        """
+        tokens = order_rules.validate_search(query, status, limit)
+
+        if self.__supports('search_orders'):
+            return self.storage.search_orders(query, status, limit)
+
+        return item_search.scan(self.storage.get_all_orders().values(), tokens, status, limit)
+
+    def __add_chunk(self, rows: List[Mapping]) -> List[Order | ValueError]:
+        results, candidates = order_operations.prepare_new_orders(rows, self.clock())
+        existing_ids = self.__insert_orders_if_absent({order_id: order for order_id, (_, order) in candidates.items()})
+        for order in order_operations.complete_new_orders(results, candidates, existing_ids):
+            self.__publish(OrderEventHub.CREATED, order)
+        return results
+
+    def __update_chunk(self, order_ids: List[str], new_status: str) -> List[Order | ValueError]:
+        if not self.__supports('transition_statuses'):
+            outcomes = {}
+            for order_id in order_ids:
+                if order_id not in outcomes:
+                    try:
+                        outcomes[order_id] = self.update_order_status(order_id, new_status)
+                    except ValueError as e:
+                        outcomes[order_id] = e
+            return [outcomes[order_id] for order_id in order_ids]
+
+        updated, rejected = self.storage.transition_statuses(
+            [order_id for order_id in order_ids if order_id], new_status, order_rules.source_statuses(new_status),
+            self.clock(),
+        )
+        for order in updated.values():
+            self.__publish(OrderEventHub.STATUS_CHANGED, order)
+        return order_operations.transition_results(order_ids, new_status, updated, rejected)
+
+    def __insert_orders_if_absent(self, orders: Mapping[str, Order]) -> set:
+        if self.__supports('insert_orders_if_absent'):
+            return self.storage.insert_orders_if_absent(orders)
+
+        existing_ids = self.__find_existing_ids(orders.keys())
+        new_orders = {order_id: order for order_id, order in orders.items() if order_id not in existing_ids}
+        if self.__supports('save_orders'):
+            self.storage.save_orders(new_orders)
+        else:
+            for order_id, order in new_orders.items():
+                self.storage.save_order(order_id, order)
+
+        return existing_ids
+
+    def __compare_and_set_status(self, order_id: str, new_status: str) -> Order:
+        # Retry until no concurrent writer changed the status between the read and the swap
+        while True:
+            status = order_operations.status_update(order_id, self.storage.get_order(order_id), new_status)
+            updated = self.storage.compare_and_set_status(order_id, status, new_status, self.clock())
+            if updated is not None:
+                self.__publish(OrderEventHub.STATUS_CHANGED, updated)
+                return updated
+
+    def __find_existing_ids(self, order_ids) -> set:
+        if self.__supports('find_existing_ids'):
+            return self.storage.find_existing_ids(order_ids)
 
-        filtered_orders = {k: v for k, v in self.storage.get_all_orders().items() if status == v.get('status')}
+        return {order_id for order_id in order_ids if self.storage.get_order(order_id) is not None}
 
-        return list(filtered_orders.values())
+    def __publish(self, event_type: str, order: Order):
+        if self.events is not None:
+            self.events.publish(event_type, order)
 
-    def __validate_status(self, status: str):
-        if status not in self.VALID_STATUS_ALLOWED:
-            raise InvalidStatusError(self.VALID_STATUS_ALLOWED, status)
\ No newline at end of file
+    def __supports(self, method: str) -> bool:
+        # Optional storage capabilities are looked up on the backend class, so a
+        # backend only opts in to a fast path by actually defining the method.
+        return callable(getattr(self.storage.__class__, method, None))
@@ -0,0 +1,60 @@
+# This module contains the list pagination settings and query parsing shared
+# by the Flask and the ASGI apps.
+import math
+from datetime import datetime, timezone
+from typing import Final
+
+from backend.exception.invalid_page_limit_error import InvalidPageLimitError
+from backend.exception.invalid_time_parameter_error import InvalidTimeParameterError
+
+DEFAULT_PAGE_SIZE: Final[int] = 100
+# Larger limits are clamped, so one request can't ask for the whole store at once
+MAX_PAGE_SIZE: Final[int] = 1000
+STREAM_CHUNK_SIZE: Final[int] = 500
+
+
+def parse_limit(limit: str | None) -> int:
+    if limit is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        page_size = int(limit)
+    except ValueError:
+        raise InvalidPageLimitError(limit)
+    if page_size < 1:
+        raise InvalidPageLimitError(limit)
+    return min(page_size, MAX_PAGE_SIZE)
+
+
+def parse_time(name: str, value: str | None) -> float | None:
+    """
+    Parses a time query parameter, seconds since the epoch or an ISO 8601
+    date and time (UTC unless it has an offset), to seconds since the epoch.
+    """
+    if not value:
+        return None
+    try:
+        seconds = float(value)
+    except ValueError:
+        try:
+            moment = datetime.fromisoformat(value)
+        except ValueError:
+            raise InvalidTimeParameterError(name, value, "seconds since the epoch or an ISO 8601 time")
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=timezone.utc)
+        return moment.timestamp()
+    if not math.isfinite(seconds):
+        raise InvalidTimeParameterError(name, value, "seconds since the epoch or an ISO 8601 time")
+    return seconds
+
+
+def parse_duration(name: str, value: str | None) -> float:
+    """
+    Parses a required, non-negative number of seconds.
+    """
+    try:
+        seconds = float(value)
+    except (TypeError, ValueError):
+        raise InvalidTimeParameterError(name, value, "a non-negative number of seconds")
+    if not math.isfinite(seconds) or seconds < 0:
+        raise InvalidTimeParameterError(name, value, "a non-negative number of seconds")
+    return seconds
@@ -0,0 +1,61 @@
+# This module contains the schemas of the JSON request bodies accepted by the
+# Flask and the ASGI apps, checked before a request reaches OrderTracker.
+from typing import Any, Callable, Final, Mapping, Tuple
+
+from backend.exception.invalid_request_error import InvalidRequestError
+
+# A field type: the check a value must pass, and how the type reads in error messages
+FieldType = Tuple[Callable[[Any], bool], str]
+
+STRING: Final[FieldType] = (lambda value: isinstance(value, str), "a string")
+# The same rule as order_rules.build_order, so the schema doesn't let through what the tracker rejects
+NON_EMPTY_STRING: Final[FieldType] = (lambda value: isinstance(value, str) and value != "", "a non-empty string")
+# bool is an int subclass, but `true` is not a quantity
+INTEGER: Final[FieldType] = (lambda value: isinstance(value, int) and not isinstance(value, bool), "an integer")
+STRING_ARRAY: Final[FieldType] = (
+    lambda value: isinstance(value, list) and all(isinstance(item, str) for item in value), "an array of strings"
+)
+
+
+class RequestSchema:
+    """
+    Validator of a JSON object body, compiled once from its field types.
+
+    Field names are kept as sets and the type error messages are built up
+    front, so validating a body is two set comparisons and one type check per
+    field, and a malformed payload is rejected before any storage access.
+    """
+    __slots__ = ('_required', '_fields', '_checks')
+
+    def __init__(self, required: Mapping[str, FieldType], optional: Mapping[str, FieldType] = None):
+        fields = {**required, **(optional or {})}
+        self._required = frozenset(required)
+        self._fields = frozenset(fields)
+        self._checks = tuple(
+            (name, check, f"'{name}' must be {description}") for name, (check, description) in fields.items()
+        )
+
+    def validate(self, body) -> dict:
+        """
+        Returns the body when it matches the schema. Raises InvalidRequestError otherwise.
+        """
+        if not isinstance(body, dict):
+            raise InvalidRequestError("expected a JSON object")
+        keys = body.keys()
+        if not self._required <= keys:
+            raise InvalidRequestError(f"missing required fields '{', '.join(sorted(self._required - keys))}'")
+        if not keys <= self._fields:
+            raise InvalidRequestError(f"unknown fields '{', '.join(sorted(keys - self._fields))}'")
+        for name, check, error in self._checks:
+            if name in body and not check(body[name]):
+                raise InvalidRequestError(error)
+        return body
+
+
+NEW_ORDER: Final[RequestSchema] = RequestSchema(
+    {'order_id': NON_EMPTY_STRING, 'item_name': NON_EMPTY_STRING, 'quantity': INTEGER, 'customer_id': NON_EMPTY_STRING},
+    {'status': STRING},
+)
+STATUS_UPDATE: Final[RequestSchema] = RequestSchema({'new_status': STRING})
+BULK_STATUS_UPDATE: Final[RequestSchema] = RequestSchema({'order_ids': STRING_ARRAY, 'new_status': STRING})
+BATCH_GET: Final[RequestSchema] = RequestSchema({'order_ids': STRING_ARRAY})
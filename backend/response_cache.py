@@ -0,0 +1,76 @@
+# This module contains the cache of serialized API responses used for
+# conditional GETs.
+import threading
+from collections import OrderedDict
+from typing import Final, Hashable, Iterable, Iterator
+
+
+class ResponseCache:
+    """
+    Bounded LRU cache of serialized response bodies.
+
+    Each body is stored with the storage version it was rendered from and is
+    only served for that same version, so writes invalidate it implicitly.
+    Bodies larger than `max_body_bytes` are never cached, which keeps huge
+    exports streaming instead of being held in memory. The least recently
+    used bodies are evicted once there are more than `max_entries` of them or
+    they hold more than `max_bytes` in total.
+    """
+    DEFAULT_MAX_ENTRIES: Final[int] = 256
+    DEFAULT_MAX_BODY_BYTES: Final[int] = 8 * 1024 * 1024
+    DEFAULT_MAX_BYTES: Final[int] = 64 * 1024 * 1024
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, max_body_bytes: int = DEFAULT_MAX_BODY_BYTES,
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        self._max_entries = max_entries
+        self._max_body_bytes = min(max_body_bytes, max_bytes)
+        self._max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int) -> bytes | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Hashable, version: int, body: bytes):
+        if len(body) > self._max_body_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[1])
+            self._entries[key] = version, body
+            self._bytes += len(body)
+            while len(self._entries) > self._max_entries or self._bytes > self._max_bytes:
+                self._bytes -= len(self._entries.popitem(last=False)[1][1])
+
+    def capture(self, key: Hashable, version: int, chunks: Iterable[str]) -> Iterator[bytes]:
+        """
+        Yields the encoded chunks of a streamed body and caches the whole body
+        once the stream is done, unless it grew past the size limit.
+        """
+        captured, size = [], 0
+        for chunk in chunks:
+            data = chunk.encode()
+            if captured is not None:
+                size += len(data)
+                if size > self._max_body_bytes:
+                    captured = None
+                else:
+                    captured.append(data)
+            yield data
+        if captured is not None:
+            self.put(key, version, b''.join(captured))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
@@ -0,0 +1,401 @@
+# This file provides a storage implementation that partitions orders across
+# several child storage backends.
+import hashlib
+import heapq
+import threading
+from bisect import bisect
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import chain, dropwhile, islice
+from operator import attrgetter
+from typing import Callable, Collection, Dict, Final, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+from backend.order import Order
+
+
+def _hash(key: str) -> int:
+    # Stable across processes, unlike hash(), so shard owners survive restarts
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), 'big')
+
+
+class _HashRing:
+    """
+    Consistent hash ring: every shard owns the keys that hash right below one
+    of its `replicas` points, so adding or removing a shard only moves the
+    keys of the points next to its own.
+    """
+    __slots__ = ('_points', '_names')
+
+    def __init__(self, names: Iterable[str], replicas: int):
+        points = sorted((_hash(f"{name}#{replica}"), name) for name in names for replica in range(replicas))
+        self._points = [point for point, _ in points]
+        self._names = [name for _, name in points]
+
+    def owner(self, key: str) -> str:
+        return self._names[bisect(self._points, _hash(key)) % len(self._points)]
+
+
+class _RebalanceGate:
+    """
+    Lets any number of storage operations run at once, or a rebalance alone.
+    Used as a context manager by operations, which is cheaper than a generator
+    based one on the hot path.
+    """
+    __slots__ = ('_condition', '_active', '_exclusive')
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._active = 0
+        self._exclusive = False
+
+    def __enter__(self):
+        with self._condition:
+            while self._exclusive:
+                self._condition.wait()
+            self._active += 1
+
+    def __exit__(self, *exc_info):
+        with self._condition:
+            self._active -= 1
+            if not self._active:
+                self._condition.notify_all()
+
+    @contextmanager
+    def exclusive(self):
+        with self._condition:
+            while self._exclusive:
+                self._condition.wait()
+            self._exclusive = True
+            self._condition.wait_for(lambda: not self._active)
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._exclusive = False
+                self._condition.notify_all()
+
+
+class ShardedStorage:
+    """
+    Storage that partitions orders across child backends by a consistent hash
+    of the order ID.
+
+    Single-order operations go to the shard that owns the ID, batches are
+    split per shard, and whole-store reads (lists, status and customer
+    queries, counts, summaries) fan out to every shard and merge the results.
+    Each shard keeps its own lock or database file, so writers of different
+    shards never contend. With `blocking=True`, e.g. for SQLite shards, fan-out
+    calls run in parallel on a thread pool with one worker per shard.
+
+    Orders are listed shard by shard, each shard in its own insertion order.
+    That order is stable, so cursor pagination works as with a single
+    backend, but it is not the global insertion order.
+
+    `shards` maps shard names to backends; a plain sequence is named by index.
+    Names, not positions, place shards on the hash ring, so `rebalance` to a
+    bigger or smaller set only moves the orders whose owner changed.
+
+    Instances only expose the optional storage methods every shard implements,
+    so OrderTracker picks the same fast paths as with a single backend.
+    """
+    OPTIONAL_METHODS: Final[Tuple[str, ...]] = (
+        'save_orders', 'insert_if_absent', 'insert_orders_if_absent', 'compare_and_set_status',
+        'transition_statuses', 'find_existing_ids', 'get_orders', 'get_orders_by_status', 'get_orders_by_customer', 'iter_orders',
+        'iter_orders_by_time', 'get_stale_orders', 'search_orders', 'count_orders', 'summarize', 'get_version', 'get_order_version', 'snapshot', 'clear',
+        'replace_orders', 'close',
+    )
+    DEFAULT_REPLICAS: Final[int] = 128
+    _classes: Dict[Tuple[type, Tuple[type, ...]], type] = {}
+
+    def __new__(cls, shards, *args, **kwargs):
+        backends = tuple(sorted({type(shard) for shard in cls.__named(shards).values()}, key=lambda c: c.__name__))
+        subclass = cls._classes.get((cls, backends))
+        if subclass is None:
+            # Methods some shard lacks are set to None, so capability checks see them as missing
+            missing = {name: None for name in cls.__missing_methods(backends)}
+            prefix = backends[0].__name__ if len(backends) == 1 else 'Storage'
+            subclass = cls._classes.setdefault((cls, backends), type(f"Sharded{prefix}", (cls,), missing))
+        return super().__new__(subclass)
+
+    def __init__(self, shards: Mapping[str, object] | Sequence[object], blocking: bool = False,
+                 replicas: int = DEFAULT_REPLICAS):
+        self._shards = self.__named(shards)
+        if not self._shards:
+            raise ValueError("ShardedStorage needs at least one shard.")
+        self._replicas = replicas
+        self._ring = _HashRing(self._shards, replicas)
+        self._blocking = blocking
+        self._executor = None
+        self._gate = _RebalanceGate()
+        # Added to the sum of the shard versions, so a rebalance dropping shards can't move it back
+        self._version_offset = 0
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        with self._gate:
+            self.__shard(order_id).save_order(order_id, order_data)
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        with self._gate:
+            self.__fan_out(lambda shard, part: shard.save_orders(part), self.__split(orders))
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        with self._gate:
+            return self.__shard(order_id).insert_if_absent(order_id, order_data)
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        with self._gate:
+            skipped = self.__fan_out(lambda shard, part: shard.insert_orders_if_absent(part), self.__split(orders))
+        return set().union(*skipped)
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        with self._gate:
+            return self.__shard(order_id).compare_and_set_status(order_id, expected_status, new_status, at)
+
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        updated, rejected = {}, {}
+        with self._gate:
+            results = self.__fan_out(
+                lambda shard, part: shard.transition_statuses(part, new_status, from_statuses, at),
+                self.__split(dict.fromkeys(order_ids)),
+            )
+        for shard_updated, shard_rejected in results:
+            updated.update(shard_updated)
+            rejected.update(shard_rejected)
+        return updated, rejected
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        with self._gate:
+            existing = self.__fan_out(
+                lambda shard, part: shard.find_existing_ids(list(part)), self.__split(dict.fromkeys(order_ids))
+            )
+        return set().union(*existing)
+
+    def get_order(self, order_id: str):
+        with self._gate:
+            return self.__shard(order_id).get_order(order_id)
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order,
+        with one batch lookup per shard.
+        """
+        order_ids = list(dict.fromkeys(order_ids))
+        with self._gate:
+            parts = self.__fan_out(
+                lambda shard, part: shard.get_orders(list(part)), self.__split(dict.fromkeys(order_ids))
+            )
+        found = {}
+        for orders in parts:
+            found.update(orders)
+        return {order_id: found[order_id] for order_id in order_ids if order_id in found}
+
+    def get_all_orders(self):
+        return self.__merge(lambda shard: shard.get_all_orders())
+
+    def count_orders(self) -> int:
+        return sum(self.__broadcast(lambda shard: shard.count_orders()))
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        totals = {}
+        for shard_totals in self.__broadcast(lambda shard: shard.summarize(group_by)):
+            for key, (count, quantity) in shard_totals.items():
+                previous_count, previous_quantity = totals.get(key, (0, 0))
+                totals[key] = previous_count + count, previous_quantity + quantity
+        return totals
+
+    def get_version(self) -> int:
+        # Every shard version only grows, so their sum changes on every write to any shard
+        with self._gate:
+            return self._version_offset + sum(self.__each(lambda shard: shard.get_version()))
+
+    def get_order_version(self, order_id: str) -> int | None:
+        with self._gate:
+            return self.__shard(order_id).get_order_version(order_id)
+
+    def get_orders_by_status(self, status: str):
+        return self.__merge(lambda shard: shard.get_orders_by_status(status))
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        return self.__merge(lambda shard: shard.get_orders_by_customer(customer_id, status))
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None) -> Iterator[Order]:
+        """
+        Yields the orders shard by shard, see the class docs for the order.
+        Not guarded against a concurrent rebalance, which can make a running
+        iteration skip or repeat moved orders.
+        """
+        filters = {"status": status} if customer_id is None else {"status": status, "customer_id": customer_id}
+        names = list(self._shards)
+        start = 0 if after is None else names.index(self._ring.owner(after))
+        shards = [self._shards[name] for name in names[start:]]
+        orders = chain(
+            shards[0].iter_orders(after=after, **filters),
+            *(shard.iter_orders(**filters) for shard in shards[1:]),
+        )
+        return islice(orders, limit)
+
+    def iter_orders_by_time(self, since: float = None, until: float = None, status: str = None,
+                            customer_id: str = None, after: str = None, limit: int = None) -> Iterator[Order]:
+        """
+        Yields the orders created in [since, until) of all shards, oldest
+        first, merging the time-ordered streams of the shards.
+        """
+        cursor = None if after is None else self.get_order(after)
+        if cursor is not None and cursor.created_at is not None:
+            # The other shards resume at the cursor's time, the merge then skips up to the cursor
+            since = cursor.created_at if since is None else max(since, cursor.created_at)
+        else:
+            cursor = None
+        orders = heapq.merge(
+            *(shard.iter_orders_by_time(since, until, status, customer_id) for shard in self._shards.values()),
+            key=attrgetter('created_at'),
+        )
+        if cursor is not None:
+            # The merge is stable, so orders of the cursor's time come in the same order on every call
+            orders = dropwhile(lambda order: order.order_id != cursor.order_id, orders)
+            next(orders, None)
+        return islice(orders, limit)
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        stale = heapq.merge(
+            *self.__broadcast(lambda shard: shard.get_stale_orders(status, before, limit)),
+            key=attrgetter('status_since'),
+        )
+        return list(islice(stale, limit))
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the matching orders shard by shard, like `iter_orders`.
+        """
+        found = list(chain.from_iterable(self.__broadcast(lambda shard: shard.search_orders(query, status, limit))))
+        return found[:limit]
+
+    def snapshot(self):
+        self.__broadcast(lambda shard: shard.snapshot())
+
+    def clear(self):
+        self.__broadcast(lambda shard: shard.clear())
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        """
+        Replaces every stored order with `orders`, each shard atomically with
+        its part of them.
+        """
+        with self._gate:
+            parts = self.__split(orders)
+            self.__fan_out(lambda shard, part: shard.replace_orders(part), {name: parts[name] for name in self._shards})
+
+    def close(self):
+        self.__broadcast(lambda shard: shard.close())
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def rebalance(self, shards: Mapping[str, object] | Sequence[object]) -> int:
+        """
+        Switches to a new set of shards and moves every order whose owner
+        changed. Shards are matched by name, so existing shards must keep
+        theirs. Shards left out of the new set keep their orders; close them
+        once done. Operations wait while the orders move, running iterations
+        don't. Moving orders are saved to their new owners first, then every
+        old owner that stays is atomically replaced by the orders it keeps,
+        so an interrupted rebalance can leave copies behind but loses no
+        order. The store version keeps growing across the switch. Returns the
+        number of moved orders.
+        """
+        shards = self.__named(shards)
+        if not shards:
+            raise ValueError("ShardedStorage needs at least one shard.")
+        # Moving orders needs 'replace_orders', and the new shards must keep every capability this storage exposes
+        missing = [name for name in self.__missing_methods({type(shard) for shard in shards.values()})
+                   if name == 'replace_orders' or callable(getattr(type(self), name, None))]
+        if missing:
+            raise TypeError(f"Shards must implement callable '{', '.join(missing)}' methods.")
+
+        ring = _HashRing(shards, self._replicas)
+        with self._gate.exclusive():
+            incoming, kept = defaultdict(dict), {}
+            for name, shard in self._shards.items():
+                staying, leaving = {}, False
+                for order_id, order in shard.get_all_orders().items():
+                    owner = ring.owner(order_id)
+                    if owner == name and name in shards:
+                        staying[order_id] = order
+                    else:
+                        incoming[owner][order_id] = order
+                        leaving = True
+                if leaving and name in shards:
+                    kept[name] = staying
+            for owner, orders in incoming.items():
+                self.__save(shards[owner], orders)
+            for name, staying in kept.items():
+                # One atomic swap, a crash never sees the shard emptied
+                self._shards[name].replace_orders({**staying, **incoming.get(name, {})})
+            previous_version = self._version_offset + sum(shard.get_version() for shard in self._shards.values())
+            self._shards, self._ring = shards, ring
+            self._version_offset = previous_version + 1 - sum(shard.get_version() for shard in shards.values())
+            if self._executor is not None:
+                # Sized for the old shard count
+                self._executor.shutdown()
+                self._executor = None
+        return sum(map(len, incoming.values()))
+
+    def __shard(self, order_id: str):
+        return self._shards[self._ring.owner(order_id)]
+
+    def __split(self, orders: Mapping) -> Dict[str, dict]:
+        parts = defaultdict(dict)
+        owner = self._ring.owner
+        for order_id, order in orders.items():
+            parts[owner(order_id)][order_id] = order
+        return parts
+
+    def __fan_out(self, call: Callable, parts: Mapping[str, Mapping]) -> List:
+        # Caller holds the gate
+        jobs = [(self._shards[name], part) for name, part in parts.items()]
+        if self._blocking and len(jobs) > 1:
+            return list(self.__pool().map(lambda job: call(*job), jobs))
+        return [call(shard, part) for shard, part in jobs]
+
+    def __broadcast(self, call: Callable) -> List:
+        with self._gate:
+            return self.__each(call)
+
+    def __each(self, call: Callable) -> List:
+        # Caller holds the gate, which is not reentrant: a waiting rebalance blocks a second entry
+        return self.__fan_out(lambda shard, _: call(shard), dict.fromkeys(self._shards, None))
+
+    def __merge(self, call: Callable) -> dict:
+        merged = {}
+        for orders in self.__broadcast(call):
+            merged.update(orders)
+        return merged
+
+    def __pool(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=len(self._shards), thread_name_prefix='shard')
+        return self._executor
+
+    @staticmethod
+    def __save(shard, orders: Mapping[str, Mapping]):
+        if callable(getattr(type(shard), 'save_orders', None)):
+            shard.save_orders(orders)
+        else:
+            for order_id, order in orders.items():
+                shard.save_order(order_id, order)
+
+    @classmethod
+    def __missing_methods(cls, backends: Iterable[type]) -> List[str]:
+        backends = list(backends)
+        return [name for name in cls.OPTIONAL_METHODS
+                if not all(callable(getattr(backend, name, None)) for backend in backends)]
+
+    @staticmethod
+    def __named(shards) -> Dict[str, object]:
+        if isinstance(shards, Mapping):
+            return dict(shards)
+        return {f"shard-{index}": shard for index, shard in enumerate(shards)}
@@ -0,0 +1,198 @@
+# This file provides a storage client that lets several app processes share
+# one storage backend, served by backend/storage_server.py.
+import os
+import tempfile
+import threading
+from multiprocessing.connection import Client
+from typing import Collection, Dict, Final, FrozenSet, Iterable, Iterator, List, Mapping, Tuple
+
+from backend.order import Order
+
+# Reserved request name, answered with the storage methods the server exposes
+CAPABILITIES: Final[str] = 'capabilities'
+# Socket path used when none is configured, in a directory private to the user
+DEFAULT_ADDRESS: Final[str] = os.path.join(tempfile.gettempdir(), f'udatrack-{os.getuid()}', 'storage.sock')
+
+
+def check_authkey(authkey: bytes):
+    # Calls are pickles, so a peer that can't prove it knows the key is never talked to
+    if not authkey:
+        raise ValueError("The shared storage needs an authkey, set SHARED_STORAGE_AUTHKEY on the server and clients.")
+
+
+class SharedStorage:
+    """
+    Storage client for a StorageServer listening on a local (Unix) socket.
+
+    Every call is sent to the server, which runs it on the one backend all
+    clients share, so orders written by one worker process are visible to
+    all the others. Each thread gets its own connection, opened on first use
+    and reopened after a fork, so pre-fork servers can create the client
+    before forking. Both sides authenticate with the shared `authkey`, which
+    is required.
+
+    `iter_orders` and `iter_orders_by_time` fetch `PAGE_SIZE` orders per
+    round trip. `close` only
+    closes this client's connections; the backend belongs to the server.
+
+    Instances only expose the optional storage methods the served backend
+    implements, so OrderTracker picks the same fast paths as in process.
+    """
+    OPTIONAL_METHODS: Final[Tuple[str, ...]] = (
+        'save_orders', 'insert_if_absent', 'insert_orders_if_absent', 'compare_and_set_status',
+        'transition_statuses', 'find_existing_ids', 'get_orders', 'get_orders_by_status', 'get_orders_by_customer', 'iter_orders',
+        'iter_orders_by_time', 'get_stale_orders', 'search_orders', 'count_orders', 'summarize', 'get_version', 'get_order_version', 'snapshot', 'clear',
+        'replace_orders',
+    )
+    PAGE_SIZE: Final[int] = 500
+    _classes: Dict[Tuple[type, FrozenSet[str]], type] = {}
+
+    def __new__(cls, address: str, authkey: bytes):
+        check_authkey(authkey)
+        with Client(address, 'AF_UNIX', authkey=authkey) as connection:
+            capabilities = frozenset(cls.__result(cls.__request(connection, CAPABILITIES, (), {})))
+        subclass = cls._classes.get((cls, capabilities))
+        if subclass is None:
+            # Methods the backend lacks are set to None, so capability checks see them as missing
+            missing = {name: None for name in cls.OPTIONAL_METHODS if name not in capabilities}
+            subclass = cls._classes.setdefault((cls, capabilities), type("SharedStorage", (cls,), missing))
+        return super().__new__(subclass)
+
+    def __init__(self, address: str, authkey: bytes):
+        self._address = address
+        self._authkey = authkey
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        self.__call('save_order', order_id, Order.from_mapping(order_data))
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        self.__call('save_orders', {order_id: Order.from_mapping(order) for order_id, order in orders.items()})
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        return self.__call('insert_if_absent', order_id, Order.from_mapping(order_data))
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        return self.__call(
+            'insert_orders_if_absent', {order_id: Order.from_mapping(order) for order_id, order in orders.items()}
+        )
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        return self.__call('compare_and_set_status', order_id, expected_status, new_status, at)
+
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        return self.__call('transition_statuses', list(order_ids), new_status, set(from_statuses), at)
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        return self.__call('find_existing_ids', list(order_ids))
+
+    def get_order(self, order_id: str):
+        return self.__call('get_order', order_id)
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        return self.__call('get_orders', list(order_ids))
+
+    def get_all_orders(self):
+        return self.__call('get_all_orders')
+
+    def count_orders(self) -> int:
+        return self.__call('count_orders')
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        return self.__call('summarize', group_by)
+
+    def get_version(self) -> int:
+        return self.__call('get_version')
+
+    def get_order_version(self, order_id: str) -> int | None:
+        return self.__call('get_order_version', order_id)
+
+    def get_orders_by_status(self, status: str):
+        return self.__call('get_orders_by_status', status)
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        return self.__call('get_orders_by_customer', customer_id, status)
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None) -> Iterator[Order]:
+        """
+        Yields orders in the backend's order, one page per round trip, see
+        the backend's `iter_orders`.
+        """
+        return self.__pages('iter_orders', after, limit, status=status, customer_id=customer_id)
+
+    def iter_orders_by_time(self, since: float = None, until: float = None, status: str = None,
+                            customer_id: str = None, after: str = None, limit: int = None) -> Iterator[Order]:
+        return self.__pages(
+            'iter_orders_by_time', after, limit, since=since, until=until, status=status, customer_id=customer_id
+        )
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        return self.__call('get_stale_orders', status, before, limit)
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        return self.__call('search_orders', query, status, limit)
+
+    def snapshot(self):
+        self.__call('snapshot')
+
+    def clear(self):
+        self.__call('clear')
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        self.__call('replace_orders', {order_id: Order.from_mapping(order) for order_id, order in orders.items()})
+
+    def close(self):
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
+
+    def __call(self, method: str, *args, **kwargs):
+        connection = self.__connection()
+        try:
+            reply = self.__request(connection, method, args, kwargs)
+        except (EOFError, OSError) as error:
+            # The request may or may not have run, so it is not retried
+            self._local.connection = None
+            connection.close()
+            raise ConnectionError(f"Lost the connection to the storage server at '{self._address}'.") from error
+        return self.__result(reply)
+
+    def __pages(self, method: str, after: str | None, limit: int | None, **filters) -> Iterator[Order]:
+        cursor, remaining = after, limit
+        while remaining is None or remaining > 0:
+            page_size = self.PAGE_SIZE if remaining is None else min(remaining, self.PAGE_SIZE)
+            page = self.__call(method, after=cursor, limit=page_size, **filters)
+            yield from page
+            if len(page) < page_size:
+                return
+            cursor = page[-1].order_id
+            if remaining is not None:
+                remaining -= len(page)
+
+    def __connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = Client(self._address, 'AF_UNIX', authkey=self._authkey)
+            self._local.connection, self._local.pid = connection, os.getpid()
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def __request(connection, method: str, args: tuple, kwargs: dict) -> tuple:
+        connection.send((method, args, kwargs))
+        return connection.recv()
+
+    @staticmethod
+    def __result(reply: tuple):
+        # Errors raised by the backend are re-raised here
+        ok, result = reply
+        if not ok:
+            raise result
+        return result
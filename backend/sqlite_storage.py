@@ -0,0 +1,534 @@
+# This file provides a durable SQLite implementation of the storage interface.
+# Data stored here survives application restarts.
+import json
+import math
+import sqlite3
+import threading
+from itertools import islice
+from typing import Collection, Dict, Final, Iterable, Iterator, List, Mapping, Tuple
+
+from backend.item_search import PREFIX_END, tokenize
+from backend.order import Order
+from backend.order_totals import OrderTotals
+
+_COLUMNS: Final[str] = ", ".join(Order.FIELDS)
+_PLACEHOLDERS: Final[str] = ", ".join("?" * len(Order.FIELDS))
+# When the order entered its current status, from the last history entry, for stuck order queries
+_STATUS_SINCE: Final[str] = (
+    "REAL GENERATED ALWAYS AS (CASE WHEN json_extract(history, '$[#-1][0]') = status "
+    "THEN json_extract(history, '$[#-1][1]') END) VIRTUAL"
+)
+
+_SCHEMA: Final[str] = f"""
+CREATE TABLE IF NOT EXISTS orders (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id TEXT NOT NULL UNIQUE,
+    item_name TEXT NOT NULL,
+    quantity INTEGER NOT NULL,
+    customer_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    version INTEGER NOT NULL DEFAULT 0,
+    created_at REAL,
+    updated_at REAL,
+    history TEXT NOT NULL DEFAULT '[]',
+    status_since {_STATUS_SINCE}
+);
+CREATE INDEX IF NOT EXISTS orders_status_idx ON orders (status, seq);
+CREATE INDEX IF NOT EXISTS orders_customer_idx ON orders (customer_id, seq);
+CREATE INDEX IF NOT EXISTS orders_customer_status_idx ON orders (customer_id, status, seq);
+CREATE INDEX IF NOT EXISTS orders_item_idx ON orders (item_name, seq);
+CREATE TABLE IF NOT EXISTS store_version (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    version INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO store_version (id, version) VALUES (1, 0);
+CREATE TRIGGER IF NOT EXISTS orders_inserted AFTER INSERT ON orders
+BEGIN UPDATE store_version SET version = version + 1; END;
+CREATE TRIGGER IF NOT EXISTS orders_updated AFTER UPDATE ON orders
+BEGIN UPDATE store_version SET version = version + 1; END;
+"""
+# Running totals per status, item and customer, kept by triggers like the store version
+_ADD_TO_TOTALS: Final[str] = " ".join(
+    f"INSERT INTO order_totals VALUES ('{field}', NEW.{field}, 1, NEW.quantity) "
+    f"ON CONFLICT DO UPDATE SET orders = orders + 1, quantity = quantity + excluded.quantity;"
+    for field in OrderTotals.FIELDS
+)
+_SUBTRACT_FROM_TOTALS: Final[str] = " ".join(
+    f"UPDATE order_totals SET orders = orders - 1, quantity = quantity - OLD.quantity "
+    f"WHERE field = '{field}' AND key = OLD.{field};"
+    for field in OrderTotals.FIELDS
+)
+_TOTALS_SCHEMA: Final[Tuple[str, ...]] = (
+    """
+    CREATE TABLE order_totals (
+        field TEXT NOT NULL,
+        key TEXT NOT NULL,
+        orders INTEGER NOT NULL,
+        quantity INTEGER NOT NULL,
+        PRIMARY KEY (field, key)
+    ) WITHOUT ROWID
+    """,
+    f"CREATE TRIGGER order_totals_inserted AFTER INSERT ON orders BEGIN {_ADD_TO_TOTALS} END",
+    f"CREATE TRIGGER order_totals_updated AFTER UPDATE OF item_name, quantity, customer_id, status ON orders "
+    f"BEGIN {_SUBTRACT_FROM_TOTALS} {_ADD_TO_TOTALS} END",
+    # Counts the orders already stored, for databases created before the totals
+    "INSERT INTO order_totals " + " UNION ALL ".join(
+        f"SELECT '{field}', {field}, COUNT(*), SUM(quantity) FROM orders GROUP BY {field}"
+        for field in OrderTotals.FIELDS
+    ),
+)
+# Inverted index from the tokens of item names to the names, see backend/item_search.py.
+# Rows are never deleted, a name no order has any more just matches no order.
+_ITEM_TOKENS_SCHEMA: Final[str] = """
+CREATE TABLE item_tokens (
+    token TEXT NOT NULL,
+    item_name TEXT NOT NULL,
+    PRIMARY KEY (token, item_name)
+) WITHOUT ROWID
+"""
+_INSERT_ITEM_TOKEN: Final[str] = "INSERT OR IGNORE INTO item_tokens (token, item_name) VALUES (?, ?)"
+# Databases created before per-order versions or timestamps get the columns added on open
+_ADDED_COLUMNS: Final[Tuple[Tuple[str, str], ...]] = (
+    ("version", "INTEGER NOT NULL DEFAULT 0"),
+    ("created_at", "REAL"),
+    ("updated_at", "REAL"),
+    ("history", "TEXT NOT NULL DEFAULT '[]'"),
+    ("status_since", _STATUS_SINCE),
+)
+# Created after the columns were added
+_TIME_INDEXES: Final[str] = """
+CREATE INDEX IF NOT EXISTS orders_created_idx ON orders (created_at, seq);
+CREATE INDEX IF NOT EXISTS orders_status_since_idx ON orders (status, status_since, seq);
+"""
+# A written row takes the store version its trigger is about to move to
+_NEXT_VERSION: Final[str] = "(SELECT version FROM store_version) + 1"
+
+# Statements are module constants so sqlite3's per-connection statement cache
+# keeps each of them prepared across calls.
+_UPSERT: Final[str] = f"""
+INSERT INTO orders ({_COLUMNS}, version) VALUES ({_PLACEHOLDERS}, {_NEXT_VERSION})
+ON CONFLICT (order_id) DO UPDATE SET
+    item_name = excluded.item_name,
+    quantity = excluded.quantity,
+    customer_id = excluded.customer_id,
+    status = excluded.status,
+    created_at = excluded.created_at,
+    updated_at = excluded.updated_at,
+    history = excluded.history,
+    version = {_NEXT_VERSION}
+"""
+_INSERT_IF_ABSENT: Final[str] = (
+    f"INSERT INTO orders ({_COLUMNS}, version) VALUES ({_PLACEHOLDERS}, {_NEXT_VERSION}) "
+    f"ON CONFLICT (order_id) DO NOTHING"
+)
+# Moves an order to a status, see `_status_change` for its parameters
+_SET_STATUS: Final[str] = (
+    f"status = ?, version = {_NEXT_VERSION}, updated_at = COALESCE(?, updated_at), "
+    f"history = CASE WHEN ? IS NULL THEN history ELSE json_insert(history, '$[#]', json_array(?, ?)) END"
+)
+_COMPARE_AND_SET_STATUS: Final[str] = (
+    f"UPDATE orders SET {_SET_STATUS} WHERE order_id = ? AND status = ? RETURNING {_COLUMNS}"
+)
+_SELECT_ONE: Final[str] = f"SELECT {_COLUMNS} FROM orders WHERE order_id = ?"
+_SELECT_ALL: Final[str] = f"SELECT {_COLUMNS} FROM orders ORDER BY seq"
+_COUNT: Final[str] = "SELECT COUNT(*) FROM orders"
+_SELECT_TOTALS: Final[str] = "SELECT key, orders, quantity FROM order_totals WHERE field = ? AND orders > 0"
+_SELECT_VERSION: Final[str] = "SELECT version FROM store_version"
+_SELECT_ORDER_VERSION: Final[str] = "SELECT version FROM orders WHERE order_id = ?"
+_BUMP_VERSION: Final[str] = "UPDATE store_version SET version = version + 1"
+_SELECT_BY_STATUS: Final[str] = f"SELECT {_COLUMNS} FROM orders WHERE status = ? ORDER BY seq"
+_SELECT_BY_CUSTOMER: Final[str] = f"SELECT {_COLUMNS} FROM orders WHERE customer_id = ? ORDER BY seq"
+_SELECT_BY_CUSTOMER_AND_STATUS: Final[str] = (
+    f"SELECT {_COLUMNS} FROM orders WHERE customer_id = ? AND status = ? ORDER BY seq"
+)
+_SELECT_PAGE: Final[str] = f"""
+SELECT {_COLUMNS} FROM orders
+WHERE seq > COALESCE((SELECT seq FROM orders WHERE order_id = :after), 0)
+ORDER BY seq
+LIMIT :limit
+"""
+# A separate statement, so the planner can range-scan orders_status_idx instead of the whole table
+_SELECT_STATUS_PAGE: Final[str] = f"""
+SELECT {_COLUMNS} FROM orders
+WHERE status = :status
+  AND seq > COALESCE((SELECT seq FROM orders WHERE order_id = :after), 0)
+ORDER BY seq
+LIMIT :limit
+"""
+# A separate statement, so the planner can pick the customer indexes for it
+_SELECT_CUSTOMER_PAGE: Final[str] = f"""
+SELECT {_COLUMNS} FROM orders
+WHERE customer_id = :customer_id
+  AND (:status IS NULL OR status = :status)
+  AND seq > COALESCE((SELECT seq FROM orders WHERE order_id = :after), 0)
+ORDER BY seq
+LIMIT :limit
+"""
+_SELECT_CREATED_PAGE: Final[str] = f"""
+SELECT {_COLUMNS} FROM orders
+WHERE created_at >= :since AND created_at < :until
+  AND (created_at, seq) > (:after_created_at, :after_seq)
+  AND (:status IS NULL OR status = :status)
+  AND (:customer_id IS NULL OR customer_id = :customer_id)
+ORDER BY created_at, seq
+LIMIT :limit
+"""
+_SELECT_CREATED_CURSOR: Final[str] = "SELECT created_at, seq FROM orders WHERE order_id = ? AND created_at IS NOT NULL"
+_SELECT_STALE: Final[str] = (
+    f"SELECT {_COLUMNS} FROM orders WHERE status = ? AND status_since < ? ORDER BY status_since, seq LIMIT ?"
+)
+_FETCH_SIZE: Final[int] = 500
+# Keeps "IN (...)" lists well below SQLITE_MAX_VARIABLE_NUMBER
+_ID_CHUNK_SIZE: Final[int] = 500
+
+
+_encode = json.JSONEncoder(separators=(',', ':')).encode
+_decode = json.JSONDecoder().decode
+
+
+def _order(row: tuple) -> Order:
+    # The history is stored as a JSON array of [status, time] pairs, and comes last
+    return Order(*row[:-1], tuple(map(tuple, _decode(row[-1]))))
+
+
+def _status_change(status: str, at: float | None) -> tuple:
+    # Parameters of _SET_STATUS: the status is always set, the time and history only with `at`
+    return status, at, at, status, at
+
+
+class SqliteStorage:
+    """
+    SQLite implementation of the storage interface.
+
+    Each thread gets its own connection to the database file, opened in WAL
+    mode so readers never block the writer. Filtering and pagination run in
+    SQL against the status and customer_id indexes, so Python only ever sees
+    the matching rows. Item searches resolve the query against a table of
+    item name tokens, then read the matching orders by the item_name index.
+    Triggers keep a store-wide version that every insert
+    and update bumps, each row stores the version of its last write, and
+    triggers also keep the running totals that `summarize` reads.
+
+    Use a file path, or a shared-cache URI such as
+    "file:orders?mode=memory&cache=shared" for a throwaway in-memory database.
+    """
+    def __init__(self, path: str = "udatrack.db"):
+        self._path = path
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        # Names whose tokens are known to be stored, so repeat writes skip them
+        self._indexed_names = set()
+        connection = self.__connection()
+        connection.executescript(_SCHEMA)
+        # table_xinfo, unlike table_info, lists generated columns too
+        columns = {column[1] for column in connection.execute("PRAGMA table_xinfo(orders)")}
+        for name, definition in _ADDED_COLUMNS:
+            if name not in columns:
+                connection.execute(f"ALTER TABLE orders ADD COLUMN {name} {definition}")
+        connection.executescript(_TIME_INDEXES)
+        self.__create_totals(connection)
+        self.__create_item_tokens(connection)
+
+    def save_order(self, order_id: str, order_data: Mapping):
+        order = Order.from_mapping(order_data)
+        connection = self.__connection()
+        self.__index_item_names(connection, (order,))
+        connection.execute(_UPSERT, self.__row(order_id, order))
+
+    def save_orders(self, orders: Mapping[str, Mapping]):
+        orders = {order_id: Order.from_mapping(order) for order_id, order in orders.items()}
+        connection = self.__connection()
+        self.__index_item_names(connection, orders.values())
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(_UPSERT, (self.__row(order_id, order) for order_id, order in orders.items()))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def insert_if_absent(self, order_id: str, order_data: Mapping) -> bool:
+        order = Order.from_mapping(order_data)
+        connection = self.__connection()
+        self.__index_item_names(connection, (order,))
+        return connection.execute(_INSERT_IF_ABSENT, self.__row(order_id, order)).rowcount == 1
+
+    def insert_orders_if_absent(self, orders: Mapping[str, Mapping]) -> set:
+        orders = {order_id: Order.from_mapping(order) for order_id, order in orders.items()}
+        connection = self.__connection()
+        self.__index_item_names(connection, orders.values())
+        # IMMEDIATE takes the write lock up front, so the check and the insert are atomic
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            existing_ids = self.__existing_ids(connection, orders.keys())
+            connection.executemany(_INSERT_IF_ABSENT, (
+                self.__row(order_id, order) for order_id, order in orders.items() if order_id not in existing_ids
+            ))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return existing_ids
+
+    def compare_and_set_status(self, order_id: str, expected_status: str, new_status: str,
+                               at: float = None) -> Order | None:
+        # fetchall steps the statement to completion, so the update is committed
+        rows = self.__connection().execute(
+            _COMPARE_AND_SET_STATUS, (*_status_change(new_status, at), order_id, expected_status)
+        ).fetchall()
+        return _order(rows[0]) if rows else None
+
+    def transition_statuses(self, order_ids: Iterable[str], new_status: str, from_statuses: Collection[str],
+                            at: float = None) -> Tuple[Dict[str, Order], Dict[str, str]]:
+        """
+        Atomically moves every listed order whose status is in `from_statuses`
+        to `new_status`, one UPDATE per chunk of IDs, all in one transaction,
+        recording the change at time `at` when given. Returns the updated
+        orders by ID, and the current status of the orders left alone.
+        Missing IDs are in neither.
+        """
+        updated, rejected = {}, {}
+        from_statuses = list(from_statuses)
+        ids = iter(dict.fromkeys(order_ids))
+        connection = self.__connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            while chunk := list(islice(ids, _ID_CHUNK_SIZE)):
+                id_placeholders = ", ".join("?" * len(chunk))
+                if from_statuses:
+                    cursor = connection.execute(
+                        f"UPDATE orders SET {_SET_STATUS} "
+                        f"WHERE order_id IN ({id_placeholders}) AND status IN ({', '.join('?' * len(from_statuses))}) "
+                        f"RETURNING {_COLUMNS}",
+                        [*_status_change(new_status, at), *chunk, *from_statuses],
+                    )
+                    updated.update((row[0], _order(row)) for row in cursor.fetchall())
+                cursor = connection.execute(
+                    f"SELECT order_id, status FROM orders WHERE order_id IN ({id_placeholders})", chunk
+                )
+                rejected.update((order_id, status) for order_id, status in cursor if order_id not in updated)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return updated, rejected
+
+    def find_existing_ids(self, order_ids: Iterable[str]) -> set:
+        return self.__existing_ids(self.__connection(), order_ids)
+
+    def get_order(self, order_id: str):
+        row = self.__connection().execute(_SELECT_ONE, (order_id,)).fetchone()
+        return _order(row) if row else None
+
+    def get_orders(self, order_ids: Iterable[str]) -> Dict[str, Order]:
+        """
+        Returns the existing orders of `order_ids` by ID, in request order,
+        with one `IN` query per chunk of IDs.
+        """
+        connection = self.__connection()
+        order_ids = list(dict.fromkeys(order_ids))
+        found = {}
+        ids = iter(order_ids)
+        while chunk := list(islice(ids, _ID_CHUNK_SIZE)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = connection.execute(f"SELECT {_COLUMNS} FROM orders WHERE order_id IN ({placeholders})", chunk)
+            found.update((row[0], _order(row)) for row in cursor)
+        return {order_id: found[order_id] for order_id in order_ids if order_id in found}
+
+    def get_all_orders(self):
+        return {row[0]: _order(row) for row in self.__connection().execute(_SELECT_ALL)}
+
+    def count_orders(self) -> int:
+        return self.__connection().execute(_COUNT).fetchone()[0]
+
+    def get_version(self) -> int:
+        return self.__connection().execute(_SELECT_VERSION).fetchone()[0]
+
+    def get_order_version(self, order_id: str) -> int | None:
+        row = self.__connection().execute(_SELECT_ORDER_VERSION, (order_id,)).fetchone()
+        return row[0] if row else None
+
+    def summarize(self, group_by: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns the order count and quantity sum of every group of `group_by`,
+        one of OrderTotals.FIELDS.
+        """
+        cursor = self.__connection().execute(_SELECT_TOTALS, (group_by,))
+        return {key: (orders, quantity) for key, orders, quantity in cursor}
+
+    def get_orders_by_status(self, status: str):
+        return {row[0]: _order(row) for row in self.__connection().execute(_SELECT_BY_STATUS, (status,))}
+
+    def get_orders_by_customer(self, customer_id: str, status: str = None):
+        if status is None:
+            cursor = self.__connection().execute(_SELECT_BY_CUSTOMER, (customer_id,))
+        else:
+            cursor = self.__connection().execute(_SELECT_BY_CUSTOMER_AND_STATUS, (customer_id, status))
+        return {row[0]: _order(row) for row in cursor}
+
+    def iter_orders(self, status: str = None, after: str = None, limit: int = None,
+                    customer_id: str = None) -> Iterator[Order]:
+        if customer_id is not None:
+            statement = _SELECT_CUSTOMER_PAGE
+        else:
+            statement = _SELECT_PAGE if status is None else _SELECT_STATUS_PAGE
+        cursor = self.__connection().execute(
+            statement,
+            {"status": status, "customer_id": customer_id, "after": after, "limit": -1 if limit is None else limit},
+        )
+        while rows := cursor.fetchmany(_FETCH_SIZE):
+            for row in rows:
+                yield _order(row)
+
+    def iter_orders_by_time(self, since: float = None, until: float = None, status: str = None,
+                            customer_id: str = None, after: str = None, limit: int = None) -> Iterator[Order]:
+        """
+        Yields the orders created in [since, until), oldest first, optionally
+        restricted to a status and/or a customer and starting right after the
+        order with ID `after`. Orders without a creation time are left out.
+        """
+        connection = self.__connection()
+        cursor_row = None if after is None else connection.execute(_SELECT_CREATED_CURSOR, (after,)).fetchone()
+        after_created_at, after_seq = cursor_row or (-math.inf, 0)
+        cursor = connection.execute(_SELECT_CREATED_PAGE, {
+            "since": -math.inf if since is None else since, "until": math.inf if until is None else until,
+            "after_created_at": after_created_at, "after_seq": after_seq,
+            "status": status, "customer_id": customer_id, "limit": -1 if limit is None else limit,
+        })
+        while rows := cursor.fetchmany(_FETCH_SIZE):
+            for row in rows:
+                yield _order(row)
+
+    def get_stale_orders(self, status: str, before: float, limit: int = None) -> List[Order]:
+        """
+        Returns the orders that entered `status` before time `before` and are
+        still in it, longest waiting first.
+        """
+        cursor = self.__connection().execute(_SELECT_STALE, (status, before, -1 if limit is None else limit))
+        return [_order(row) for row in cursor]
+
+    def search_orders(self, query: str, status: str = None, limit: int = None) -> List[Order]:
+        """
+        Returns the orders, in insertion order, whose item name matches every
+        token of `query` as a prefix, optionally restricted to a status.
+        """
+        prefixes = sorted(set(tokenize(query)))
+        if not prefixes:
+            return []
+        names = " INTERSECT ".join(
+            "SELECT item_name FROM item_tokens WHERE token >= ? AND token < ?" for _ in prefixes
+        )
+        cursor = self.__connection().execute(
+            f"SELECT {_COLUMNS} FROM orders WHERE item_name IN ({names}) AND (? IS NULL OR status = ?) "
+            f"ORDER BY seq LIMIT ?",
+            [*(bound for prefix in prefixes for bound in (prefix, prefix + PREFIX_END)),
+             status, status, -1 if limit is None else limit],
+        )
+        return [_order(row) for row in cursor]
+
+    def clear(self):
+        self.replace_orders({})
+
+    def replace_orders(self, orders: Mapping[str, Mapping]):
+        """
+        Replaces every stored order with `orders`, in one transaction.
+        """
+        orders = {order_id: Order.from_mapping(order) for order_id, order in orders.items()}
+        connection = self.__connection()
+        self.__index_item_names(connection, orders.values())
+        connection.execute("BEGIN")
+        try:
+            connection.execute("DELETE FROM orders")
+            connection.execute("DELETE FROM order_totals")
+            # No delete trigger, so emptying the table bumps the version once instead of once per row
+            connection.execute(_BUMP_VERSION)
+            connection.executemany(_UPSERT, (self.__row(order_id, order) for order_id, order in orders.items()))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def close(self):
+        with self._lock:
+            for connection in self._connections:
+                connection.close()
+            self._connections = []
+        self._local = threading.local()
+
+    def __connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # isolation_level=None: autocommit, batches manage their own transaction
+            connection = sqlite3.connect(
+                self._path, isolation_level=None, check_same_thread=False, cached_statements=64,
+                uri=self._path.startswith("file:"),
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA busy_timeout=5000")
+            self._local.connection = connection
+            with self._lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def __create_totals(connection: sqlite3.Connection):
+        # IMMEDIATE, so only one process creates the totals and no write slips in before the backfill
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'order_totals'").fetchone() is None:
+                for statement in _TOTALS_SCHEMA:
+                    connection.execute(statement)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    def __index_item_names(self, connection: sqlite3.Connection, orders: Iterable[Order]):
+        # Committed before the orders are written, so no stored order lacks its tokens
+        new_names = {order.item_name for order in orders} - self._indexed_names
+        if not new_names:
+            return
+        connection.execute("BEGIN")
+        try:
+            connection.executemany(
+                _INSERT_ITEM_TOKEN, ((token, name) for name in new_names for token in set(tokenize(name)))
+            )
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        self._indexed_names |= new_names
+
+    @staticmethod
+    def __create_item_tokens(connection: sqlite3.Connection):
+        # Like the totals: created once, and filled with the names of the orders already stored
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("SELECT 1 FROM sqlite_master WHERE name = 'item_tokens'").fetchone() is None:
+                connection.execute(_ITEM_TOKENS_SCHEMA)
+                connection.executemany(_INSERT_ITEM_TOKEN, (
+                    (token, name)
+                    for (name,) in connection.execute("SELECT DISTINCT item_name FROM orders").fetchall()
+                    for token in set(tokenize(name))
+                ))
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+
+    @staticmethod
+    def __row(order_id: str, order: Order) -> tuple:
+        return (order_id, order.item_name, order.quantity, order.customer_id, order.status,
+                order.created_at, order.updated_at, _encode(order.history))
+
+    @staticmethod
+    def __existing_ids(connection: sqlite3.Connection, order_ids: Iterable[str]) -> set:
+        existing_ids = set()
+        ids = iter(order_ids)
+        while chunk := list(islice(ids, _ID_CHUNK_SIZE)):
+            placeholders = ", ".join("?" * len(chunk))
+            cursor = connection.execute(f"SELECT order_id FROM orders WHERE order_id IN ({placeholders})", chunk)
+            existing_ids.update(order_id for (order_id,) in cursor)
+        return existing_ids
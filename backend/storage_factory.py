@@ -0,0 +1,69 @@
+# This module builds the configured storage backend for the Flask and the ASGI apps.
+import os
+from typing import Mapping
+
+from backend.caching_storage import CachingStorage
+from backend.columnar_storage import ColumnarStorage
+from backend.in_memory_storage import InMemoryStorage
+from backend.order_journal import OrderJournal
+from backend.sharded_storage import ShardedStorage
+from backend.shared_storage import DEFAULT_ADDRESS, SharedStorage
+from backend.sqlite_storage import SqliteStorage
+
+
+def create_storage(config: Mapping):
+    """
+    Builds the storage backend selected by the STORAGE config key,
+    'memory' (default), 'columnar' (compact in-memory store for large order
+    sets), 'sqlite' (file given by SQLITE_PATH) or 'shared' (client of the
+    storage server at SHARED_STORAGE_ADDRESS, shared by processes that
+    authenticate with SHARED_STORAGE_AUTHKEY). The memory backend is
+    journaled to JOURNAL_DIR when it is set. With SHARDS set, that many
+    backends are combined in a ShardedStorage, each with its own journal
+    directory or database file. With CACHE_SIZE set, the backend is wrapped
+    in a CachingStorage (entries expire after CACHE_TTL_SECONDS when set,
+    cached misses after CACHE_NEGATIVE_TTL_SECONDS).
+    """
+    shards = config.get('SHARDS')
+    if shards:
+        storage = ShardedStorage(
+            [_create_backend(config, f"shard-{index}") for index in range(shards)],
+            blocking=config.get('STORAGE') == 'sqlite',
+        )
+    else:
+        storage = _create_backend(config)
+    if config.get('CACHE_SIZE'):
+        # Other processes create orders behind a shared backend, so its misses aren't cached by default
+        negative_ttl = config.get('CACHE_NEGATIVE_TTL_SECONDS', 0 if config.get('STORAGE') == 'shared' else None)
+        return CachingStorage(storage, max_size=config['CACHE_SIZE'], ttl_seconds=config.get('CACHE_TTL_SECONDS'),
+                              negative_ttl_seconds=negative_ttl)
+    return storage
+
+
+def shared_authkey(config: Mapping) -> bytes | None:
+    authkey = config.get('SHARED_STORAGE_AUTHKEY')
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def _create_backend(config: Mapping, shard: str = None):
+    backend = config.get('STORAGE', 'memory')
+    if backend == 'memory':
+        if not config.get('JOURNAL_DIR'):
+            return InMemoryStorage()
+        return InMemoryStorage(OrderJournal(
+            config['JOURNAL_DIR'] if shard is None else os.path.join(config['JOURNAL_DIR'], shard),
+            fsync=config.get('JOURNAL_FSYNC', 'interval'),
+            fsync_interval_ms=config.get('JOURNAL_FSYNC_INTERVAL_MS', 1000),
+            snapshot_every=config.get('JOURNAL_SNAPSHOT_EVERY', 100_000),
+        ))
+    if backend == 'columnar':
+        return ColumnarStorage()
+    if backend == 'sqlite':
+        path = config.get('SQLITE_PATH', 'udatrack.db')
+        if shard is not None:
+            root, extension = os.path.splitext(path)
+            path = f"{root}-{shard}{extension}"
+        return SqliteStorage(path)
+    if backend == 'shared':
+        return SharedStorage(config.get('SHARED_STORAGE_ADDRESS', DEFAULT_ADDRESS), shared_authkey(config))
+    raise ValueError(f"Unknown storage backend '{backend}'.")
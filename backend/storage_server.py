@@ -0,0 +1,142 @@
+# This module serves one storage backend to the app processes of a host, e.g.
+# the workers of a pre-fork server. Run it with `python -m backend.storage_server`.
+import argparse
+import os
+import pickle
+import signal
+import sys
+import threading
+from itertools import islice
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Listener
+from typing import Final, Tuple
+
+from flask import Config
+
+from backend.shared_storage import CAPABILITIES, DEFAULT_ADDRESS, SharedStorage, check_authkey
+from backend.storage_factory import create_storage, shared_authkey
+
+
+class StorageServer:
+    """
+    Serves a storage backend to SharedStorage clients over a local (Unix)
+    socket.
+
+    Each client connection gets a thread that runs its calls on the backend,
+    so the backend must be thread-safe, as every backend in this package is.
+    Requests are pickled, so only trusted processes may connect: clients must
+    authenticate with `authkey`, which is required, and the socket's directory
+    is created private to the server's user (mode 0700), or refused when it
+    already exists with wider access. Without an `address`, the listener
+    picks a free one in a private temp directory.
+    """
+    REQUIRED_METHODS: Final[Tuple[str, ...]] = ('save_order', 'get_order', 'get_all_orders')
+
+    def __init__(self, storage, address: str = None, *, authkey: bytes):
+        check_authkey(authkey)
+        if address is not None:
+            _make_private_directory(os.path.dirname(os.path.abspath(address)))
+        self._storage = storage
+        self._methods = {
+            name: getattr(storage, name)
+            for name in self.REQUIRED_METHODS + SharedStorage.OPTIONAL_METHODS
+            if callable(getattr(type(storage), name, None))
+        }
+        self._capabilities = tuple(self._methods)
+        self._listener = Listener(address, 'AF_UNIX', authkey=authkey)
+        self._closed = False
+
+    @property
+    def address(self) -> str:
+        return self._listener.address
+
+    def serve_forever(self):
+        """
+        Accepts clients until the listener is closed.
+        """
+        while True:
+            try:
+                connection = self._listener.accept()
+            except (OSError, EOFError, AuthenticationError):
+                # Closed listener, or a client that failed authentication
+                if self._closed:
+                    return
+                continue
+            threading.Thread(target=self.__serve, args=(connection,), daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+
+    def __serve(self, connection):
+        with connection:
+            while True:
+                try:
+                    method, args, kwargs = connection.recv()
+                except (EOFError, OSError):
+                    return
+                connection.send(self.__handle(method, args, kwargs))
+
+    def __handle(self, method: str, args: tuple, kwargs: dict) -> tuple:
+        if method == CAPABILITIES:
+            return True, self._capabilities
+        call = self._methods.get(method)
+        if call is None:
+            return False, AttributeError(f"The shared storage has no method '{method}'.")
+        try:
+            result = call(*args, **kwargs)
+            if method.startswith('iter_'):
+                # Clients always pass a page size
+                result = list(islice(result, kwargs['limit']))
+            return True, result
+        except Exception as error:
+            try:
+                # Round-tripped here, so an error that doesn't pickle can't break the reply
+                return False, pickle.loads(pickle.dumps(error))
+            except Exception:
+                return False, RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _make_private_directory(path: str):
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    status = os.stat(path)
+    if status.st_uid != os.getuid() or status.st_mode & 0o077:
+        raise PermissionError(f"The storage socket directory '{path}' must be owned by the server's user "
+                              f"and private to it (mode 0700).")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(
+        prog='python -m backend.storage_server',
+        description='Serves the storage backend configured by the UDATRACK_ environment variables to the app '
+                    'processes started with UDATRACK_STORAGE=shared.',
+    )
+    parser.parse_args(argv)
+    config = Config('.')
+    config.from_prefixed_env('UDATRACK')
+    if config.get('STORAGE') == 'shared':
+        parser.error("UDATRACK_STORAGE must name the backend to serve, not 'shared'.")
+    authkey = shared_authkey(config)
+    if not authkey:
+        parser.error("UDATRACK_SHARED_STORAGE_AUTHKEY must be set, to the same key for the server and the app "
+                     "processes, e.g. generated for each run with "
+                     "`python -c 'import secrets; print(secrets.token_urlsafe(32))'`.")
+
+    storage = create_storage(config)
+    server = StorageServer(storage, config.get('SHARED_STORAGE_ADDRESS', DEFAULT_ADDRESS), authkey=authkey)
+    # Stopping on SIGTERM too, so the journal or database is closed cleanly
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"Serving storage at {server.address}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        if callable(getattr(storage, 'close', None)):
+            storage.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
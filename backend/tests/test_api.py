@@ -1,11 +1,20 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import pytest
-from backend.app import app, in_memory_storage
+from backend import pagination
+from backend.app import app, create_app, idempotency_keys, order_events, storage
+from backend.in_memory_storage import InMemoryStorage
+from backend.order import Order
+from backend.storage_server import StorageServer
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
     app.config['DEBUG'] = False
-    in_memory_storage.clear()
+    storage.clear()
+    idempotency_keys.clear()
     with app.test_client() as client:
         yield client
 
@@ -26,6 +35,29 @@ def test_add_order_api_error_400(client, order_data, error):
     assert response.status_code == 400
     assert response.json['error'] == error
 
+@pytest.mark.parametrize("body, error", [
+    ([1, 2], "Invalid request body, expected a JSON object."),
+    ({"order_id": "API003", "item_name": "A", "quantity": 1}, "Invalid request body, missing required fields 'customer_id'."),
+    ({"order_id": "API003", "item_name": "A", "quantity": 1, "customer_id": "C1", "price": 5}, "Invalid request body, unknown fields 'price'."),
+    ({"order_id": "API003", "item_name": "A", "quantity": "1", "customer_id": "C1"}, "Invalid request body, 'quantity' must be an integer."),
+    ({"order_id": "API003", "item_name": "", "quantity": 1, "customer_id": "C1"}, "Invalid request body, 'item_name' must be a non-empty string."),
+    ({"order_id": "API003", "item_name": "A", "quantity": 1, "customer_id": ""}, "Invalid request body, 'customer_id' must be a non-empty string."),
+])
+def test_add_order_api_rejects_malformed_body(client, body, error):
+    response = client.post('/api/orders', json=body)
+    assert (response.status_code, response.json) == (400, {"error": error})
+    assert storage.get_order("API003") is None
+
+@pytest.mark.parametrize("method, path, body, status_code, error", [
+    ('put', '/api/orders/ERR001/status', {"new_status": "lost"}, 400, "Not a valid status. Allowed values 'pending, processing, shipped, delivered, cancelled' but 'lost' given."),
+    ('put', '/api/orders/MISSING/status', {"new_status": "shipped"}, 404, "Order with ID 'MISSING' not found."),
+    ('put', '/api/orders/ERR001/status', None, 400, "Invalid request body, expected a JSON object."),
+    ('get', '/api/orders?status=lost', None, 400, "Not a valid status. Allowed values 'pending, processing, shipped, delivered, cancelled' but 'lost' given."),
+])
+def test_api_reports_order_errors_as_json(client, method, path, body, status_code, error):
+    response = getattr(client, method)(path, json=body)
+    assert (response.status_code, response.json) == (status_code, {"error": error})
+
 def test_add_order_api_error_409(client):
     # Arrange
     order_data = {
@@ -40,6 +72,31 @@ def test_add_order_api_error_409(client):
     assert response.status_code == 409
     assert response.json['error'] == "Order with ID 'API001' already exists."
 
+def test_add_order_api_replays_response_for_same_idempotency_key(client):
+    order_data = {"order_id": "IDEM001", "item_name": "API Laptop", "quantity": 1, "customer_id": "APICUST001"}
+    first = client.post('/api/orders', json=order_data, headers={"Idempotency-Key": "key-1"})
+    client.put('/api/orders/IDEM001/status', json={"new_status": "processing"})
+
+    retry = client.post('/api/orders', json=order_data, headers={"Idempotency-Key": "key-1"})
+
+    assert (retry.status_code, retry.json) == (201, first.json)
+    assert retry.json['status'] == "pending"
+    assert retry.headers['Idempotent-Replayed'] == "true"
+
+@pytest.mark.parametrize("idempotency_key, status_code, error", [
+    ("key-1", 422, "Idempotency key 'key-1' was already used for a different request."),
+    ("k" * 256, 400, "Invalid idempotency key, 1 to 255 characters allowed but 256 given."),
+])
+def test_add_order_api_rejects_bad_idempotency_key(client, idempotency_key, status_code, error):
+    client.post('/api/orders', json={"order_id": "IDEM002", "item_name": "A", "quantity": 1, "customer_id": "C1"},
+                headers={"Idempotency-Key": "key-1"})
+
+    response = client.post('/api/orders', json={"order_id": "IDEM003", "item_name": "A", "quantity": 1, "customer_id": "C1"},
+                           headers={"Idempotency-Key": idempotency_key})
+
+    assert (response.status_code, response.json) == (status_code, {"error": error})
+    assert client.get('/api/orders/IDEM003').status_code == 404
+
 def test_get_order_api_success(client):
     client.post('/api/orders', json={
         "order_id": "GET001", "item_name": "Test Item", "quantity": 1, "customer_id": "C1"
@@ -54,12 +111,150 @@ def test_get_order_api_not_found(client):
 
 def test_update_order_status_api_success(client):
     client.post('/api/orders', json={
-        "order_id": "UPDATE001", "item_name": "Test Item", "quantity": 1, "customer_id": "C1"
+        "order_id": "UPDATE001", "item_name": "Test Item", "quantity": 1, "customer_id": "C1", "status": "processing"
     })
     response = client.put('/api/orders/UPDATE001/status', json={"new_status": "shipped"})
     assert response.status_code == 200
     assert response.json['status'] == "shipped"
 
+def test_update_order_status_api_invalid_transition(client):
+    client.post('/api/orders', json={"order_id": "UPDATE002", "item_name": "Test Item", "quantity": 1, "customer_id": "C1"})
+    response = client.put('/api/orders/UPDATE002/status', json={"new_status": "delivered"})
+    assert response.status_code == 409
+    assert response.json['error'] == "Invalid status transition from 'pending' to 'delivered'."
+
+def test_update_statuses_api_reports_failures(client):
+    client.post('/api/orders/bulk', json=[
+        {"order_id": "SHIP001", "item_name": "A", "quantity": 1, "customer_id": "C1", "status": "processing"},
+        {"order_id": "SHIP002", "item_name": "B", "quantity": 1, "customer_id": "C1", "status": "processing"},
+        {"order_id": "SHIP003", "item_name": "C", "quantity": 1, "customer_id": "C1"},
+    ])
+    response = client.put('/api/orders/status', json={
+        "order_ids": ["SHIP001", "SHIP002", "SHIP003", "MISSING", "SHIP001", "MISSING"], "new_status": "shipped"
+    })
+    assert response.status_code == 200
+    assert response.json == {
+        "updated": 2,
+        "failed": 2,
+        "errors": [
+            {"order_id": "SHIP003", "error": "Invalid status transition from 'pending' to 'shipped'.", "status": 409},
+            {"order_id": "MISSING", "error": "Order with ID 'MISSING' not found.", "status": 404},
+        ],
+    }
+    assert len(client.get('/api/orders?status=shipped').json) == 2
+
+@pytest.mark.parametrize("body, status_code", [
+    ({"order_ids": "SHIP001", "new_status": "shipped"}, 400),
+    ({"order_ids": ["SHIP001"], "new_status": "lost"}, 400),
+])
+def test_update_statuses_api_rejects_bad_requests(client, body, status_code):
+    response = client.put('/api/orders/status', json=body)
+    assert response.status_code == status_code
+
+def test_order_stats_api(client):
+    client.post('/api/orders/bulk', json=[
+        {"order_id": "STAT001", "item_name": "A", "quantity": 2, "customer_id": "C1"},
+        {"order_id": "STAT002", "item_name": "B", "quantity": 3, "customer_id": "C1", "status": "processing"},
+        {"order_id": "STAT003", "item_name": "A", "quantity": 4, "customer_id": "C2"},
+    ])
+
+    by_status = client.get('/api/orders/stats')
+    by_customer = client.get('/api/orders/stats?group_by=customer_id&metrics=count')
+    revalidated = client.get('/api/orders/stats', headers={"If-None-Match": by_status.headers['ETag']})
+
+    assert by_status.status_code == 200
+    assert by_status.json == {"group_by": "status", "groups": {
+        "pending": {"count": 2, "sum_quantity": 6}, "processing": {"count": 1, "sum_quantity": 3},
+    }}
+    assert by_customer.json["groups"] == {"C1": {"count": 2}, "C2": {"count": 1}}
+    assert revalidated.status_code == 304
+
+@pytest.mark.parametrize("query", ["group_by=order_id", "metrics=count,avg_quantity"])
+def test_order_stats_api_rejects_unknown_group_by_and_metrics(client, query):
+    response = client.get(f'/api/orders/stats?{query}')
+    assert response.status_code == 400
+
+def test_search_orders_api(client):
+    client.post('/api/orders/bulk', json=[
+        {"order_id": "SRCH001", "item_name": "Red Jacket", "quantity": 1, "customer_id": "C1"},
+        {"order_id": "SRCH002", "item_name": "Rain Boots", "quantity": 1, "customer_id": "C1"},
+        {"order_id": "SRCH003", "item_name": "Jacket (blue)", "quantity": 1, "customer_id": "C2", "status": "processing"},
+    ])
+
+    found = client.get('/api/orders/search?q=jack')
+    processing = client.get('/api/orders/search?q=jacket&status=processing')
+    limited = client.get('/api/orders/search?q=r&limit=1')
+    revalidated = client.get('/api/orders/search?q=jack', headers={"If-None-Match": found.headers['ETag']})
+
+    assert [order["order_id"] for order in found.json["orders"]] == ["SRCH001", "SRCH003"]
+    assert [order["order_id"] for order in processing.json["orders"]] == ["SRCH003"]
+    assert [order["order_id"] for order in limited.json["orders"]] == ["SRCH001"]
+    assert revalidated.status_code == 304
+
+@pytest.mark.parametrize("query", ["", "q=", "q=%20-", "q=jacket&status=lost", "q=jacket&limit=0"])
+def test_search_orders_api_rejects_bad_queries(client, query):
+    response = client.get(f'/api/orders/search?{query}')
+    assert response.status_code == 400
+
+def test_list_orders_api_filters_by_creation_time(client):
+    # 2023-11-14T22:13:20Z and one and two hours later
+    storage.save_orders({
+        f"TIME00{i}": Order.new(f"TIME00{i}", "A", 1, "C1", "pending", 1_700_000_000.0 + 3600 * i) for i in range(3)
+    })
+    client.post('/api/orders', json={"order_id": "TIME003", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+
+    by_epoch = client.get('/api/orders?since=1700003600&until=1700007200')
+    by_iso = client.get('/api/orders?since=2023-11-14T23:13:20&limit=2')
+    by_offset = client.get('/api/orders?until=2023-11-15T00:13:20%2B01:00&status=pending')
+
+    assert [order["order_id"] for order in by_epoch.json] == ["TIME001"]
+    assert by_epoch.json[0]["history"] == [["pending", 1_700_003_600.0]]
+    assert [order["order_id"] for order in by_iso.json["orders"]] == ["TIME001", "TIME002"]
+    assert by_iso.json["next_cursor"] == "TIME002"
+    assert [order["order_id"] for order in by_offset.json] == ["TIME000"]
+
+@pytest.mark.parametrize("query", ["since=yesterday", "until=nan", "since=2023-13-01"])
+def test_list_orders_api_rejects_bad_times(client, query):
+    response = client.get(f'/api/orders?{query}')
+    assert response.status_code == 400
+
+def test_stuck_orders_api(client):
+    storage.save_orders({
+        f"STK00{i}": Order.new(f"STK00{i}", "A", 1, "C1", "pending", 1_700_000_000.0 + i) for i in range(3)
+    })
+    client.put('/api/orders/STK001/status', json={"new_status": "processing"})
+    client.put('/api/orders/status', json={"order_ids": ["STK002"], "new_status": "processing"})
+
+    stuck = client.get('/api/orders/stuck?status=pending&older_than=86400')
+    fresh = client.get('/api/orders/stuck?status=processing&older_than=3600')
+    moved = client.get('/api/orders/stuck?status=processing&older_than=0&limit=1')
+
+    assert [order["order_id"] for order in stuck.json["orders"]] == ["STK000"]
+    assert fresh.json == {"orders": []}
+    assert [order["order_id"] for order in moved.json["orders"]] == ["STK001"]
+
+@pytest.mark.parametrize("query", ["older_than=60", "status=lost&older_than=60", "status=pending", "status=pending&older_than=-1",
+                                   "status=pending&older_than=60&limit=0"])
+def test_stuck_orders_api_rejects_bad_queries(client, query):
+    response = client.get(f'/api/orders/stuck?{query}')
+    assert response.status_code == 400
+
+def test_batch_get_orders_api(client):
+    client.post('/api/orders/bulk', json=[
+        {"order_id": f"BAT00{i}", "item_name": "A", "quantity": 1, "customer_id": "C1"} for i in range(1, 4)
+    ])
+
+    response = client.post('/api/orders/batch-get', json={"order_ids": ["BAT003", "GONE", "BAT001", "BAT003", "GONE"]})
+
+    assert response.status_code == 200
+    assert [order["order_id"] for order in response.json["orders"]] == ["BAT003", "BAT001"]
+    assert response.json["missing"] == ["GONE"]
+
+@pytest.mark.parametrize("body", [None, {"order_ids": "BAT001"}, {"order_ids": ["BAT001", 2]}, {"order_ids": [""]}])
+def test_batch_get_orders_api_rejects_malformed_body(client, body):
+    response = client.post('/api/orders/batch-get', json=body)
+    assert response.status_code == 400
+
 def test_list_all_orders_api_with_data(client):
     client.post('/api/orders', json={"order_id": "LST001", "item_name": "Item A", "quantity": 1, "customer_id": "C1"})
     client.post('/api/orders', json={"order_id": "LST002", "item_name": "Item B", "quantity": 2, "customer_id": "C2"})
@@ -74,3 +269,236 @@ def test_list_orders_by_status_api_matching(client):
     assert response.status_code == 200
     assert len(response.json) == 1
     assert response.json[0]['order_id'] == "S001"
+
+
+def test_list_orders_by_status_api_follows_status_updates(client):
+    client.post('/api/orders', json={"order_id": "S101", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    client.post('/api/orders', json={"order_id": "S102", "item_name": "B", "quantity": 1, "customer_id": "C1"})
+    client.put('/api/orders/S101/status', json={"new_status": "processing"})
+
+    pending = client.get('/api/orders?status=pending')
+    processing = client.get('/api/orders?status=processing')
+
+    assert [order['order_id'] for order in pending.json] == ["S102"]
+    assert [order['order_id'] for order in processing.json] == ["S101"]
+
+
+def test_list_orders_api_filters_by_customer_and_status(client):
+    client.post('/api/orders', json={"order_id": "CU001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    client.post('/api/orders', json={"order_id": "CU002", "item_name": "B", "quantity": 1, "customer_id": "C2"})
+    client.post('/api/orders', json={"order_id": "CU003", "item_name": "C", "quantity": 1, "customer_id": "C1", "status": "processing"})
+
+    by_customer = client.get('/api/orders?customer_id=C1')
+    by_customer_and_status = client.get('/api/orders?customer_id=C1&status=processing&limit=10')
+
+    assert [order['order_id'] for order in by_customer.json] == ["CU001", "CU003"]
+    assert [order['order_id'] for order in by_customer_and_status.json['orders']] == ["CU003"]
+
+def test_list_orders_api_paginates_with_cursor(client):
+    for i in range(5):
+        client.post('/api/orders', json={"order_id": f"PG00{i}", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+
+    first_page = client.get('/api/orders?limit=2')
+    second_page = client.get(f"/api/orders?limit=2&cursor={first_page.json['next_cursor']}")
+    last_page = client.get(f"/api/orders?limit=2&cursor={second_page.json['next_cursor']}")
+
+    assert [order['order_id'] for order in first_page.json['orders']] == ["PG000", "PG001"]
+    assert [order['order_id'] for order in second_page.json['orders']] == ["PG002", "PG003"]
+    assert [order['order_id'] for order in last_page.json['orders']] == ["PG004"]
+    assert last_page.json['next_cursor'] is None
+
+def test_list_orders_api_clamps_limit_to_max_page_size(client, monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGE_SIZE', 2)
+    for i in range(3):
+        client.post('/api/orders', json={"order_id": f"MX00{i}", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+
+    page = client.get('/api/orders?limit=1000000')
+    stuck = client.get('/api/orders/stuck?status=pending&older_than=0&limit=1000000')
+
+    assert len(page.json['orders']) == 2
+    assert page.json['next_cursor'] == page.json['orders'][-1]['order_id']
+    assert len(stuck.json['orders']) == 2
+
+@pytest.mark.parametrize("query, error", [
+    ("limit=0", "Page limit must be a positive integer, '0' given."),
+    ("limit=ten", "Page limit must be a positive integer, 'ten' given."),
+    ("cursor=MISSING", "Invalid cursor, order with ID 'MISSING' not found."),
+])
+def test_list_orders_api_pagination_error_400(client, query, error):
+    response = client.get(f'/api/orders?{query}')
+    assert response.status_code == 400
+    assert response.json['error'] == error
+
+def test_list_orders_api_streams_ndjson(client):
+    client.post('/api/orders', json={"order_id": "ND001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    client.post('/api/orders', json={"order_id": "ND002", "item_name": "B", "quantity": 1, "customer_id": "C1"})
+
+    response = client.get('/api/orders?format=ndjson')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'application/x-ndjson'
+    assert [json.loads(line)['order_id'] for line in response.text.splitlines()] == ["ND001", "ND002"]
+
+
+def test_add_orders_bulk_api_with_json_array(client):
+    client.post('/api/orders', json={"order_id": "BLK000", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+
+    response = client.post('/api/orders/bulk', json=[
+        {"order_id": "BLK001", "item_name": "A", "quantity": 1, "customer_id": "C1"},
+        {"order_id": "BLK003", "item_name": "A", "quantity": 1, "customer_id": "C1", "coupon": "X"},
+        {"order_id": "BLK002", "item_name": "B", "quantity": 0, "customer_id": "C1"},
+        {"order_id": "BLK000", "item_name": "C", "quantity": 1, "customer_id": "C1"},
+    ])
+
+    assert response.status_code == 200
+    assert response.json['created'] == 1
+    assert response.json['failed'] == 3
+    assert response.json['errors'] == [
+        {"row": 1, "error": "Invalid request body, unknown fields 'coupon'.", "status": 400},
+        {"row": 2, "error": "Minimum quantity value allowed 1, 0 given.", "status": 400},
+        {"row": 3, "error": "Order with ID 'BLK000' already exists.", "status": 409},
+    ]
+    assert client.get('/api/orders/BLK001').status_code == 200
+
+def test_add_orders_bulk_api_with_ndjson_stream(client):
+    body = "\n".join([
+        json.dumps({"order_id": "NDB001", "item_name": "A", "quantity": 1, "customer_id": "C1"}),
+        "{not json",
+        json.dumps({"order_id": "NDB002", "item_name": "B", "quantity": 2, "customer_id": "C2", "status": "processing"}),
+    ])
+
+    response = client.post('/api/orders/bulk', data=body, content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert response.json['created'] == 2
+    assert response.json['errors'] == [{"row": 1, "error": "Invalid request body, expected a JSON object.", "status": 400}]
+
+def test_add_orders_bulk_api_rejects_non_array_body(client):
+    response = client.post('/api/orders/bulk', json={"order_id": "BLK001"})
+    assert response.status_code == 400
+
+def test_add_orders_bulk_api_rejects_mistyped_rows_and_journal_still_replays(tmp_path):
+    config = {"STORAGE": "memory", "JOURNAL_DIR": str(tmp_path)}
+    journaled_app = create_app(config)
+
+    response = journaled_app.test_client().post('/api/orders/bulk', json=[
+        {"order_id": ["TYP000"], "item_name": "A", "quantity": 1, "customer_id": "C1"},
+        {"order_id": "TYP001", "item_name": ["A"], "quantity": 1, "customer_id": "C1"},
+        {"order_id": "TYP002", "item_name": "A", "quantity": 1, "customer_id": {"id": "C1"}},
+        {"order_id": "TYP003", "item_name": "A", "quantity": True, "customer_id": "C1"},
+        {"order_id": "", "item_name": "A", "quantity": 1, "customer_id": "C1"},
+        {"order_id": "TYP005", "item_name": "A", "quantity": 1, "customer_id": "C1"},
+    ])
+    journaled_app.extensions['udatrack'].storage.close()
+    restarted = create_app(config).test_client()
+
+    assert response.status_code == 200
+    assert response.json['created'] == 1
+    assert [(error['row'], error['status']) for error in response.json['errors']] == [(row, 400) for row in range(5)]
+    assert response.json['errors'][0]['error'] == "Invalid request body, 'order_id' must be a non-empty string."
+    assert response.json['errors'][4]['error'] == "Invalid request body, 'order_id' must be a non-empty string."
+    assert [order['order_id'] for order in restarted.get('/api/orders').json] == ["TYP005"]
+
+
+def test_concurrent_duplicate_add_order_api_creates_order_once(client):
+    order_data = {"order_id": "RACE001", "item_name": "A", "quantity": 1, "customer_id": "C1"}
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        statuses = list(pool.map(lambda _: app.test_client().post('/api/orders', json=order_data).status_code, range(16)))
+
+    assert statuses.count(201) == 1
+    assert statuses.count(409) == 15
+
+def test_metrics_api_reports_request_durations(client):
+    client.get('/api/orders/MISSING')
+
+    response = client.get('/metrics')
+
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'udatrack_http_request_duration_seconds_count{method="GET",route="/api/orders/<string:order_id>",status="404"}' in response.text
+    assert 'udatrack_tracker_call_seconds_count{method="get_order_by_id"}' in response.text
+
+def test_get_order_api_answers_304_for_current_etag(client):
+    client.post('/api/orders', json={"order_id": "ET001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    first = client.get('/api/orders/ET001')
+
+    not_modified = client.get('/api/orders/ET001', headers={"If-None-Match": first.headers['ETag']})
+    client.put('/api/orders/ET001/status', json={"new_status": "processing"})
+    modified = client.get('/api/orders/ET001', headers={"If-None-Match": first.headers['ETag']})
+
+    assert first.status_code == 200
+    assert not_modified.status_code == 304
+    assert not_modified.data == b''
+    assert modified.status_code == 200
+    assert modified.json['status'] == "processing"
+    assert modified.headers['ETag'] != first.headers['ETag']
+
+def test_list_orders_api_serves_cached_body_until_next_write(client):
+    client.post('/api/orders', json={"order_id": "ET101", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    first = client.get('/api/orders?limit=10')
+
+    repeated = client.get('/api/orders?limit=10')
+    not_modified = client.get('/api/orders?limit=10', headers={"If-None-Match": first.headers['ETag']})
+    client.post('/api/orders', json={"order_id": "ET102", "item_name": "B", "quantity": 1, "customer_id": "C1"})
+    after_write = client.get('/api/orders?limit=10', headers={"If-None-Match": first.headers['ETag']})
+
+    assert repeated.data == first.data
+    assert repeated.headers['ETag'] == first.headers['ETag']
+    assert not_modified.status_code == 304
+    assert [order['order_id'] for order in after_write.json['orders']] == ["ET101", "ET102"]
+
+def test_order_events_api_resumes_after_last_event_id(client):
+    last_event_id = order_events.format_event_id(order_events.last_event_id)
+    client.post('/api/orders', json={"order_id": "EV001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    client.put('/api/orders/EV001/status', json={"new_status": "processing"})
+
+    response = client.get('/api/orders/events', headers={"Last-Event-ID": last_event_id})
+    chunk = next(response.response).decode()
+    response.close()
+
+    assert response.mimetype == 'text/event-stream'
+    assert [line for line in chunk.splitlines() if line.startswith('event:')] == [
+        "event: created", "event: status_changed",
+    ]
+    data = [json.loads(line[len('data: '):]) for line in chunk.splitlines() if line.startswith('data:')]
+    assert [(order['order_id'], order['status']) for order in data] == [("EV001", "pending"), ("EV001", "processing")]
+
+def test_order_events_api_without_known_id_starts_with_reset(client):
+    response = client.get('/api/orders/events?last_event_id=stale-1')
+    chunk = next(response.response).decode()
+    response.close()
+
+    assert "event: reset" in chunk
+    assert f"id: {order_events.format_event_id(order_events.last_event_id)}" in chunk
+
+def test_list_orders_api_caches_one_body_per_recognized_query(client):
+    client.post('/api/orders', json={"order_id": "RC001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    response_cache = app.extensions['udatrack'].response_cache
+    response_cache.clear()
+
+    for made_up in range(3):
+        assert client.get(f'/api/orders?limit=10&x={made_up}').json['orders'][0]['order_id'] == "RC001"
+
+    assert len(response_cache) == 1
+
+def test_create_app_builds_independent_apps():
+    first, second = create_app({"STORAGE": "memory"}), create_app({"STORAGE": "memory"})
+
+    first.test_client().post('/api/orders', json={"order_id": "APP001", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+
+    assert first.test_client().get('/api/orders/APP001').status_code == 200
+    assert second.test_client().get('/api/orders/APP001').status_code == 404
+
+def test_create_app_workers_share_orders_through_storage_server():
+    server = StorageServer(InMemoryStorage(), authkey=b"test-key")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    config = {"STORAGE": "shared", "SHARED_STORAGE_ADDRESS": server.address, "SHARED_STORAGE_AUTHKEY": "test-key"}
+    workers = [create_app(config).test_client() for _ in range(2)]
+
+    workers[0].post('/api/orders', json={"order_id": "APP002", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+    response = workers[1].put('/api/orders/APP002/status', json={"new_status": "processing"})
+
+    assert response.status_code == 200
+    assert workers[0].get('/api/orders?status=processing').json == [response.json]
+    server.close()
@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+import pytest
+from backend import pagination
+from backend.asgi import app, idempotency_keys, storage
+from backend.order import Order
+
+@pytest.fixture
+def client():
+    app.config['TESTING'] = True
+    storage.clear()
+    idempotency_keys.clear()
+    return app.test_client()
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def post_order(client, order_data):
+    return await client.post('/api/orders', json=order_data)
+
+def test_add_order_asgi_success(client):
+    async def scenario():
+        response = await post_order(client, {"order_id": "ASGI001", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"})
+        return response.status_code, await response.get_json()
+
+    status_code, body = run(scenario())
+
+    assert status_code == 201
+    assert body['order_id'] == "ASGI001"
+
+def test_add_order_asgi_replays_response_for_same_idempotency_key(client):
+    async def scenario():
+        order_data = {"order_id": "ASGI010", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"}
+        first = await client.post('/api/orders', json=order_data, headers={"Idempotency-Key": "key-1"})
+        retry = await client.post('/api/orders', json=order_data, headers={"Idempotency-Key": "key-1"})
+        return await first.get_json(), retry.status_code, await retry.get_json(), retry.headers['Idempotent-Replayed']
+
+    first, status_code, body, replayed = run(scenario())
+
+    assert (status_code, body, replayed) == (201, first, "true")
+
+@pytest.mark.parametrize("order_data, status_code, error", [
+    ({"order_id": "ASGI002", "item_name": "Laptop", "quantity": 0, "customer_id": "C1"}, 400, 'Minimum quantity value allowed 1, 0 given.'),
+    ({"order_id": "ASGI000", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"}, 409, "Order with ID 'ASGI000' already exists."),
+    ({"order_id": "ASGI003", "item_name": "Laptop", "quantity": 1}, 400, "Invalid request body, missing required fields 'customer_id'."),
+    ({"order_id": "", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"}, 400, "Invalid request body, 'order_id' must be a non-empty string."),
+])
+def test_add_order_asgi_errors(client, order_data, status_code, error):
+    async def scenario():
+        await post_order(client, {"order_id": "ASGI000", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"})
+        response = await post_order(client, order_data)
+        return response.status_code, await response.get_json()
+
+    assert run(scenario()) == (status_code, {"error": error})
+
+def test_get_and_update_order_asgi(client):
+    async def scenario():
+        await post_order(client, {"order_id": "ASGI003", "item_name": "Laptop", "quantity": 1, "customer_id": "C1"})
+        updated = await client.put('/api/orders/ASGI003/status', json={"new_status": "processing"})
+        fetched = await client.get('/api/orders/ASGI003')
+        missing = await client.get('/api/orders/MISSING')
+        return (await updated.get_json())['status'], (await fetched.get_json())['status'], missing.status_code
+
+    assert run(scenario()) == ("processing", "processing", 404)
+
+def test_list_orders_asgi_streams_and_paginates(client):
+    async def scenario():
+        for i in range(3):
+            await post_order(client, {"order_id": f"ASGI10{i}", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+        streamed = await client.get('/api/orders')
+        ndjson = await client.get('/api/orders?format=ndjson')
+        page = await client.get('/api/orders?limit=2')
+        return await streamed.get_json(), await ndjson.get_data(as_text=True), await page.get_json()
+
+    streamed, ndjson, page = run(scenario())
+
+    assert [order['order_id'] for order in streamed] == ["ASGI100", "ASGI101", "ASGI102"]
+    assert [json.loads(line)['order_id'] for line in ndjson.splitlines()] == ["ASGI100", "ASGI101", "ASGI102"]
+    assert [order['order_id'] for order in page['orders']] == ["ASGI100", "ASGI101"]
+    assert page['next_cursor'] == "ASGI101"
+
+def test_list_orders_asgi_clamps_limit_to_max_page_size(client, monkeypatch):
+    monkeypatch.setattr(pagination, 'MAX_PAGE_SIZE', 2)
+
+    async def scenario():
+        for i in range(3):
+            await post_order(client, {"order_id": f"ASGI11{i}", "item_name": "A", "quantity": 1, "customer_id": "C1"})
+        page = await client.get('/api/orders?limit=1000000')
+        return await page.get_json()
+
+    page = run(scenario())
+
+    assert len(page['orders']) == 2
+    assert page['next_cursor'] == page['orders'][-1]['order_id']
+
+def test_add_orders_bulk_asgi_with_ndjson_stream(client):
+    body = "\n".join([
+        json.dumps({"order_id": "ASGI201", "item_name": "A", "quantity": 1, "customer_id": "C1"}),
+        json.dumps({"order_id": "ASGI201", "item_name": "A", "quantity": 1, "customer_id": "C1"}),
+        json.dumps({"order_id": "ASGI202", "item_name": "A", "quantity": "1", "customer_id": "C1"}),
+        json.dumps({"order_id": "ASGI203", "item_name": "A", "quantity": 1, "customer_id": "C1"}),
+        json.dumps({"order_id": "ASGI204", "item_name": "A", "quantity": 1, "customer_id": ""}),
+    ])
+
+    async def scenario():
+        response = await client.post('/api/orders/bulk', data=body, headers={"Content-Type": "application/x-ndjson"})
+        return await response.get_json()
+
+    result = run(scenario())
+
+    assert result['created'] == 2
+    assert result['errors'] == [
+        {"row": 1, "error": "Order with ID 'ASGI201' already exists.", "status": 409},
+        {"row": 2, "error": "Invalid request body, 'quantity' must be an integer.", "status": 400},
+        {"row": 4, "error": "Invalid request body, 'customer_id' must be a non-empty string.", "status": 400},
+    ]
+
+def test_search_orders_asgi(client):
+    async def scenario():
+        await post_order(client, {"order_id": "ASGI020", "item_name": "Red Jacket", "quantity": 1, "customer_id": "C1"})
+        await post_order(client, {"order_id": "ASGI021", "item_name": "Boots", "quantity": 1, "customer_id": "C1"})
+        found = await client.get('/api/orders/search?q=red+jack')
+        empty = await client.get('/api/orders/search?q=')
+        return [order["order_id"] for order in (await found.get_json())["orders"]], empty.status_code
+
+    assert run(scenario()) == (["ASGI020"], 400)
+
+def test_list_orders_by_time_and_stuck_orders_asgi(client):
+    async def scenario():
+        storage.save_orders({
+            f"ASGI03{i}": Order.new(f"ASGI03{i}", "Boots", 1, "C1", "processing", 1_700_000_000.0 + 3600 * i)
+            for i in range(3)
+        })
+        in_range = await client.get('/api/orders?since=2023-11-14T23:00:00Z')
+        stuck = await client.get('/api/orders/stuck?status=processing&older_than=60&limit=2')
+        bad = await client.get('/api/orders/stuck?status=processing&older_than=soon')
+        return (
+            [order["order_id"] for order in await in_range.get_json()],
+            [order["order_id"] for order in (await stuck.get_json())["orders"]],
+            bad.status_code,
+        )
+
+    assert run(scenario()) == (["ASGI031", "ASGI032"], ["ASGI030", "ASGI031"], 400)
+
+def test_batch_get_orders_asgi(client):
+    async def scenario():
+        await post_order(client, {"order_id": "ASGI040", "item_name": "Boots", "quantity": 1, "customer_id": "C1"})
+        response = await client.post('/api/orders/batch-get', json={"order_ids": ["MISSING", "ASGI040"]})
+        body = await response.get_json()
+        return [order["order_id"] for order in body["orders"]], body["missing"]
+
+    assert run(scenario()) == (["ASGI040"], ["MISSING"])
+
+def test_order_events_asgi_starts_with_reset_then_streams_changes(client):
+    async def scenario():
+        async with client.request('/api/orders/events') as connection:
+            await connection.send_complete()
+            reset = (await connection.receive()).decode()
+            await post_order(client, {"order_id": "ASGI050", "item_name": "Boots", "quantity": 1, "customer_id": "C1"})
+            created = (await asyncio.wait_for(connection.receive(), 5)).decode()
+            await connection.disconnect()
+        return reset, created
+
+    reset, created = run(scenario())
+
+    assert "event: reset" in reset
+    assert "event: created" in created and '"order_id":"ASGI050"' in created.replace(' ', '')
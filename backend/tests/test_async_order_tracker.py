@@ -0,0 +1,165 @@
+import asyncio
+
+import pytest
+from ..async_order_tracker import AsyncOrderTracker
+from ..async_storage_adapter import AsyncStorageAdapter
+from ..in_memory_storage import InMemoryStorage
+
+# --- Fixtures for AsyncOrderTracker tests ---
+
+NOW = 1_700_000_000.0
+
+class Clock:
+    """
+    A clock the tests move forward by hand.
+    """
+    def __init__(self):
+        self.now = NOW
+
+    def __call__(self):
+        return self.now
+
+class BasicStorage:
+    """
+    Only the required storage methods, so every optional fast path falls back.
+    """
+    def __init__(self):
+        self.orders = {}
+
+    def save_order(self, order_id, order_data):
+        self.orders[order_id] = order_data
+
+    def get_order(self, order_id):
+        return self.orders.get(order_id)
+
+    def get_all_orders(self):
+        return dict(self.orders)
+
+@pytest.fixture(params=['basic', 'in_memory', 'in_memory_blocking'])
+def order_tracker(request):
+    """
+    Provides an AsyncOrderTracker over adapted storages with and without the optional capabilities.
+    """
+    if request.param == 'basic':
+        return AsyncOrderTracker(AsyncStorageAdapter(BasicStorage()), clock=Clock())
+    return AsyncOrderTracker(
+        AsyncStorageAdapter(InMemoryStorage(), blocking=request.param == 'in_memory_blocking'), clock=Clock()
+    )
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+async def collect(orders):
+    return [order.order_id async for order in orders]
+
+def test_storage_without_required_methods_should_raise_error():
+    with pytest.raises(TypeError, match="Storage object must implement a callable 'save_order' method."):
+        AsyncOrderTracker(object())
+
+def test_add_order_and_duplicate(order_tracker):
+    async def scenario():
+        order = await order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+        with pytest.raises(ValueError, match="Order with ID 'ord-01' already exists."):
+            await order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+        return order
+
+    assert run(scenario()) == dict(
+        order_id='ord-01', item_name='jacket', quantity=1, customer_id='C1', status='pending',
+        created_at=NOW, updated_at=NOW, history=(('pending', NOW),),
+    )
+
+@pytest.mark.parametrize("quantity, status, error", [
+    (0, 'pending', "Minimum quantity value allowed 1, 0 given."),
+    (1, 'shipped', "Invalid initial status, allowed 'pending, processing' but  'shipped' given."),
+])
+def test_add_order_applies_order_tracker_rules(order_tracker, quantity, status, error):
+    with pytest.raises(ValueError, match=error):
+        run(order_tracker.add_order('ord-01', 'jacket', quantity, 'C1', status))
+
+def test_update_order_status(order_tracker):
+    async def scenario():
+        await order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+        updated = await order_tracker.update_order_status('ord-01', 'processing')
+        with pytest.raises(ValueError, match="Order with ID 'missing' not found."):
+            await order_tracker.update_order_status('missing', 'processing')
+        return updated.status, (await order_tracker.get_order_by_id('ord-01')).status
+
+    assert run(scenario()) == ('processing', 'processing')
+
+def test_update_statuses_reports_per_order_failures(order_tracker):
+    async def scenario():
+        await order_tracker.add_order('ord-01', 'jacket', 1, 'C1', 'processing')
+        await order_tracker.add_order('ord-02', 'jacket', 1, 'C1')
+        results = await order_tracker.update_statuses(['ord-01', 'ord-02', 'missing'], 'shipped')
+        return [str(result) if isinstance(result, ValueError) else result.status for result in results]
+
+    assert run(scenario()) == [
+        'shipped', "Invalid status transition from 'pending' to 'shipped'.", "Order with ID 'missing' not found."
+    ]
+
+def test_add_orders_lists_and_iterates(order_tracker):
+    async def scenario():
+        results = await order_tracker.add_orders([
+            dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id='C1', status=status)
+            for i, status in enumerate(['pending', 'processing', 'pending', 'pending'])
+        ] + [dict(order_id='ord-00', item_name='jacket', quantity=1, customer_id='C1')])
+        processing = await order_tracker.list_orders_by_status('processing')
+        page = await collect(await order_tracker.iter_orders(status='pending', after='ord-00', limit=1))
+        return results, processing, page, len(await order_tracker.list_all_orders())
+
+    results, processing, page, total = run(scenario())
+
+    assert type(results[-1]).__name__ == 'DuplicateOrderError'
+    assert [order['order_id'] for order in processing] == ['ord-01']
+    assert page == ['ord-02']
+    assert total == 4
+
+def test_iter_orders_with_unknown_cursor_should_raise_error(order_tracker):
+    with pytest.raises(ValueError, match="Invalid cursor, order with ID 'missing' not found."):
+        run(order_tracker.iter_orders(after='missing'))
+
+def test_list_and_iter_orders_by_customer(order_tracker):
+    async def scenario():
+        await order_tracker.add_orders([
+            dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id=customer_id, status=status)
+            for i, (customer_id, status) in enumerate([('C1', 'pending'), ('C2', 'pending'), ('C1', 'processing')])
+        ])
+        by_customer = await order_tracker.list_orders_by_customer('C1')
+        page = await collect(await order_tracker.iter_orders(status='processing', customer_id='C1'))
+        return [order['order_id'] for order in by_customer], page
+
+    assert run(scenario()) == (['ord-00', 'ord-02'], ['ord-02'])
+
+def test_search_orders_by_item_name_and_status(order_tracker):
+    async def scenario():
+        await order_tracker.add_orders([
+            dict(order_id=f'ord-0{i}', item_name=item_name, quantity=1, customer_id='C1', status=status)
+            for i, (item_name, status) in enumerate([('Red Jacket', 'pending'), ('Boots', 'pending'),
+                                                     ('Jacket', 'processing')])
+        ])
+        found = await order_tracker.search_orders('JACK')
+        processing = await order_tracker.search_orders('jacket', status='processing')
+        return [order['order_id'] for order in found], [order['order_id'] for order in processing]
+
+    assert run(scenario()) == (['ord-00', 'ord-02'], ['ord-02'])
+
+def test_iter_orders_by_creation_time_and_list_stuck_orders(order_tracker):
+    async def scenario():
+        for i in range(1, 4):
+            order_tracker.clock.now = NOW + 60 * i
+            await order_tracker.add_order(f'ord-0{i}', 'jacket', 1, 'C1')
+        await order_tracker.update_statuses(['ord-01', 'ord-03'], 'processing')
+        order_tracker.clock.now = NOW + 3600
+        in_range = await collect(await order_tracker.iter_orders(since=NOW + 120, limit=5))
+        stuck = await order_tracker.list_stuck_orders('processing', 3000)
+        return in_range, [order['order_id'] for order in stuck]
+
+    assert run(scenario()) == (['ord-02', 'ord-03'], ['ord-01', 'ord-03'])
+
+def test_get_orders_by_ids(order_tracker):
+    async def scenario():
+        await order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+        await order_tracker.add_order('ord-02', 'boots', 1, 'C1')
+        return list(await order_tracker.get_orders_by_ids(['ord-02', 'missing', 'ord-01']))
+
+    assert run(scenario()) == ['ord-02', 'ord-01']
@@ -0,0 +1,58 @@
+import json
+
+from .. import app as app_module
+from ..benchmarks import runner
+from ..order import Order
+
+# --- Smoke tests for the benchmark runner ---
+
+def test_benchmarks_write_results_for_every_case(tmp_path):
+    # Arrange
+    output = tmp_path / 'results.json'
+
+    # Act
+    exit_code = runner.main(['--sizes', '20', '--operations', '3', '--list-operations', '1', '--memory',
+                             '--output', str(output)])
+
+    # Assert
+    assert exit_code == 0
+    report = json.loads(output.read_text())
+    results = report["results"]
+    cases = {(entry["backend"], entry["case"]) for entry in results}
+    for backend in runner.BACKENDS:
+        for case in runner.TRACKER_CASES:
+            assert (backend, case) in cases
+    for case in runner.HTTP_CASES:
+        assert ('http', case) in cases
+    assert all(entry["mean_us"] > 0 for entry in results)
+    assert {entry["backend"] for entry in report["memory"]} == set(runner.MEMORY_BACKENDS)
+    assert all(entry["bytes_per_order"] > 0 for entry in report["memory"])
+
+def test_compare_reports_only_slower_cases():
+    # Arrange
+    baseline = {"results": [
+        {"case": "get_order_by_id", "backend": "memory", "size": 10, "mean_us": 10.0},
+        {"case": "add_order", "backend": "memory", "size": 10, "mean_us": 10.0},
+    ]}
+    current = {"results": [
+        {"case": "get_order_by_id", "backend": "memory", "size": 10, "mean_us": 30.0},
+        {"case": "add_order", "backend": "memory", "size": 10, "mean_us": 11.0},
+        {"case": "list_all_orders", "backend": "memory", "size": 10, "mean_us": 99.0},
+    ]}
+
+    # Act
+    regressions = runner.compare(current, baseline, threshold=1.25)
+
+    # Assert
+    assert [regression["case"] for regression in regressions] == ["get_order_by_id"]
+    assert regressions[0]["ratio"] == 3.0
+
+def test_http_cases_leave_the_default_app_store_untouched():
+    # Arrange
+    app_module.storage.save_order('keep-me', Order('keep-me', 'item', 1, 'cust-0001', 'pending'))
+
+    # Act
+    runner.run_http_cases(size=20, operations=3, list_operations=1)
+
+    # Assert
+    assert app_module.storage.get_order('keep-me') is not None
@@ -0,0 +1,49 @@
+import pytest
+
+from ..exception.idempotency_key_in_use_error import IdempotencyKeyInUseError
+from ..idempotency_store import IdempotencyStore
+
+# --- IdempotencyStore tests ---
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_begin_reserves_key_until_completed_or_released():
+    store = IdempotencyStore()
+
+    assert store.begin('key-1', b'{}') is None
+    with pytest.raises(IdempotencyKeyInUseError):
+        store.begin('key-1', b'{}')
+    store.release('key-1')
+    assert store.begin('key-1', b'{}') is None
+    store.complete('key-1', 201, b'{"order_id": "ord-1"}')
+
+    assert store.begin('key-1', b'{}') == (201, b'{"order_id": "ord-1"}')
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    store = IdempotencyStore(ttl_seconds=60, clock=clock)
+    store.begin('key-1', b'{}')
+    store.complete('key-1', 201, b'{}')
+
+    clock.now = 59
+    replayed = store.begin('key-1', b'{}')
+    clock.now = 61
+
+    assert replayed == (201, b'{}')
+    assert store.begin('key-1', b'{}') is None
+
+def test_oldest_entries_are_evicted_past_max_bytes():
+    entry_size = len('key-0') + 100 + IdempotencyStore.ENTRY_OVERHEAD_BYTES
+    store = IdempotencyStore(max_bytes=3 * entry_size)
+
+    for i in range(4):
+        store.begin(f'key-{i}', b'{}')
+        store.complete(f'key-{i}', 201, b'x' * 100)
+
+    assert store.begin('key-0', b'{}') is None
+    assert [store.begin(f'key-{i}', b'{}') for i in (2, 3)] == [(201, b'x' * 100)] * 2
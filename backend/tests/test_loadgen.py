@@ -0,0 +1,91 @@
+import json
+import threading
+from itertools import islice
+
+from werkzeug.serving import make_server
+
+from backend.app import create_app
+from ..loadgen import runner
+from ..loadgen.targets import HttpTarget
+from ..loadgen.traffic import OPERATIONS, TrafficMix, parse_mix
+
+# --- Smoke tests for the load generator ---
+
+def test_loadgen_reports_every_operation_of_the_mix(tmp_path):
+    # Arrange
+    output, record = tmp_path / 'report.json', tmp_path / 'requests.ndjson'
+
+    # Act
+    exit_code = runner.main(['--requests', '200', '--concurrency', '4', '--max-error-rate', '0',
+                             '--output', str(output), '--record', str(record)])
+
+    # Assert
+    assert exit_code == 0
+    report = json.loads(output.read_text())
+    assert report["total"]["requests"] == 200
+    assert report["total"]["errors"] == 0
+    assert set(report["operations"]) == set(OPERATIONS)
+    assert report["total"]["p50_ms"] <= report["total"]["p95_ms"] <= report["total"]["p99_ms"]
+    assert len(record.read_text().splitlines()) == 200
+
+def test_loadgen_replay_breaks_errors_down_by_domain_error(tmp_path):
+    # Arrange
+    log, output = tmp_path / 'requests.ndjson', tmp_path / 'report.json'
+    log.write_text('\n'.join(json.dumps(request) for request in [
+        {"method": "POST", "path": "/api/orders", "body": {"order_id": "LG1", "item_name": "Hat", "quantity": 1, "customer_id": "C1"}},
+        {"method": "POST", "path": "/api/orders", "body": {"order_id": "LG1", "item_name": "Hat", "quantity": 1, "customer_id": "C1"}},
+        {"method": "PUT", "path": "/api/orders/LG1/status", "body": {"new_status": "lost"}},
+        {"method": "PUT", "path": "/api/orders/LG1/status", "body": {"new_status": "delivered"}},
+        {"method": "GET", "path": "/api/orders/LG2"},
+    ]) + '\n')
+
+    # Act
+    exit_code = runner.main(['--replay', str(log), '--concurrency', '1', '--max-error-rate', '0.5',
+                             '--output', str(output)])
+
+    # Assert
+    assert exit_code == 1
+    report = json.loads(output.read_text())
+    assert report["total"]["requests"] == 5
+    assert report["total"]["errors_by_kind"] == {
+        "DuplicateOrderError": 1, "InvalidStatusError": 1, "InvalidStatusTransitionError": 1, "HTTP 404": 1,
+    }
+    assert report["operations"]["update_status"]["error_rate"] == 1.0
+
+def test_loadgen_paces_requests_to_a_server_over_http():
+    # Arrange
+    server = make_server('127.0.0.1', 0, create_app(dict(runner.IN_PROCESS_APP_CONFIG, METRICS=False)), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    target = HttpTarget(f"http://127.0.0.1:{server.server_port}")
+
+    # Act
+    try:
+        outcomes, elapsed_s = runner.run(target, TrafficMix(parse_mix('add=50,get=50'), seed=1), concurrency=2,
+                                         rate=200, total=40)
+    finally:
+        target.close()
+        server.shutdown()
+
+    # Assert
+    assert len(outcomes) == 40
+    assert all(outcome.error is None for outcome in outcomes)
+    # 40 requests at 200 per second are spread over at least 195 ms
+    assert elapsed_s >= 0.19
+
+def test_traffic_mix_reopens_an_order_whose_update_failed():
+    # Arrange
+    traffic = TrafficMix(parse_mix('add=1,update_status=1'), seed=1)
+    # Updates become adds until an order exists
+    add = traffic.next_request()
+    traffic.done(add, True)
+    update = traffic.next_request()
+    while update.operation != 'update_status':
+        update = traffic.next_request()
+
+    # Act
+    traffic.done(update, False)
+    retries = [request.path for request in islice(traffic, 20) if request.operation == 'update_status']
+
+    # Assert
+    assert update.path == f"/api/orders/{add.body['order_id']}/status"
+    assert retries[:1] == [update.path]
@@ -0,0 +1,57 @@
+import pytest
+from ..in_memory_storage import InMemoryStorage
+from ..metrics import MetricsRegistry, instrument_storage, instrument_tracker
+from ..order_tracker import OrderTracker
+
+# --- Fixtures for metrics tests ---
+
+@pytest.fixture
+def registry():
+    return MetricsRegistry()
+
+@pytest.fixture
+def order_tracker(registry):
+    """
+    Provides an OrderTracker whose tracker and storage calls are instrumented.
+    """
+    storage = InMemoryStorage()
+    instrument_storage(storage, registry)
+    order_tracker = OrderTracker(storage)
+    instrument_tracker(order_tracker, registry)
+    return order_tracker
+
+# DONE: histograms render cumulative Prometheus buckets
+def test_registry_renders_prometheus_text(registry):
+    # Arrange
+    histogram = registry.histogram('op_seconds', 'Op duration.', op='get')
+    registry.counter('errors_total', 'Errors.', error='Bad"Quote').inc(2)
+
+    # Act
+    histogram.observe(0.0002)
+    histogram.observe(20)
+    text = registry.render()
+
+    # Assert
+    assert '# TYPE op_seconds histogram' in text
+    assert 'op_seconds_bucket{op="get",le="0.0001"} 0' in text
+    assert 'op_seconds_bucket{op="get",le="0.00025"} 1' in text
+    assert 'op_seconds_bucket{op="get",le="10.0"} 1' in text
+    assert 'op_seconds_bucket{op="get",le="+Inf"} 2' in text
+    assert 'op_seconds_count{op="get"} 2' in text
+    assert 'errors_total{error="Bad\\"Quote"} 2' in text
+
+# DONE: tracker and storage calls are timed and domain errors are counted
+def test_instrumented_tracker_records_calls_errors_and_order_count(order_tracker, registry):
+    # Act
+    order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+    with pytest.raises(ValueError):
+        order_tracker.add_order('ord-01', 'jacket', 1, 'C1')
+    order_tracker.add_orders([dict(order_id='ord-02', item_name='jacket', quantity=0, customer_id='C1')])
+    text = registry.render()
+
+    # Assert
+    assert 'udatrack_tracker_call_seconds_count{method="add_order"} 2' in text
+    assert 'udatrack_storage_operation_seconds_count{backend="InMemoryStorage",operation="insert_if_absent"} 2' in text
+    assert 'udatrack_domain_errors_total{error="DuplicateOrderError"} 1' in text
+    assert 'udatrack_domain_errors_total{error="MinimumOrderQuantityError"} 1' in text
+    assert 'udatrack_storage_orders{backend="InMemoryStorage"} 1' in text
@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+from ..order import Order
+from ..order_events import OrderEventHub
+
+# --- OrderEventHub tests ---
+
+def make_order(order_id, status='pending'):
+    return Order(order_id, 'jacket', 1, 'C1', status)
+
+def test_events_after_resumes_from_ring_buffer():
+    hub = OrderEventHub(buffer_size=3)
+    for i in range(5):
+        hub.publish(OrderEventHub.CREATED, make_order(f'ord-0{i}'))
+
+    assert [event.event_id for event in hub.events_after(2)] == [3, 4, 5]
+    assert hub.events_after(5) == []
+    assert hub.events_after(1) is None
+    assert hub.events_after(9) is None
+
+def test_wait_for_events_wakes_up_on_publish():
+    hub = OrderEventHub()
+    timer = threading.Timer(0.05, hub.publish, (OrderEventHub.STATUS_CHANGED, make_order('ord-01', 'processing')))
+    timer.start()
+
+    events = hub.wait_for_events(0, timeout=5)
+
+    assert [(event.event_type, event.order.status) for event in events] == [('status_changed', 'processing')]
+    assert hub.wait_for_events(1, timeout=0.01) == []
+
+def test_wait_for_events_async_wakes_up_on_publish_from_another_thread():
+    hub = OrderEventHub()
+    timer = threading.Timer(0.05, hub.publish, (OrderEventHub.CREATED, make_order('ord-01')))
+
+    async def wait():
+        timer.start()
+        events = await hub.wait_for_events_async(0, timeout=5)
+        return events, await hub.wait_for_events_async(1, timeout=0.01)
+    events, idle = asyncio.run(wait())
+
+    assert [event.order.order_id for event in events] == ['ord-01']
+    assert idle == [] and not hub._async_waiters
+
+def test_event_ids_only_parse_for_the_same_hub():
+    hub = OrderEventHub()
+
+    assert hub.parse_event_id(hub.format_event_id(7)) == 7
+    assert OrderEventHub().parse_event_id(hub.format_event_id(7)) is None
+    assert hub.parse_event_id(None) is None
@@ -1,8 +1,21 @@
 import pytest
 from unittest.mock import Mock
 from ..order_tracker import OrderTracker
+from ..in_memory_storage import InMemoryStorage
+from ..order import Order
+from ..order_events import OrderEventHub
+import re
 import uuid
 
+# The time of the fixed clock the trackers under test are given
+NOW = 1_700_000_000.0
+
+def stamped(order, at=NOW):
+    """
+    Returns the order as created at time `at`.
+    """
+    return dict(order, created_at=at, updated_at=at, history=((order['status'], at),))
+
 # --- Fixtures for Unit Tests ---
 
 @pytest.fixture
@@ -23,7 +36,7 @@ def order_tracker(mock_storage):
     """
     Provides an OrderTracker instance initialized with the mock_storage.
     """
-    return OrderTracker(mock_storage)
+    return OrderTracker(mock_storage, clock=lambda: NOW)
 
 @pytest.fixture
 def default_id():
@@ -62,13 +75,13 @@ def test_add_order_without_status_creates_order_with_status_pending(order_tracke
     mock_storage.save_order.assert_called_once()
     mock_storage.save_order.assert_called_with(
         order_id,
-        dict(
+        stamped(dict(
             order_id=order_id,
             item_name='jacket',
             quantity=1,
             customer_id = customer_id,
             status='pending'
-        )
+        ))
     )
 
 @pytest.mark.parametrize("status", [
@@ -91,7 +104,7 @@ def test_add_order_with_explicit_shipped_status(order_tracker, mock_storage, ord
 
     # Assert
     mock_storage.save_order.assert_called_once()
-    mock_storage.save_order.assert_called_with(order_id, order)
+    mock_storage.save_order.assert_called_with(order_id, stamped(order))
 
 # DONE duplicate IDs
 def test_add_order_with_duplicate_id_raise_exception(order_tracker, order_default):
@@ -222,7 +235,9 @@ def test_update_order_status_sucess(order_tracker, existing_order, new_status):
     # Assert
     mock_storage.get_order.assert_called_once()
     mock_storage.get_order.assert_called_with(existing_order['order_id'])
-    mock_storage.save_order.assert_called_once_with(existing_order['order_id'], dict(existing_order, status=new_status))
+    mock_storage.save_order.assert_called_once_with(existing_order['order_id'], dict(
+        existing_order, status=new_status, created_at=None, updated_at=NOW, history=((new_status, NOW),)
+    ))
 
 # DONE: invalid status (fail fast, no storage read)
 def test_update_order_with_invalid_status_should_raise_error(order_tracker):
@@ -233,6 +248,26 @@ def test_update_order_with_invalid_status_should_raise_error(order_tracker):
     with pytest.raises(ValueError, match=f"Not a valid status. Allowed values '{", ".join(order_tracker.VALID_STATUS_ALLOWED)}' but '{invalid_status}' given"):
         order_tracker.update_order_status('order_id', invalid_status)
 
+# DONE: update_order_status rejects transitions the order lifecycle doesn't allow
+@pytest.mark.parametrize("current_status,new_status", [
+    ('pending', 'shipped'),
+    ('shipped', 'cancelled'),
+    ('delivered', 'pending'),
+    ('cancelled', 'processing'),
+    ('processing', 'processing'),
+])
+def test_update_order_status_with_invalid_transition_should_raise_error(order_tracker, current_status, new_status):
+    # Arrange
+    mock_storage = order_tracker.storage
+    mock_storage.get_order.return_value = dict(order_id='order-id', item_name='jacket', quantity=1, customer_id='customer_id', status=current_status)
+
+    # Act
+    with pytest.raises(ValueError, match=f"Invalid status transition from '{current_status}' to '{new_status}'."):
+        order_tracker.update_order_status('order-id', new_status)
+
+    # Assert
+    mock_storage.save_order.assert_not_called()
+
 # DONE: update_order_status non existent order
 def test_update_order_status_with_not_found_order_should_raise_error(order_tracker):
     # Arrange
@@ -339,4 +374,397 @@ def test_list_orders_by_status_with_invalid_status_should_raise_error(order_trac
 
     # Act
     with pytest.raises(ValueError, match="Not a valid status. Allowed values 'pending, processing, shipped, delivered, cancelled' but 'invalid' given."):
-        order_tracker.list_orders_by_status(invalid_status)
\ No newline at end of file
+        order_tracker.list_orders_by_status(invalid_status)
+
+# DONE: List orders by status uses the storage status index when available
+def test_list_orders_by_status_uses_storage_index_when_available(order_default):
+    # Arrange
+    indexed_storage = Mock(spec=InMemoryStorage)
+    indexed_storage.get_orders_by_status.return_value = {order_default['order_id']: order_default}
+    order_tracker = OrderTracker(indexed_storage)
+
+    # Act
+    orders = order_tracker.list_orders_by_status('pending')
+
+    # Assert
+    indexed_storage.get_orders_by_status.assert_called_once_with('pending')
+    indexed_storage.get_all_orders.assert_not_called()
+    assert orders == [order_default]
+
+
+# DONE: update_order_status produces a new record and leaves the stored one untouched
+def test_update_order_status_returns_new_record_without_mutating_stored_one(order_tracker, order_default):
+    # Arrange
+    stored_order = Order.from_mapping(dict(order_default, status='pending'))
+    order_tracker.storage.get_order.return_value = stored_order
+
+    # Act
+    updated_order = order_tracker.update_order_status(stored_order.order_id, 'processing')
+
+    # Assert
+    assert updated_order is not stored_order
+    assert updated_order.status == 'processing'
+    assert stored_order.status == 'pending'
+    with pytest.raises(AttributeError):
+        updated_order.status = 'shipped'
+
+
+# DONE: iter_orders delegates to the storage iterator when available
+def test_iter_orders_uses_storage_iterator_when_available(order_default):
+    # Arrange
+    indexed_storage = Mock(spec=InMemoryStorage)
+    indexed_storage.get_order.return_value = order_default
+    indexed_storage.iter_orders.return_value = iter([order_default])
+    order_tracker = OrderTracker(indexed_storage)
+
+    # Act
+    orders = list(order_tracker.iter_orders(status='pending', after='ord-00', limit=10))
+
+    # Assert
+    indexed_storage.iter_orders.assert_called_once_with(status='pending', after='ord-00', limit=10)
+    assert orders == [order_default]
+
+# DONE: iter_orders falls back to scanning all orders after the cursor
+def test_iter_orders_without_storage_iterator_scans_after_cursor(order_tracker):
+    # Arrange
+    mock_storage = order_tracker.storage
+    mock_storage.get_all_orders.return_value = {
+        f'ord-0{i}': dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id='customer_id', status=status)
+        for i, status in enumerate(['pending', 'shipped', 'pending', 'pending', 'pending'])
+    }
+    mock_storage.get_order.return_value = mock_storage.get_all_orders.return_value['ord-00']
+
+    # Act
+    orders = list(order_tracker.iter_orders(status='pending', after='ord-00', limit=2))
+
+    # Assert
+    assert [order['order_id'] for order in orders] == ['ord-02', 'ord-03']
+
+# DONE: list_orders_by_customer uses the storage customer index
+def test_list_orders_by_customer_uses_storage_index_when_available(order_default):
+    # Arrange
+    indexed_storage = Mock(spec=InMemoryStorage)
+    indexed_storage.get_orders_by_customer.return_value = {order_default['order_id']: order_default}
+    order_tracker = OrderTracker(indexed_storage)
+
+    # Act
+    orders = order_tracker.list_orders_by_customer('customer_id', 'pending')
+
+    # Assert
+    assert orders == [order_default]
+    indexed_storage.get_orders_by_customer.assert_called_once_with('customer_id', 'pending')
+    indexed_storage.get_all_orders.assert_not_called()
+
+# DONE: list_orders_by_customer filters every order without a customer index
+def test_list_orders_by_customer_without_index_filters_all_orders(order_tracker):
+    # Arrange
+    order_tracker.storage.get_all_orders.return_value = {
+        f'ord-0{i}': dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id=customer_id, status=status)
+        for i, (customer_id, status) in enumerate([('C1', 'pending'), ('C2', 'pending'), ('C1', 'shipped')])
+    }
+
+    # Act
+    orders = order_tracker.list_orders_by_customer('C1', status='shipped')
+
+    # Assert
+    assert [order['order_id'] for order in orders] == ['ord-02']
+    assert len(order_tracker.list_orders_by_customer('C1')) == 2
+
+# DONE: list_orders_by_customer with an empty customer id should raise error
+def test_list_orders_by_customer_with_empty_customer_id_should_raise_error(order_tracker):
+    # Act
+    with pytest.raises(ValueError, match="'customer_id' cannot be empty."):
+        order_tracker.list_orders_by_customer('')
+
+# DONE: iter_orders with an unknown cursor should raise error
+def test_iter_orders_with_unknown_cursor_should_raise_error(order_tracker):
+    # Act
+    with pytest.raises(ValueError, match="Invalid cursor, order with ID 'missing' not found."):
+        order_tracker.iter_orders(after='missing')
+
+# DONE: iter_orders with a non positive limit should raise error
+@pytest.mark.parametrize("limit", [0, -1])
+def test_iter_orders_with_invalid_limit_should_raise_error(order_tracker, limit):
+    # Act
+    with pytest.raises(ValueError, match=f"Page limit must be a positive integer, '{limit}' given."):
+        order_tracker.iter_orders(limit=limit)
+
+
+# DONE: add_orders validates every row and inserts the valid ones in one atomic batch
+def test_add_orders_commits_valid_rows_and_reports_rejected_ones(order_default):
+    # Arrange
+    indexed_storage = Mock(spec=InMemoryStorage)
+    indexed_storage.insert_orders_if_absent.return_value = {'existing'}
+    order_tracker = OrderTracker(indexed_storage, clock=lambda: NOW)
+    rows = [
+        dict(order_default),
+        dict(order_default, order_id='zero', quantity=0),
+        dict(order_default, order_id='shipped', status='shipped'),
+        dict(order_default, order_id='existing'),
+        dict(order_default),
+        dict(item_name='jacket', quantity=1),
+        'not an order',
+    ]
+
+    # Act
+    results = order_tracker.add_orders(rows)
+
+    # Assert
+    assert results[0] == stamped(dict(order_default, status='pending'))
+    assert [type(result).__name__ for result in results[1:]] == [
+        'MinimumOrderQuantityError', 'InvalidInitialStatusError', 'DuplicateOrderError',
+        'DuplicateOrderError', 'MalformedOrderError', 'MalformedOrderError',
+    ]
+    assert str(results[5]) == "Malformed order, missing required fields 'order_id, customer_id'."
+    indexed_storage.insert_orders_if_absent.assert_called_once_with({
+        order_default['order_id']: results[0],
+        'existing': Order.from_mapping(stamped(dict(order_default, order_id='existing', status='pending'))),
+    })
+    indexed_storage.save_order.assert_not_called()
+
+# DONE: add_orders falls back to per order storage calls
+def test_add_orders_without_batch_storage_saves_each_order(order_tracker, order_default):
+    # Arrange
+    mock_storage = order_tracker.storage
+    other_order = dict(order_default, order_id='other')
+
+    # Act
+    results = order_tracker.add_orders([order_default, other_order])
+
+    # Assert
+    assert results == [stamped(dict(order_default, status='pending')), stamped(dict(other_order, status='pending'))]
+    assert mock_storage.get_order.call_count == 2
+    assert mock_storage.save_order.call_count == 2
+
+
+# DONE: add_orders rejects mistyped fields before they reach the storage
+@pytest.mark.parametrize("field, value", [
+    ('order_id', ['x']), ('order_id', ''), ('item_name', ['a']), ('customer_id', {'id': 'C1'}), ('quantity', True),
+])
+def test_add_orders_rejects_mistyped_fields(order_default, field, value):
+    # Arrange
+    indexed_storage = Mock(spec=InMemoryStorage)
+    indexed_storage.insert_orders_if_absent.return_value = set()
+    order_tracker = OrderTracker(indexed_storage, clock=lambda: NOW)
+
+    # Act
+    results = order_tracker.add_orders([dict(order_default, **{field: value})])
+
+    # Assert
+    assert type(results[0]).__name__ == 'MalformedOrderError'
+    indexed_storage.insert_orders_if_absent.assert_called_once_with({})
+
+
+# DONE: add_order inserts atomically when the storage supports it
+def test_add_order_uses_atomic_insert_when_available(order_default):
+    # Arrange
+    atomic_storage = Mock(spec=InMemoryStorage)
+    atomic_storage.insert_if_absent.side_effect = [True, False]
+    order_tracker = OrderTracker(atomic_storage)
+
+    # Act
+    order_tracker.add_order(**order_default)
+    with pytest.raises(ValueError, match=f"Order with ID '{order_default['order_id']}' already exists."):
+        order_tracker.add_order(**order_default)
+
+    # Assert
+    assert atomic_storage.insert_if_absent.call_count == 2
+    atomic_storage.get_order.assert_not_called()
+    atomic_storage.save_order.assert_not_called()
+
+# DONE: update_order_status retries the compare and set when the status changed concurrently
+def test_update_order_status_retries_compare_and_set(order_default):
+    # Arrange
+    atomic_storage = Mock(spec=InMemoryStorage)
+    pending_order = Order.from_mapping(dict(order_default, status='pending'))
+    processing_order = pending_order.replace(status='processing')
+    atomic_storage.get_order.side_effect = [pending_order, processing_order]
+    atomic_storage.compare_and_set_status.side_effect = [None, processing_order.replace(status='cancelled')]
+    order_tracker = OrderTracker(atomic_storage, clock=lambda: NOW)
+
+    # Act
+    order = order_tracker.update_order_status(pending_order.order_id, 'cancelled')
+
+    # Assert
+    assert order.status == 'cancelled'
+    assert atomic_storage.compare_and_set_status.call_args_list[1].args == (pending_order.order_id, 'processing', 'cancelled', NOW)
+    atomic_storage.save_order.assert_not_called()
+
+# DONE: add and update publish change events to the hub
+def test_add_and_update_publish_order_events(order_default):
+    # Arrange
+    events = OrderEventHub()
+    order_tracker = OrderTracker(InMemoryStorage(), events)
+
+    # Act
+    order_tracker.add_order(**order_default)
+    order_tracker.add_orders([dict(order_default, order_id='other'), dict(order_default)])
+    order_tracker.update_order_status(order_default['order_id'], 'processing')
+
+    # Assert
+    assert [(event.event_type, event.order.order_id, event.order.status) for event in events.events_after(0)] == [
+        ('created', order_default['order_id'], 'pending'),
+        ('created', 'other', 'pending'),
+        ('status_changed', order_default['order_id'], 'processing'),
+    ]
+
+# DONE: update_statuses applies one transition to many orders and reports each failure
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['bulk', 'fallback'])
+def test_update_statuses_reports_per_order_failures(storage, order_default):
+    # Arrange
+    events = OrderEventHub()
+    order_tracker = OrderTracker(storage, events)
+    order_tracker.add_orders([
+        dict(order_default, order_id='ord-01', status='processing'),
+        dict(order_default, order_id='ord-02', status='processing'),
+        dict(order_default, order_id='ord-03', status='pending'),
+    ])
+
+    # Act
+    results = order_tracker.update_statuses(['ord-01', 'ord-03', 'missing', '', 'ord-02', 'ord-01'], 'shipped')
+
+    # Assert
+    assert [getattr(result, 'status', None) for result in results] == ['shipped', None, None, None, 'shipped', 'shipped']
+    assert [str(result) for result in results[1:4]] == [
+        "Invalid status transition from 'pending' to 'shipped'.",
+        "Order with ID 'missing' not found.",
+        "'order_id' cannot be empty.",
+    ]
+    assert order_tracker.get_order_by_id('ord-03')['status'] == 'pending'
+    assert [event.order.order_id for event in events.events_after(3)] == ['ord-01', 'ord-02']
+
+# DONE: summarize groups orders with or without running totals in the storage
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['totals', 'scan'])
+def test_summarize_groups_orders(storage, order_default):
+    # Arrange
+    order_tracker = OrderTracker(storage)
+    order_tracker.add_order('ord-01', 'jacket', 2, 'C1')
+    order_tracker.add_order('ord-02', 'boots', 3, 'C2', 'processing')
+    order_tracker.add_order('ord-03', 'jacket', 4, 'C2')
+
+    # Act
+    by_status = order_tracker.summarize()
+    by_item = order_tracker.summarize('item_name', ['sum_quantity'])
+
+    # Assert
+    assert by_status == {'pending': {'count': 2, 'sum_quantity': 6}, 'processing': {'count': 1, 'sum_quantity': 3}}
+    assert by_item == {'boots': {'sum_quantity': 3}, 'jacket': {'sum_quantity': 6}}
+
+# DONE: summarize rejects unknown groupings and metrics
+@pytest.mark.parametrize("group_by,metrics,error", [
+    ('order_id', ['count'], "Invalid group_by, allowed 'status, item_name, customer_id' but 'order_id' given."),
+    ('status', ['avg_quantity'], "Invalid metric, allowed 'count, sum_quantity' but 'avg_quantity' given."),
+])
+def test_summarize_with_invalid_arguments_should_raise_error(order_tracker, group_by, metrics, error):
+    # Act
+    with pytest.raises(ValueError, match=error):
+        order_tracker.summarize(group_by, metrics)
+
+    # Assert
+    order_tracker.storage.get_all_orders.assert_not_called()
+
+# DONE: search_orders finds item name word prefixes with or without an index in the storage
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['index', 'scan'])
+def test_search_orders_matches_item_name_word_prefixes(storage):
+    # Arrange
+    order_tracker = OrderTracker(storage)
+    order_tracker.add_order('ord-01', 'Red Jacket', 1, 'C1')
+    order_tracker.add_order('ord-02', 'Rain Boots', 1, 'C2', 'processing')
+    order_tracker.add_order('ord-03', 'Jacket, red', 1, 'C2', 'processing')
+
+    # Act
+    by_prefixes = order_tracker.search_orders('red jack')
+    by_status = order_tracker.search_orders('r', status='processing', limit=1)
+
+    # Assert
+    assert [order['order_id'] for order in by_prefixes] == ['ord-01', 'ord-03']
+    assert [order['order_id'] for order in by_status] == ['ord-02']
+
+# DONE: search_orders rejects queries without any word
+@pytest.mark.parametrize("query", ['', '  ', '!?'])
+def test_search_orders_without_words_should_raise_error(order_tracker, query):
+    # Act
+    with pytest.raises(ValueError, match=re.escape(f"Invalid search query, expected at least one word but '{query}' given.")):
+        order_tracker.search_orders(query)
+
+    # Assert
+    order_tracker.storage.get_all_orders.assert_not_called()
+
+# DONE: iter_orders lists the orders created in [since, until), oldest first, with or without a time index
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['index', 'scan'])
+def test_iter_orders_by_creation_time(storage):
+    # Arrange
+    now = [NOW]
+    order_tracker = OrderTracker(storage, clock=lambda: now[0])
+    for i in range(1, 5):
+        now[0] = NOW + 60 * i
+        order_tracker.add_order(f'ord-0{i}', 'jacket', 1, 'C1' if i % 2 else 'C2')
+
+    # Act
+    in_range = order_tracker.iter_orders(since=NOW + 120, until=NOW + 240)
+    page = order_tracker.iter_orders(since=NOW, customer_id='C1', after='ord-01', limit=1)
+
+    # Assert
+    assert [order['order_id'] for order in in_range] == ['ord-02', 'ord-03']
+    assert [order['order_id'] for order in page] == ['ord-03']
+
+# DONE: list_stuck_orders returns the orders waiting longest in a status, with or without a time index
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['index', 'scan'])
+def test_list_stuck_orders_returns_longest_waiting_first(storage):
+    # Arrange
+    now = [NOW]
+    order_tracker = OrderTracker(storage, clock=lambda: now[0])
+    order_tracker.add_orders([dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id='C1') for i in range(1, 4)])
+    now[0] = NOW + 3600
+    order_tracker.update_statuses(['ord-03', 'ord-01'], 'processing')
+    now[0] = NOW + 7200
+    order_tracker.update_order_status('ord-02', 'processing')
+    now[0] = NOW + 3 * 86400
+
+    # Act
+    stuck = order_tracker.list_stuck_orders('processing', 2 * 86400)
+    recent = order_tracker.list_stuck_orders('processing', 3 * 86400 - 5400, limit=1)
+
+    # Assert
+    assert [order['order_id'] for order in stuck] == ['ord-01', 'ord-03', 'ord-02']
+    assert [order['order_id'] for order in recent] == ['ord-01']
+    assert order_tracker.get_order_by_id('ord-02')['history'] == (('pending', NOW), ('processing', NOW + 7200))
+
+# DONE: time queries reject malformed times
+@pytest.mark.parametrize("query,error", [
+    (lambda tracker: tracker.iter_orders(since='yesterday'), "Invalid 'since', expected seconds since the epoch but 'yesterday' given."),
+    (lambda tracker: tracker.iter_orders(until=True), "Invalid 'until', expected seconds since the epoch but 'True' given."),
+    (lambda tracker: tracker.list_stuck_orders('processing', -1), "Invalid 'older_than', expected a non-negative number of seconds but '-1' given."),
+    (lambda tracker: tracker.list_stuck_orders('stuck', 60), "Not a valid status."),
+])
+def test_time_queries_with_invalid_arguments_should_raise_error(order_tracker, query, error):
+    # Act
+    with pytest.raises(ValueError, match=re.escape(error)):
+        query(order_tracker)
+
+    # Assert
+    order_tracker.storage.get_all_orders.assert_not_called()
+
+# DONE: get_orders_by_ids resolves a batch of IDs with or without batch lookups in the storage
+@pytest.mark.parametrize("storage", [InMemoryStorage(), Mock(wraps=InMemoryStorage())], ids=['batch', 'fallback'])
+def test_get_orders_by_ids_returns_existing_orders_in_request_order(storage):
+    # Arrange
+    order_tracker = OrderTracker(storage)
+    order_tracker.BULK_CHUNK_SIZE = 2
+    order_tracker.add_orders([dict(order_id=f'ord-0{i}', item_name='jacket', quantity=1, customer_id='C1') for i in range(1, 4)])
+
+    # Act
+    found = order_tracker.get_orders_by_ids(['ord-03', 'missing', 'ord-01', 'ord-03', 'ord-02'])
+
+    # Assert
+    assert list(found) == ['ord-03', 'ord-01', 'ord-02']
+    assert found['ord-01'] == order_tracker.get_order_by_id('ord-01')
+
+# DONE: get_orders_by_ids rejects empty IDs before reading the storage
+def test_get_orders_by_ids_with_empty_id_should_raise_error(order_tracker):
+    # Act
+    with pytest.raises(ValueError, match="'order_id' cannot be empty."):
+        order_tracker.get_orders_by_ids(['ord-01', ''])
+
+    # Assert
+    order_tracker.storage.get_order.assert_not_called()
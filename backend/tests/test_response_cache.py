@@ -0,0 +1,24 @@
+from ..response_cache import ResponseCache
+
+# --- ResponseCache tests ---
+
+def test_bodies_are_served_only_for_their_version():
+    cache = ResponseCache()
+    cache.put('key', 1, b'[]')
+
+    assert cache.get('key', 1) == b'[]'
+    assert cache.get('key', 2) is None
+
+def test_least_recently_used_bodies_are_evicted_beyond_the_byte_budget():
+    cache = ResponseCache(max_bytes=10)
+    cache.put('a', 1, b'1234')
+    cache.put('b', 1, b'1234')
+    cache.get('a', 1)
+
+    cache.put('c', 1, b'1234')
+    cache.put('a', 2, b'12')
+
+    assert cache.get('b', 1) is None
+    assert (cache.get('a', 2), cache.get('c', 1)) == (b'12', b'1234')
+    cache.put('too-big', 1, b'x' * 11)
+    assert len(cache) == 2
@@ -0,0 +1,788 @@
+import multiprocessing
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from ..caching_storage import CachingStorage
+from ..columnar_storage import ColumnarStorage
+from ..in_memory_storage import InMemoryStorage
+from ..order import Order
+from ..order_journal import OrderJournal
+from ..sharded_storage import ShardedStorage
+from ..shared_storage import SharedStorage
+from .. import sqlite_storage
+from ..sqlite_storage import SqliteStorage
+from ..storage_server import StorageServer
+
+AUTHKEY = b'test-key'
+
+# --- Fixtures for storage backend contract tests ---
+
+@pytest.fixture(params=['memory', 'journaled', 'columnar', 'sqlite', 'cached', 'shared'])
+def storage(request, tmp_path):
+    """
+    Provides every storage backend, so each test checks the shared contract.
+    """
+    if request.param == 'sqlite':
+        backend = SqliteStorage(str(tmp_path / 'orders.db'))
+        yield backend
+        backend.close()
+    elif request.param == 'cached':
+        backend = CachingStorage(SqliteStorage(str(tmp_path / 'orders.db')), max_size=2)
+        yield backend
+        backend.close()
+    elif request.param == 'journaled':
+        backend = InMemoryStorage(OrderJournal(str(tmp_path), fsync='never', snapshot_every=4))
+        yield backend
+        backend.close()
+    elif request.param == 'columnar':
+        yield ColumnarStorage()
+    elif request.param == 'shared':
+        server = serve(InMemoryStorage())
+        backend = SharedStorage(server.address, AUTHKEY)
+        yield backend
+        backend.close()
+        server.close()
+    else:
+        yield InMemoryStorage()
+
+def serve(backend):
+    server = StorageServer(backend, authkey=AUTHKEY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def make_order(order_id, status='pending', customer_id='C1'):
+    return Order(order_id, 'jacket', 1, customer_id, status)
+
+def test_save_and_get_order(storage):
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    assert storage.get_order('ord-01') == make_order('ord-01')
+    assert storage.get_order('missing') is None
+
+def test_save_order_reindexes_status_changes(storage):
+    storage.save_orders({order_id: make_order(order_id) for order_id in ('ord-01', 'ord-02', 'ord-03')})
+
+    storage.save_order('ord-02', make_order('ord-02', status='processing'))
+
+    assert list(storage.get_orders_by_status('pending')) == ['ord-01', 'ord-03']
+    assert list(storage.get_orders_by_status('processing')) == ['ord-02']
+    assert list(storage.get_all_orders()) == ['ord-01', 'ord-02', 'ord-03']
+
+def test_iter_orders_pages_in_insertion_order(storage):
+    for i in range(6):
+        storage.save_order(f'ord-0{i}', make_order(f'ord-0{i}', status='pending' if i % 2 else 'processing'))
+
+    first_page = [order.order_id for order in storage.iter_orders(status='pending', limit=2)]
+    next_page = [order.order_id for order in storage.iter_orders(status='pending', after=first_page[-1])]
+
+    assert first_page == ['ord-01', 'ord-03']
+    assert next_page == ['ord-05']
+    assert [order.order_id for order in storage.iter_orders(after='ord-03')] == ['ord-04', 'ord-05']
+
+def test_batch_writes_keep_input_order(storage):
+    order_ids = [f'ord-{i:02d}' for i in range(40)]
+    storage.save_orders({order_id: make_order(order_id) for order_id in order_ids[:20]})
+    storage.insert_orders_if_absent({order_id: make_order(order_id) for order_id in order_ids[20:]})
+
+    assert [order.order_id for order in storage.iter_orders()] == order_ids
+
+def test_customer_index_follows_writes_and_intersects_with_status(storage):
+    storage.save_orders({
+        'ord-01': make_order('ord-01', customer_id='C1'),
+        'ord-02': make_order('ord-02', customer_id='C2'),
+        'ord-03': make_order('ord-03', status='processing', customer_id='C1'),
+        'ord-04': make_order('ord-04', customer_id='C1'),
+    })
+
+    storage.save_order('ord-02', make_order('ord-02', customer_id='C1'))
+    storage.compare_and_set_status('ord-04', 'pending', 'processing')
+
+    assert list(storage.get_orders_by_customer('C1')) == ['ord-01', 'ord-02', 'ord-03', 'ord-04']
+    assert list(storage.get_orders_by_customer('C1', 'processing')) == ['ord-03', 'ord-04']
+    assert storage.get_orders_by_customer('C2') == {}
+    assert [order.order_id for order in storage.iter_orders(status='pending', customer_id='C1', after='ord-01')] == ['ord-02']
+    assert [order.order_id for order in storage.iter_orders(customer_id='C1', limit=2)] == ['ord-01', 'ord-02']
+
+def test_versions_follow_writes(storage):
+    initial = storage.get_version()
+
+    storage.save_order('ord-01', make_order('ord-01'))
+    storage.insert_if_absent('ord-02', make_order('ord-02'))
+    after_inserts = storage.get_version()
+    storage.insert_if_absent('ord-01', make_order('ord-01'))
+    storage.compare_and_set_status('ord-01', 'pending', 'processing')
+
+    assert after_inserts > initial
+    assert storage.get_order_version('ord-02') <= after_inserts < storage.get_order_version('ord-01')
+    assert storage.get_order_version('ord-01') == storage.get_version()
+    assert storage.get_order_version('missing') is None
+
+def test_clear_never_reuses_versions(storage):
+    storage.save_order('ord-01', make_order('ord-01'))
+    before_clear = storage.get_version()
+
+    storage.clear()
+
+    assert storage.get_version() > before_clear
+    assert storage.get_order_version('ord-01') is None
+
+def test_find_existing_ids(storage):
+    storage.save_orders({'ord-01': make_order('ord-01'), 'ord-02': make_order('ord-02')})
+
+    assert storage.find_existing_ids(['ord-02', 'ord-03']) == {'ord-02'}
+
+def test_insert_if_absent_only_saves_new_orders(storage):
+    assert storage.insert_if_absent('ord-01', make_order('ord-01')) is True
+    assert storage.insert_if_absent('ord-01', make_order('ord-01', status='processing')) is False
+    assert storage.get_order('ord-01').status == 'pending'
+
+def test_insert_orders_if_absent_reports_skipped_ids(storage):
+    storage.save_order('ord-01', make_order('ord-01', status='processing'))
+
+    skipped = storage.insert_orders_if_absent({'ord-01': make_order('ord-01'), 'ord-02': make_order('ord-02')})
+
+    assert skipped == {'ord-01'}
+    assert storage.get_order('ord-01').status == 'processing'
+    assert storage.get_order('ord-02') == make_order('ord-02')
+
+def test_compare_and_set_status(storage):
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    assert storage.compare_and_set_status('ord-01', 'processing', 'shipped') is None
+    assert storage.compare_and_set_status('ord-01', 'pending', 'processing') == make_order('ord-01', status='processing')
+    assert storage.compare_and_set_status('missing', 'pending', 'processing') is None
+    assert list(storage.get_orders_by_status('processing')) == ['ord-01']
+
+def test_transition_statuses_only_moves_orders_in_source_statuses(storage):
+    storage.save_orders({
+        'ord-01': make_order('ord-01', status='processing'),
+        'ord-02': make_order('ord-02'),
+        'ord-03': make_order('ord-03', status='processing'),
+    })
+
+    updated, rejected = storage.transition_statuses(['ord-03', 'ord-02', 'missing', 'ord-01'], 'shipped', {'processing'})
+
+    assert updated == {'ord-03': make_order('ord-03', status='shipped'), 'ord-01': make_order('ord-01', status='shipped')}
+    assert rejected == {'ord-02': 'pending'}
+    assert list(storage.get_orders_by_status('shipped')) == ['ord-01', 'ord-03']
+    assert storage.get_order('ord-01').status == 'shipped'
+    assert storage.get_order_version('ord-01') > storage.get_order_version('ord-02')
+
+def test_summarize_keeps_running_totals(storage):
+    storage.save_orders({
+        'ord-01': Order('ord-01', 'jacket', 2, 'C1', 'pending'),
+        'ord-02': Order('ord-02', 'boots', 3, 'C1', 'pending'),
+        'ord-03': Order('ord-03', 'jacket', 5, 'C2', 'processing'),
+    })
+
+    storage.save_order('ord-02', Order('ord-02', 'boots', 4, 'C2', 'pending'))
+    storage.compare_and_set_status('ord-01', 'pending', 'processing')
+    storage.transition_statuses(['ord-03'], 'shipped', {'processing'})
+
+    assert storage.summarize('status') == {'processing': (1, 2), 'pending': (1, 4), 'shipped': (1, 5)}
+    assert storage.summarize('item_name') == {'jacket': (2, 7), 'boots': (1, 4)}
+    assert storage.summarize('customer_id') == {'C1': (1, 2), 'C2': (2, 9)}
+    storage.clear()
+    assert storage.summarize('status') == {}
+
+def test_search_orders_matches_item_name_prefixes_in_insertion_order(storage):
+    names = ['Red Jacket', 'Blue jacket', 'Red Scarf', 'Jacket (Red)', 'Rain Boots']
+    storage.save_orders({f'ord-0{i}': Order(f'ord-0{i}', name, 1, 'C1', 'pending') for i, name in enumerate(names)})
+
+    storage.save_order('ord-02', Order('ord-02', 'Red Jacket', 1, 'C1', 'pending'))
+    storage.save_order('ord-04', Order('ord-04', 'Umbrella', 1, 'C1', 'pending'))
+    storage.compare_and_set_status('ord-01', 'pending', 'shipped')
+
+    search = lambda *args: [order.order_id for order in storage.search_orders(*args)]
+    assert search('jacket') == ['ord-00', 'ord-01', 'ord-02', 'ord-03']
+    assert search('RED jack') == ['ord-00', 'ord-02', 'ord-03']
+    assert search('jacket', 'shipped') == ['ord-01']
+    assert search('jacket', None, 2) == ['ord-00', 'ord-01']
+    assert search('scarf') == [] and search('rain') == [] and search('umb') == ['ord-04']
+    assert search('jacketed') == [] and search('red', 'delivered') == []
+
+def test_get_orders_returns_existing_orders_in_request_order(storage):
+    storage.save_orders({order_id: make_order(order_id) for order_id in ('ord-01', 'ord-02', 'ord-03')})
+    storage.compare_and_set_status('ord-02', 'pending', 'processing')
+
+    found = storage.get_orders(['ord-03', 'missing', 'ord-02', 'ord-03'])
+
+    assert list(found) == ['ord-03', 'ord-02']
+    assert found['ord-02'] == make_order('ord-02', status='processing')
+    assert storage.get_orders([]) == {}
+
+def test_iter_orders_by_time_pages_oldest_first(storage):
+    storage.save_orders({
+        'ord-01': Order.new('ord-01', 'jacket', 1, 'C1', 'pending', 30.0),
+        'ord-02': Order.new('ord-02', 'jacket', 1, 'C2', 'pending', 10.0),
+        'ord-03': make_order('ord-03'),
+        'ord-04': Order.new('ord-04', 'jacket', 1, 'C1', 'processing', 20.0),
+        'ord-05': Order.new('ord-05', 'jacket', 1, 'C1', 'pending', 20.0),
+    })
+    storage.save_order('ord-06', Order.new('ord-06', 'jacket', 1, 'C2', 'pending', 40.0))
+
+    by_time = lambda *args, **kwargs: [order.order_id for order in storage.iter_orders_by_time(*args, **kwargs)]
+    assert by_time() == ['ord-02', 'ord-04', 'ord-05', 'ord-01', 'ord-06']
+    assert by_time(20.0, 40.0) == ['ord-04', 'ord-05', 'ord-01']
+    assert by_time(until=20.0) == ['ord-02'] and by_time(since=41.0) == []
+    assert by_time(status='pending', customer_id='C1') == ['ord-05', 'ord-01']
+    assert by_time(after='ord-04', limit=2) == ['ord-05', 'ord-01']
+    assert by_time(since=25.0, after='ord-02') == ['ord-01', 'ord-06']
+    assert storage.get_order('ord-04').history == (('processing', 20.0),)
+
+def test_get_stale_orders_follows_status_changes(storage):
+    storage.save_orders({
+        f'ord-0{i}': Order.new(f'ord-0{i}', 'jacket', 1, 'C1', 'pending', float(i)) for i in range(1, 5)
+    })
+    storage.save_order('ord-05', make_order('ord-05', status='processing'))
+
+    storage.compare_and_set_status('ord-03', 'pending', 'processing', 10.0)
+    storage.transition_statuses(['ord-01', 'ord-02'], 'processing', {'pending'}, 20.0)
+    storage.compare_and_set_status('ord-02', 'processing', 'shipped', 30.0)
+
+    stale = lambda *args: [order.order_id for order in storage.get_stale_orders(*args)]
+    assert stale('processing', 21.0) == ['ord-03', 'ord-01']
+    assert stale('processing', 20.0) == ['ord-03'] and stale('processing', 21.0, 1) == ['ord-03']
+    assert stale('pending', 5.0) == ['ord-04'] and stale('shipped', 100.0) == ['ord-02']
+    order = storage.get_order('ord-02')
+    assert order.history == (('pending', 2.0), ('processing', 20.0), ('shipped', 30.0))
+    assert (order.created_at, order.updated_at, order.status_since) == (2.0, 30.0, 30.0)
+
+def test_concurrent_inserts_and_status_swaps_have_a_single_winner(storage):
+    attempts = range(32)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        inserted = list(pool.map(lambda _: storage.insert_if_absent('ord-01', make_order('ord-01')), attempts))
+        swapped = list(pool.map(lambda _: storage.compare_and_set_status('ord-01', 'pending', 'processing'), attempts))
+
+    assert inserted.count(True) == 1
+    assert sum(order is not None for order in swapped) == 1
+
+def test_clear_removes_every_order(storage):
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    storage.clear()
+
+    assert storage.get_all_orders() == {}
+    assert storage.get_orders_by_status('pending') == {}
+
+def test_replace_orders_swaps_every_stored_order(storage):
+    storage.save_orders({order_id: make_order(order_id) for order_id in ('ord-01', 'ord-02', 'ord-03')})
+    version = storage.get_version()
+
+    storage.replace_orders({'ord-02': make_order('ord-02', status='shipped'), 'ord-04': make_order('ord-04')})
+
+    assert set(storage.get_all_orders()) == {'ord-02', 'ord-04'}
+    assert storage.get_order('ord-01') is None and storage.get_order('ord-02').status == 'shipped'
+    assert storage.summarize('status') == {'pending': (1, 1), 'shipped': (1, 1)}
+    assert storage.get_version() > version
+
+def test_sqlite_storage_survives_reopen(tmp_path):
+    path = str(tmp_path / 'orders.db')
+    storage = SqliteStorage(path)
+    storage.save_order('ord-01', make_order('ord-01'))
+    storage.close()
+
+    reopened = SqliteStorage(path)
+
+    assert reopened.get_order('ord-01') == make_order('ord-01')
+    reopened.close()
+
+def test_sqlite_storage_pages_by_status_through_the_status_index(tmp_path):
+    path = str(tmp_path / 'orders.db')
+    SqliteStorage(path).close()
+
+    with sqlite3.connect(path) as connection:
+        plan = connection.execute(
+            "EXPLAIN QUERY PLAN " + sqlite_storage._SELECT_STATUS_PAGE, {"status": "shipped", "after": None, "limit": 10}
+        ).fetchall()
+
+    assert 'USING INDEX orders_status_idx' in plan[0][3]
+
+def test_sqlite_storage_computes_totals_of_databases_created_without_them(tmp_path):
+    path = str(tmp_path / 'orders.db')
+    storage = SqliteStorage(path)
+    storage.save_orders({'ord-01': make_order('ord-01'), 'ord-02': make_order('ord-02', customer_id='C2')})
+    storage.close()
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            "DROP TRIGGER order_totals_inserted; DROP TRIGGER order_totals_updated; DROP TABLE order_totals;"
+        )
+
+    reopened = SqliteStorage(path)
+    reopened.save_order('ord-03', make_order('ord-03'))
+
+    assert reopened.summarize('customer_id') == {'C1': (2, 2), 'C2': (1, 1)}
+    reopened.close()
+
+def test_sqlite_storage_indexes_item_names_of_databases_created_without_tokens(tmp_path):
+    path = str(tmp_path / 'orders.db')
+    storage = SqliteStorage(path)
+    storage.save_order('ord-01', Order('ord-01', 'Red Jacket', 1, 'C1', 'pending'))
+    storage.close()
+    with sqlite3.connect(path) as connection:
+        connection.execute("DROP TABLE item_tokens")
+
+    reopened = SqliteStorage(path)
+
+    assert [order.order_id for order in reopened.search_orders('jack')] == ['ord-01']
+    reopened.close()
+
+def test_sqlite_storage_adds_time_columns_to_databases_created_without_them(tmp_path):
+    path = str(tmp_path / 'orders.db')
+    storage = SqliteStorage(path)
+    storage.save_order('ord-01', make_order('ord-01'))
+    storage.close()
+    with sqlite3.connect(path) as connection:
+        connection.executescript(
+            "DROP INDEX orders_created_idx; DROP INDEX orders_status_since_idx;"
+            "ALTER TABLE orders DROP COLUMN status_since; ALTER TABLE orders DROP COLUMN history;"
+            "ALTER TABLE orders DROP COLUMN updated_at; ALTER TABLE orders DROP COLUMN created_at;"
+        )
+
+    reopened = SqliteStorage(path)
+    reopened.compare_and_set_status('ord-01', 'pending', 'processing', 10.0)
+    reopened.save_order('ord-02', Order.new('ord-02', 'jacket', 1, 'C1', 'pending', 5.0))
+
+    assert reopened.get_order('ord-01') == Order('ord-01', 'jacket', 1, 'C1', 'processing', None, 10.0, (('processing', 10.0),))
+    assert [order.order_id for order in reopened.get_stale_orders('processing', 11.0)] == ['ord-01']
+    assert [order.order_id for order in reopened.iter_orders_by_time()] == ['ord-02']
+    reopened.close()
+
+@pytest.mark.parametrize("fsync", OrderJournal.FSYNC_POLICIES)
+def test_journaled_storage_rebuilds_from_snapshot_and_log(tmp_path, fsync):
+    storage = InMemoryStorage(OrderJournal(str(tmp_path), fsync=fsync, snapshot_every=3))
+    storage.save_orders({order_id: make_order(order_id) for order_id in ('ord-01', 'ord-02', 'ord-03')})
+    storage.save_order('ord-04', make_order('ord-04'))
+    storage.save_order('ord-02', make_order('ord-02', status='processing'))
+    storage.close()
+
+    reopened = InMemoryStorage(OrderJournal(str(tmp_path), fsync=fsync, snapshot_every=3))
+
+    assert list(reopened.get_all_orders()) == ['ord-01', 'ord-02', 'ord-03', 'ord-04']
+    assert list(reopened.get_orders_by_status('processing')) == ['ord-02']
+    reopened.close()
+
+def test_journaled_storage_replace_orders_survives_reopen_and_interruption(tmp_path):
+    storage = InMemoryStorage(OrderJournal(str(tmp_path), fsync='never'))
+    storage.save_orders({order_id: make_order(order_id) for order_id in ('ord-01', 'ord-02', 'ord-03')})
+    storage.replace_orders({'ord-02': make_order('ord-02'), 'ord-04': make_order('ord-04')})
+
+    def crash(orders):
+        raise RuntimeError("crashed while writing the snapshot")
+    storage._journal.write_snapshot = crash
+
+    with pytest.raises(RuntimeError):
+        storage.replace_orders({})
+    storage.close()
+    reopened = InMemoryStorage(OrderJournal(str(tmp_path), fsync='never'))
+
+    assert list(reopened.get_all_orders()) == ['ord-02', 'ord-04']
+    reopened.close()
+
+def test_journal_interval_policy_syncs_the_last_writes_when_idle(tmp_path, monkeypatch):
+    synced = threading.Event()
+    fsync = os.fsync
+    monkeypatch.setattr(os, 'fsync', lambda fd: (fsync(fd), synced.set()))
+    journal = OrderJournal(str(tmp_path), fsync='interval', fsync_interval_ms=20)
+
+    journal.append(make_order('ord-01'))
+
+    assert synced.wait(timeout=2)
+    journal.close()
+
+def test_journal_replay_ignores_torn_final_record(tmp_path):
+    storage = InMemoryStorage(OrderJournal(str(tmp_path)))
+    storage.save_order('ord-01', make_order('ord-01'))
+    storage.close()
+    with open(tmp_path / OrderJournal.LOG_FILE, 'a') as log:
+        log.write('["ord-02","jack')
+
+    reopened = InMemoryStorage(OrderJournal(str(tmp_path)))
+    reopened.save_order('ord-03', make_order('ord-03'))
+    reopened.close()
+
+    assert list(InMemoryStorage(OrderJournal(str(tmp_path))).get_all_orders()) == ['ord-01', 'ord-03']
+
+def test_journal_replays_records_written_before_timestamps(tmp_path):
+    with open(tmp_path / OrderJournal.LOG_FILE, 'w') as log:
+        log.write('["ord-01","jacket",1,"C1","pending"]\n')
+    storage = InMemoryStorage(OrderJournal(str(tmp_path)))
+    storage.compare_and_set_status('ord-01', 'pending', 'processing', 10.0)
+    storage.close()
+
+    reopened = InMemoryStorage(OrderJournal(str(tmp_path)))
+
+    assert reopened.get_order('ord-01') == Order('ord-01', 'jacket', 1, 'C1', 'processing', None, 10.0, (('processing', 10.0),))
+    assert [order.order_id for order in reopened.get_stale_orders('processing', 11.0)] == ['ord-01']
+    reopened.close()
+
+def test_columnar_storage_scans_across_chunks_and_stops_after_clear():
+    storage = ColumnarStorage()
+    storage.save_orders({
+        f'ord-{i:04d}': make_order(f'ord-{i:04d}', status='shipped' if i % 3 else 'pending', customer_id=f'C{i % 2}')
+        for i in range(6 * ColumnarStorage.SCAN_CHUNK_SIZE)
+    })
+
+    shipped = storage.iter_orders(status='shipped', customer_id='C1')
+    first = [next(shipped) for _ in range(ColumnarStorage.SCAN_CHUNK_SIZE + 1)]
+    storage.clear()
+
+    assert [order.order_id for order in first[:3]] == ['ord-0001', 'ord-0005', 'ord-0007']
+    assert all(order.status == 'shipped' and order.customer_id == 'C1' for order in first)
+    assert len(list(shipped)) < ColumnarStorage.SCAN_CHUNK_SIZE
+    assert storage.get_orders_by_status('shipped') == {} and storage.count_orders() == 0
+
+# --- ShardedStorage tests ---
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def sharded_storage(request, tmp_path):
+    """
+    Provides a ShardedStorage over four in-memory shards, or four SQLite files fanned out on a thread pool.
+    """
+    if request.param == 'sqlite':
+        backend = ShardedStorage([SqliteStorage(str(tmp_path / f'orders-{i}.db')) for i in range(4)], blocking=True)
+    else:
+        backend = ShardedStorage([InMemoryStorage() for _ in range(4)])
+    yield backend
+    backend.close()
+
+def test_sharded_storage_routes_orders_and_merges_queries(sharded_storage):
+    sharded_storage.save_orders({f'ord-{i:02d}': make_order(f'ord-{i:02d}', customer_id=f'C{i % 2}') for i in range(40)})
+
+    skipped = sharded_storage.insert_orders_if_absent({'ord-00': make_order('ord-00'), 'ord-40': make_order('ord-40')})
+    updated, rejected = sharded_storage.transition_statuses(['ord-01', 'ord-02', 'missing'], 'processing', {'pending'})
+
+    shard_sizes = [shard.count_orders() for shard in sharded_storage._shards.values()]
+    assert all(shard_sizes) and sum(shard_sizes) == 41
+    assert skipped == {'ord-00'} and set(updated) == {'ord-01', 'ord-02'} and rejected == {}
+    assert sharded_storage.get_order('ord-01') == make_order('ord-01', status='processing', customer_id='C1')
+    assert set(sharded_storage.get_all_orders()) == {f'ord-{i:02d}' for i in range(41)}
+    assert set(sharded_storage.get_orders_by_customer('C1', 'processing')) == {'ord-01'}
+    assert sharded_storage.find_existing_ids(['ord-05', 'ord-39', 'missing']) == {'ord-05', 'ord-39'}
+    assert sharded_storage.summarize('status') == {'pending': (39, 39), 'processing': (2, 2)}
+    assert len(sharded_storage.search_orders('jacket', 'pending', 10)) == 10
+    assert list(sharded_storage.get_orders(['ord-39', 'missing', 'ord-00', 'ord-01'])) == ['ord-39', 'ord-00', 'ord-01']
+
+def test_sharded_storage_pages_through_every_shard(sharded_storage):
+    sharded_storage.save_orders({f'ord-{i:02d}': make_order(f'ord-{i:02d}') for i in range(30)})
+
+    pages, after = [], None
+    while page := [order.order_id for order in sharded_storage.iter_orders(status='pending', after=after, limit=7)]:
+        pages.append(page)
+        after = page[-1]
+
+    assert sorted(sum(pages, [])) == [f'ord-{i:02d}' for i in range(30)]
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+
+def test_sharded_storage_merges_time_queries_of_every_shard(sharded_storage):
+    sharded_storage.save_orders({
+        f'ord-{i:02d}': Order.new(f'ord-{i:02d}', 'jacket', 1, 'C1', 'pending', float(i // 2)) for i in range(30)
+    })
+    sharded_storage.transition_statuses([f'ord-{i:02d}' for i in range(0, 30, 3)], 'processing', {'pending'}, 50.0)
+
+    pages, after = [], None
+    while page := [order.order_id for order in sharded_storage.iter_orders_by_time(since=3.0, after=after, limit=4)]:
+        pages.append(page)
+        after = page[-1]
+
+    times = [sharded_storage.get_order(order_id).created_at for order_id in sum(pages, [])]
+    assert sorted(sum(pages, [])) == [f'ord-{i:02d}' for i in range(6, 30)]
+    assert times == sorted(times) and [len(page) for page in pages] == [4, 4, 4, 4, 4, 4]
+    stale = sharded_storage.get_stale_orders('pending', 3.0, 2)
+    assert [order.order_id for order in stale] == ['ord-01', 'ord-02']
+
+def test_sharded_storage_rebalance_only_moves_orders_whose_owner_changed():
+    shards = {f'shard-{i}': InMemoryStorage() for i in range(3)}
+    storage = ShardedStorage(shards)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(300)})
+    owners = {order_id: storage._ring.owner(order_id) for order_id in storage.get_all_orders()}
+
+    moved = storage.rebalance(dict(shards, **{'shard-3': InMemoryStorage()}))
+
+    assert 0 < moved < 150
+    assert moved == sum(storage._ring.owner(order_id) != owner for order_id, owner in owners.items())
+    assert all(storage._ring.owner(order_id) == 'shard-3' for order_id in storage._shards['shard-3'].get_all_orders())
+    assert storage.count_orders() == 300
+    assert all(storage.get_order(order_id) is not None for order_id in owners)
+
+def test_sharded_storage_rebalance_saves_moving_orders_before_dropping_them():
+    shards = {f'shard-{i}': InMemoryStorage() for i in range(3)}
+    storage = ShardedStorage(shards)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(300)})
+    new_shard = InMemoryStorage()
+
+    def crash(orders):
+        raise RuntimeError("crashed while dropping moved orders")
+    for shard in shards.values():
+        shard.replace_orders = crash
+
+    with pytest.raises(RuntimeError):
+        storage.rebalance(dict(shards, **{'shard-3': new_shard}))
+
+    stored = set(new_shard.get_all_orders()).union(*(shard.get_all_orders() for shard in shards.values()))
+    assert len(stored) == 300 and len(new_shard.get_all_orders()) > 0
+
+@pytest.mark.parametrize("backend", ['journaled', 'sqlite'])
+def test_sharded_storage_interrupted_rebalance_loses_no_order_after_reopen(tmp_path, backend):
+    def open_shard(name):
+        if backend == 'sqlite':
+            return SqliteStorage(str(tmp_path / f'{name}.db'))
+        return InMemoryStorage(OrderJournal(str(tmp_path / name), fsync='never'))
+    names = [f'shard-{i}' for i in range(4)]
+    shards = {name: open_shard(name) for name in names[:3]}
+    storage = ShardedStorage(shards)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(300)})
+    new_shard = open_shard('shard-3')
+    replaced = []
+
+    def crash_on_second_replace(shard):
+        replace_orders = shard.replace_orders
+
+        def replace(orders):
+            if replaced:
+                raise RuntimeError("crashed while dropping moved orders")
+            replace_orders(orders)
+            replaced.append(shard)
+        return replace
+    for shard in shards.values():
+        shard.replace_orders = crash_on_second_replace(shard)
+
+    with pytest.raises(RuntimeError):
+        storage.rebalance(dict(shards, **{'shard-3': new_shard}))
+    for shard in [*shards.values(), new_shard]:
+        shard.close()
+    reopened = [open_shard(name) for name in names]
+
+    assert len(replaced) == 1
+    assert len(set().union(*(shard.get_all_orders() for shard in reopened))) == 300
+    for shard in reopened:
+        shard.close()
+
+def test_sharded_storage_version_keeps_growing_when_shards_are_removed():
+    shards = {f'shard-{i}': InMemoryStorage() for i in range(3)}
+    storage = ShardedStorage(shards)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(30)})
+    before = storage.get_version()
+
+    storage.rebalance({name: shards[name] for name in ('shard-0', 'shard-1')})
+    after = storage.get_version()
+    storage.save_order('ord-100', make_order('ord-100'))
+
+    assert before < after < storage.get_version()
+    assert storage.count_orders() == 31
+
+def test_sharded_storage_get_version_does_not_deadlock_with_rebalance():
+    shards = {f'shard-{i}': InMemoryStorage() for i in range(3)}
+    storage = ShardedStorage(shards)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(30)})
+    done = threading.Event()
+
+    def read_versions():
+        while not done.is_set():
+            storage.get_version()
+
+    def rebalance():
+        for round in range(200):
+            names = ('shard-0', 'shard-1', 'shard-2') if round % 2 else ('shard-0', 'shard-1')
+            storage.rebalance({name: shards[name] for name in names})
+        done.set()
+    threads = [threading.Thread(target=read_versions, daemon=True) for _ in range(4)]
+    threads.append(threading.Thread(target=rebalance, daemon=True))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+
+    assert not any(thread.is_alive() for thread in threads)
+    assert storage.count_orders() == 30
+
+def test_sharded_storage_only_exposes_capabilities_of_every_shard():
+    assert ShardedStorage([BasicStorage(), InMemoryStorage()]).__class__.insert_if_absent is None
+    assert callable(ShardedStorage([InMemoryStorage(), InMemoryStorage()]).__class__.insert_if_absent)
+
+# --- SharedStorage tests ---
+
+def save_orders_in_process(address, first, count):
+    storage = SharedStorage(address, AUTHKEY)
+    storage.save_orders({f'ord-{i:03d}': make_order(f'ord-{i:03d}') for i in range(first, first + count)})
+    storage.close()
+
+def test_shared_storage_shares_orders_between_processes():
+    server = serve(InMemoryStorage())
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=save_orders_in_process, args=(server.address, i * 50, 50)) for i in range(2)]
+
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    storage = SharedStorage(server.address, AUTHKEY)
+
+    assert [worker.exitcode for worker in workers] == [0, 0]
+    assert storage.count_orders() == 100
+    assert storage.get_order('ord-099') == make_order('ord-099')
+    storage.close()
+    server.close()
+
+def test_shared_storage_only_exposes_capabilities_of_the_served_backend():
+    server = serve(BasicStorage())
+
+    storage = SharedStorage(server.address, AUTHKEY)
+    storage.save_order('ord-1', make_order('ord-1'))
+
+    assert storage.__class__.insert_if_absent is None
+    assert storage.get_all_orders() == {'ord-1': make_order('ord-1')}
+    storage.close()
+    server.close()
+
+def test_shared_storage_requires_an_authkey():
+    server = serve(InMemoryStorage())
+
+    with pytest.raises(ValueError):
+        StorageServer(InMemoryStorage(), authkey=None)
+    with pytest.raises(ValueError):
+        SharedStorage(server.address, b'')
+    with pytest.raises(multiprocessing.AuthenticationError):
+        SharedStorage(server.address, b'wrong-key')
+    server.close()
+
+def test_storage_server_creates_its_socket_in_a_private_directory(tmp_path):
+    address = str(tmp_path / 'run' / 'storage.sock')
+    server = StorageServer(InMemoryStorage(), address, authkey=AUTHKEY)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    storage = SharedStorage(address, AUTHKEY)
+    storage.save_order('ord-1', make_order('ord-1'))
+
+    assert os.stat(tmp_path / 'run').st_mode & 0o777 == 0o700
+    assert storage.get_order('ord-1') == make_order('ord-1')
+    storage.close()
+    server.close()
+
+def test_storage_server_refuses_a_directory_others_can_access(tmp_path):
+    (tmp_path / 'run').mkdir()
+    os.chmod(tmp_path / 'run', 0o755)
+
+    with pytest.raises(PermissionError):
+        StorageServer(InMemoryStorage(), str(tmp_path / 'run' / 'storage.sock'), authkey=AUTHKEY)
+
+# --- CachingStorage tests ---
+
+class BasicStorage:
+    """
+    Only the required storage methods, counting how often each one is called.
+    """
+    def __init__(self):
+        self.orders = {}
+        self.calls = {'get_order': 0, 'get_all_orders': 0}
+
+    def save_order(self, order_id, order_data):
+        self.orders[order_id] = order_data
+
+    def get_order(self, order_id):
+        self.calls['get_order'] += 1
+        return self.orders.get(order_id)
+
+    def get_all_orders(self):
+        self.calls['get_all_orders'] += 1
+        return dict(self.orders)
+
+def test_caching_storage_serves_hits_and_misses_from_cache():
+    backend = BasicStorage()
+    storage = CachingStorage(backend)
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    for _ in range(3):
+        assert storage.get_order('ord-01') == make_order('ord-01')
+        assert storage.get_order('missing') is None
+        assert len(storage.get_all_orders()) == 1
+
+    assert backend.calls == {'get_order': 2, 'get_all_orders': 1}
+    stats = storage.cache_stats()
+    assert (stats['hits'], stats['negative_hits'], stats['misses']) == (2, 2, 2)
+    assert (stats['list_hits'], stats['list_misses']) == (2, 1)
+
+def test_caching_storage_writes_invalidate_negative_and_list_entries():
+    backend = BasicStorage()
+    storage = CachingStorage(backend)
+    assert storage.get_order('ord-01') is None
+    assert storage.get_all_orders() == {}
+
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    assert storage.get_order('ord-01') == make_order('ord-01')
+    assert list(storage.get_all_orders()) == ['ord-01']
+    assert backend.calls == {'get_order': 2, 'get_all_orders': 2}
+
+def test_caching_storage_batch_lookups_only_fetch_uncached_ids():
+    backend = InMemoryStorage()
+    storage = CachingStorage(backend)
+    storage.save_orders({'ord-01': make_order('ord-01'), 'ord-02': make_order('ord-02')})
+    storage.get_order('ord-01')
+    fetched = []
+    backend.get_orders = lambda order_ids: fetched.append(order_ids) or InMemoryStorage.get_orders(backend, order_ids)
+
+    first = storage.get_orders(['ord-01', 'ord-02', 'missing'])
+    second = storage.get_orders(['missing', 'ord-02', 'ord-01'])
+
+    assert list(first) == ['ord-01', 'ord-02'] and list(second) == ['ord-02', 'ord-01']
+    assert fetched == [['ord-02', 'missing']]
+    assert storage.cache_stats()['negative_hits'] == 1
+
+def test_caching_storage_evicts_least_recently_used_and_expires_entries():
+    now = [0.0]
+    backend = BasicStorage()
+    storage = CachingStorage(backend, max_size=2, ttl_seconds=10, clock=lambda: now[0])
+    for order_id in ('ord-01', 'ord-02', 'ord-03'):
+        storage.save_order(order_id, make_order(order_id))
+    storage.get_order('ord-01')
+    storage.get_order('ord-02')
+
+    storage.get_order('ord-01')
+    storage.get_order('ord-03')
+    storage.get_order('ord-02')
+    now[0] = 10.0
+    storage.get_order('ord-03')
+
+    assert backend.calls['get_order'] == 5
+    assert storage.cache_stats()['evictions'] == 2
+
+def test_caching_storage_keeps_no_stale_order_when_writes_finish_out_of_order():
+    backend = BasicStorage()
+    storage = CachingStorage(backend)
+    backend_save_order = backend.save_order
+
+    def save_order(order_id, order):
+        backend_save_order(order_id, order)
+        if order.status == 'pending':
+            # A second writer runs between the first one's backend write and its cache update
+            storage.save_order(order_id, make_order(order_id, 'processing'))
+    backend.save_order = save_order
+
+    storage.save_order('ord-01', make_order('ord-01'))
+
+    assert storage.get_order('ord-01') == backend.orders['ord-01'] == make_order('ord-01', 'processing')
+
+def test_caching_storage_expires_misses_after_negative_ttl():
+    now = [0.0]
+    backend = BasicStorage()
+    storage = CachingStorage(backend, negative_ttl_seconds=5, clock=lambda: now[0])
+    uncached = CachingStorage(backend, negative_ttl_seconds=0)
+    storage.get_order('ord-01')
+    uncached.get_order('ord-01')
+    # Written by another process, behind the caches' back
+    backend.orders['ord-01'] = make_order('ord-01')
+
+    cached_miss = storage.get_order('ord-01')
+    now[0] = 5.0
+
+    assert cached_miss is None
+    assert storage.get_order('ord-01') == make_order('ord-01')
+    assert uncached.get_order('ord-01') == make_order('ord-01')
+
+def test_caching_storage_only_exposes_backend_capabilities():
+    assert CachingStorage(BasicStorage()).__class__.insert_if_absent is None
+    assert callable(CachingStorage(InMemoryStorage()).__class__.insert_if_absent)
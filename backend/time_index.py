@@ -0,0 +1,134 @@
+# This module contains the time-ordered index the in-memory storage backends
+# keep for time range queries, and the scans used for storages without one.
+from array import array
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Iterable, Iterator, List, Mapping, Tuple
+
+from backend.order import Order
+
+
+class TimeIndex:
+    """
+    Order positions sorted by a timestamp, kept in two parallel typed arrays.
+
+    Entries are ordered by (time, position), so a time range is two bisects
+    and a query costs O(log N + k) for k entries. Timestamps mostly arrive in
+    increasing order, so inserts land at or near the end of the arrays and
+    move little memory. An entry takes 16 bytes.
+    Not thread-safe, callers hold their write lock.
+    """
+    __slots__ = ('_times', '_positions')
+
+    def __init__(self):
+        self._times = array('d')
+        self._positions = array('q')
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def add(self, at: float, position: int):
+        index = self.__locate(at, position)
+        self._times.insert(index, at)
+        self._positions.insert(index, position)
+
+    def remove(self, at: float, position: int):
+        index = self.__locate(at, position)
+        if self.__holds(index, at, position):
+            del self._times[index]
+            del self._positions[index]
+
+    def positions(self, since: float = None, until: float = None, after: Tuple[float, int] = None,
+                  limit: int = None) -> array:
+        """
+        Returns a copy of the positions with a time in [since, until), in time
+        order, starting right after the (time, position) entry `after`.
+        """
+        start = 0 if since is None else bisect_left(self._times, since)
+        if after is not None:
+            index = self.__locate(*after)
+            start = max(start, index + 1 if self.__holds(index, *after) else index)
+        stop = len(self._times) if until is None else bisect_left(self._times, until)
+        if limit is not None:
+            stop = min(stop, start + limit)
+        return self._positions[start:stop]
+
+    def __locate(self, at: float, position: int) -> int:
+        # Entries of equal time are sorted by position, a bisect within their run finds the spot
+        start = bisect_left(self._times, at)
+        return bisect_left(self._positions, position, start, bisect_right(self._times, at, start))
+
+    def __holds(self, index: int, at: float, position: int) -> bool:
+        return index < len(self._positions) and self._positions[index] == position and self._times[index] == at
+
+
+class OrderTimeIndexes:
+    """
+    The time indexes of an order store: every order by creation time, and
+    the orders of each status by when they entered it (`Order.status_since`).
+    Orders lacking a time are left out of the index for it.
+    Not thread-safe, callers hold their write lock.
+    """
+    __slots__ = ('created', '_status_since')
+
+    def __init__(self):
+        self.created = TimeIndex()
+        self._status_since = {}
+
+    def update(self, position: int, previous: Order | None, order: Order):
+        """
+        Moves the entries of the order at `position` from its previous record to `order`.
+        """
+        if previous is None or previous.created_at != order.created_at:
+            if previous is not None and previous.created_at is not None:
+                self.created.remove(previous.created_at, position)
+            if order.created_at is not None:
+                self.created.add(order.created_at, position)
+        if previous is None or (previous.status, previous.status_since) != (order.status, order.status_since):
+            if previous is not None and previous.status_since is not None:
+                self._status_since[previous.status].remove(previous.status_since, position)
+            if order.status_since is not None:
+                self._status_since.setdefault(order.status, TimeIndex()).add(order.status_since, position)
+
+    def stale(self, status: str, before: float, limit: int = None) -> array:
+        """
+        Returns the positions of the orders that entered `status` before `before`, longest waiting first.
+        """
+        index = self._status_since.get(status)
+        return array('q') if index is None else index.positions(until=before, limit=limit)
+
+
+def scan_created(orders: Iterable[Mapping], since: float = None, until: float = None, status: str = None,
+                 customer_id: str = None, after: str = None) -> Iterator[Mapping]:
+    """
+    Yields the orders of `orders` created in [since, until), oldest first and
+    starting right after the order with ID `after`, for storages without a
+    time index. Orders of equal time keep their order in `orders`.
+    """
+    # Keyed by (time, position) like TimeIndex, so the cursor needn't match the filters
+    keyed = [((order['created_at'], position), order) for position, order in enumerate(orders)
+             if order.get('created_at') is not None]
+    cursor = next((key for key, order in keyed if order['order_id'] == after), None)
+    found = sorted(
+        (entry for entry in keyed
+         if (since is None or entry[0][0] >= since) and (until is None or entry[0][0] < until)
+         and (cursor is None or entry[0] > cursor)
+         and (status is None or entry[1]['status'] == status)
+         and (customer_id is None or entry[1]['customer_id'] == customer_id)),
+        key=lambda entry: entry[0],
+    )
+    return (order for _, order in found)
+
+
+def scan_stale(orders: Iterable[Mapping], status: str, before: float, limit: int = None) -> List[Mapping]:
+    """
+    Returns the orders of `orders` that entered `status` before `before`,
+    longest waiting first, for storages without a time index.
+    """
+    waiting = []
+    for order in orders:
+        since = Order.from_mapping(order).status_since
+        if order['status'] == status and since is not None and since < before:
+            waiting.append((since, order))
+    waiting.sort(key=lambda entry: entry[0])
+    return [order for _, order in islice(waiting, limit)]
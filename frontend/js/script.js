@@ -15,23 +15,53 @@ document.addEventListener('DOMContentLoaded', () => {
         setTimeout(() => messageContainer.classList.add('hidden'), 5000);
     }
 
+    // Rendered rows by order ID, so change events only touch the affected row
+    const orderRows = new Map();
+
+    function renderEmptyTable() {
+        ordersTableBody.innerHTML = '<tr><td colspan="5" class="text-center py-4">No orders to display.</td></tr>';
+    }
+
+    function renderOrderRow(order) {
+        let row = orderRows.get(order.order_id);
+        if (!row) {
+            if (orderRows.size === 0) ordersTableBody.innerHTML = '';
+            row = document.createElement('tr');
+            orderRows.set(order.order_id, row);
+            ordersTableBody.appendChild(row);
+        }
+        row.innerHTML = `<td class="p-2">${order.order_id}</td><td class="p-2">${order.item_name}</td><td class="p-2">${order.quantity}</td><td class="p-2">${order.customer_id}</td><td class="p-2 capitalize">${order.status}</td>`;
+    }
+
+    function removeOrderRow(orderId) {
+        const row = orderRows.get(orderId);
+        if (!row) return;
+        row.remove();
+        orderRows.delete(orderId);
+        if (orderRows.size === 0) renderEmptyTable();
+    }
+
     function renderOrdersTable(orders) {
         ordersTableBody.innerHTML = '';
+        orderRows.clear();
         if (orders.length === 0) {
-            ordersTableBody.innerHTML = '<tr><td colspan="5" class="text-center py-4">No orders to display.</td></tr>';
+            renderEmptyTable();
             return;
         }
-        orders.forEach(order => {
-            const row = document.createElement('tr');
-            row.innerHTML = `<td class="p-2">${order.order_id}</td><td class="p-2">${order.item_name}</td><td class="p-2">${order.quantity}</td><td class="p-2">${order.customer_id}</td><td class="p-2 capitalize">${order.status}</td>`;
-            ordersTableBody.appendChild(row);
-        });
+        orders.forEach(renderOrderRow);
+    }
+
+    function applyOrderEvent(event) {
+        const order = JSON.parse(event.data);
+        const status = filterStatusSelect.value;
+        if (status && order.status !== status) removeOrderRow(order.order_id);
+        else renderOrderRow(order);
     }
 
     async function fetchAndRenderOrders(status = '') {
         try {
             const url = status ? `/api/orders?status=${status}` : '/api/orders';
-            const response = await fetch(url);
+            const response = await fetch(url, { cache: 'no-cache' });
             const orders = await response.json();
             if (!response.ok) throw new Error(orders.error || 'Unknown error');
             renderOrdersTable(orders);
@@ -49,7 +79,6 @@ document.addEventListener('DOMContentLoaded', () => {
             if (!response.ok) throw new Error(result.error);
             showMessage(`Order ${result.order_id} added!`, 'success');
             addOrderForm.reset();
-            fetchAndRenderOrders();
         } catch (error) { showMessage(`Failed to add order: ${error.message}`, 'error'); }
     });
 
@@ -78,11 +107,20 @@ document.addEventListener('DOMContentLoaded', () => {
             if (!response.ok) throw new Error(result.error);
             showMessage(`Order ${orderId} status updated.`, 'success');
             updateStatusForm.reset();
-            fetchAndRenderOrders();
         } catch (error) { showMessage(`Failed to update status: ${error.message}`, 'error'); }
     });
 
     listAllOrdersBtn.addEventListener('click', () => { filterStatusSelect.value = ''; fetchAndRenderOrders(); });
     filterStatusSelect.addEventListener('change', (e) => fetchAndRenderOrders(e.target.value));
-    fetchAndRenderOrders();
+
+    // The table is kept current by the change feed. The server starts every new
+    // subscription, and any it can't resume, with a reset, which (re)loads the list.
+    const orderEvents = new EventSource('/api/orders/events');
+    orderEvents.addEventListener('reset', () => fetchAndRenderOrders(filterStatusSelect.value));
+    // The browser gives up for good when the server has no feed, so the list is loaded once without it
+    orderEvents.addEventListener('error', () => {
+        if (orderEvents.readyState === EventSource.CLOSED) fetchAndRenderOrders(filterStatusSelect.value);
+    });
+    orderEvents.addEventListener('created', applyOrderEvent);
+    orderEvents.addEventListener('status_changed', applyOrderEvent);
 });